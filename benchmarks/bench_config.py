@@ -0,0 +1,139 @@
+"""配置读取的微基准测试
+
+对比热路径上每次构造ProjectConfig并查找Translate表的旧写法，与读取冻结的GameConfig、
+以Role整数比较判断角色的新写法；并对比逐个扫描玩家与读取PlayerTable存活索引的存活列表查询
+
+    python -m benchmarks.bench_config --players 8 50
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from src.engine.game_config import GameConfig, Role
+from src.engine.game_engine import GameController, Player
+
+from .bench_memory import time_per_call
+
+class BenchPlayer(Player):
+    """不做任何行动的玩家，只用于测量角色判断"""
+
+    async def speech(self) -> None:
+        pass
+
+    async def vote(self) -> None:
+        pass
+
+    async def justify(self) -> None:
+        pass
+
+    async def testament(self) -> None:
+        pass
+
+    async def night_private_speech(self) -> None:
+        pass
+
+    async def night_action(self) -> None:
+        pass
+
+def legacy_is_werewolf(player: Player) -> bool:
+    return player.playerRole == ProjectConfig().FindItem("Translate", {}).get("werewolf", "werewolf")
+
+def legacy_is_villager(player: Player) -> bool:
+    return player.playerRole == ProjectConfig().FindItem("Translate", {}).get("villager", "villager")
+
+def legacy_check_victory(game: GameController) -> Optional[str]:
+    """旧实现：每个玩家的角色判断都重新读取配置"""
+    translate = ProjectConfig().FindItem("Translate", {})
+    has_villager_alive = False
+    has_werewolf_alive = False
+    for player in game.players.values():
+        if not player.is_alive:
+            continue
+        if legacy_is_villager(player):
+            has_villager_alive = True
+        if legacy_is_werewolf(player):
+            has_werewolf_alive = True
+    if not has_villager_alive:
+        return translate.get("werewolf_victory", "werewolf victory")
+    if not has_werewolf_alive:
+        return translate.get("villager_victory", "villager victory")
+    return None
+
+def legacy_alive_ids(game: GameController) -> List[str]:
+    """旧实现：逐个扫描玩家得到存活列表"""
+    return [player.playerId for player in game.players.values() if player.is_alive]
+
+def make_game(player_count: int) -> GameController:
+    """按固定角色循环入座，并让每三个座位中的一个死亡，使存活索引处于对局中途的状态"""
+    config = GameConfig.current()
+    roles = [Role.WEREWOLF, Role.VILLAGER, Role.VILLAGER, Role.SEER, Role.VILLAGER, Role.WITCH, Role.VILLAGER, Role.WEREWOLF]
+    game = GameController(register=False)
+    for index in range(player_count):
+        game.add_player(BenchPlayer(f"player{index + 1}", config.role_names[roles[index % len(roles)]]))
+    for index, player in enumerate(game.players.values()):
+        if index % 3 == 2:
+            player.kill("bench")
+    return game
+
+def new_check_victory(game: GameController) -> Optional[str]:
+    game.victory_conditions = None
+    return game.check_victory_conditions()
+
+def run_benchmark(player_counts: List[int]) -> Dict:
+    config = GameConfig.current()
+    results: Dict = {
+        "translate_lookup": {
+            "legacy": time_per_call(lambda: ProjectConfig().FindItem("Translate", {}).get("vote", "vote")),
+            "precompiled": time_per_call(lambda: GameConfig.current().translate.get("vote", "vote")),
+        },
+        "role_check": {},
+        "check_victory": {},
+        "alive_ids": {},
+    }
+    player = BenchPlayer("player1", config.role_names[Role.SEER])
+    results["role_check"] = {
+        "legacy": time_per_call(lambda: legacy_is_werewolf(player)),
+        "precompiled": time_per_call(lambda: player.is_werewolf),
+    }
+    for player_count in player_counts:
+        game = make_game(player_count)
+        assert legacy_check_victory(game) == new_check_victory(game)
+        results["check_victory"][player_count] = {
+            "legacy": time_per_call(lambda: legacy_check_victory(game)),
+            "precompiled": time_per_call(lambda: new_check_victory(game)),
+        }
+        assert legacy_alive_ids(game) == game.players.alive_ids()
+        results["alive_ids"][player_count] = {
+            "legacy": time_per_call(lambda: legacy_alive_ids(game)),
+            "precompiled": time_per_call(lambda: game.players.alive_ids()),
+        }
+    return results
+
+def print_report(results: Dict) -> None:
+    print(f"{'case':<28}{'legacy(us)':>14}{'precompiled(us)':>18}{'speedup':>10}")
+    rows = [("translate_lookup", results["translate_lookup"]), ("role_check", results["role_check"])]
+    rows += [(f"check_victory[{count}]", timings) for count, timings in results["check_victory"].items()]
+    rows += [(f"alive_ids[{count}]", timings) for count, timings in results["alive_ids"].items()]
+    for name, timings in rows:
+        speedup = timings["legacy"] / timings["precompiled"] if timings["precompiled"] else 0.0
+        print(f"{name:<28}{timings['legacy'] * 1e6:>14.3f}{timings['precompiled'] * 1e6:>18.3f}{speedup:>9.1f}x")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="配置读取微基准测试")
+    parser.add_argument("--players", type=int, nargs="+", default=[8, 30, 50], help="check_victory_conditions与存活列表查询的玩家数")
+    parser.add_argument("--output", default="logs/benchmarks/config.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.players)
+    print_report(results)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
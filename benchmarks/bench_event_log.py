@@ -0,0 +1,181 @@
+"""事件日志写入吞吐量与查询基准测试
+
+对比对局结束时一次性写出整局JSON的旧方式与后台线程批量追加JSONL的流式方式：
+记录事件时调用方每秒可记录的事件数、end_game造成的停顿、事件全部写入文件的耗时与读取耗时；
+并对比逐个扫描事件的查询与使用序列号、事件类型、时间戳索引的查询耗时
+
+    python -m benchmarks.bench_event_log --events 20000 --games 5
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.web.event_recorder import EventRecorder
+
+from .bench_game import distribution
+
+PLAYERS = [f"player{index}" for index in range(1, 9)]
+
+def synthetic_event(rng: random.Random, index: int) -> Dict:
+    """按对局中常见的事件构造记录内容：发言、系统消息与玩家状态"""
+    kind = rng.random()
+    if kind < 0.6:
+        return {"event_type": "public_speech", "data": {
+            "player_id": rng.choice(PLAYERS), "stats": "💬 发言",
+            "content": "我认为" + "这一轮的发言有很多可疑之处，" * rng.randint(2, 12),
+        }}
+    if kind < 0.9:
+        return {"event_type": "system_message", "data": {"message": f"第{index}条系统消息", "level": "info"}}
+    alive = rng.sample(PLAYERS, rng.randint(2, len(PLAYERS)))
+    return {"event_type": "player_status_update", "data": {
+        "alive_players": [{"player_id": player, "is_alive": True} for player in alive],
+        "dead_players": [{"player_id": player, "is_alive": False} for player in PLAYERS if player not in alive],
+        "total_alive": len(alive), "total_dead": len(PLAYERS) - len(alive),
+    }}
+
+def run_case(stream: bool, events: List[Dict], log_dir: Path) -> Dict[str, float]:
+    recorder = EventRecorder(str(log_dir / ("stream.json" if stream else "snapshot.json")), register=False, stream=stream)
+    start_time = time.perf_counter()
+    recorder.start_game()
+    for event in events:
+        recorder.record_event(event["event_type"], event["data"])
+    record_time = time.perf_counter() - start_time
+
+    end_start = time.perf_counter()
+    recorder.end_game()
+    end_pause = time.perf_counter() - end_start
+    recorder.wait_written()
+    written_time = time.perf_counter() - start_time
+
+    log_file = recorder.game_log_path() if stream else recorder.log_file
+    load_start = time.perf_counter()
+    loader = EventRecorder(str(log_dir / "load.json"), register=False, stream=False)
+    loader.load_events(str(log_file))
+    load_time = time.perf_counter() - load_start
+    assert len(loader.events) == len(recorder.events), "读取的事件数与记录的不一致"
+    result = {
+        "record_events_per_second": len(events) / record_time,
+        "end_game_pause": end_pause,
+        "written_events_per_second": len(events) / written_time,
+        "load_time": load_time,
+        "file_bytes": log_file.stat().st_size,
+    }
+    if recorder.writer is not None:
+        result["batches"] = recorder.writer.batches
+    return result
+
+#region 查询
+
+def scan_events(events: List[Dict], start_time: Optional[float], end_time: Optional[float],
+                event_types: Optional[List[str]]) -> List[Dict]:
+    """旧实现：逐个扫描全部事件"""
+    filtered_events = events
+    if start_time is not None:
+        filtered_events = [e for e in filtered_events if e["timestamp"] >= start_time]
+    if end_time is not None:
+        filtered_events = [e for e in filtered_events if e["timestamp"] <= end_time]
+    if event_types is not None:
+        filtered_events = [e for e in filtered_events if e["event_type"] in event_types]
+    return filtered_events
+
+def scan_summary(events: List[Dict]) -> Dict[str, int]:
+    event_types: Dict[str, int] = {}
+    for event in events:
+        event_types[event["event_type"]] = event_types.get(event["event_type"], 0) + 1
+    return event_types
+
+def time_per_call(call, repeat: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        call()
+    return (time.perf_counter() - start_time) / repeat
+
+def run_query_benchmark(events: List[Dict], repeat: int) -> Dict[str, Dict[str, float]]:
+    """晚加入的观察者与回放常见的查询：最近一段时间的事件、某类事件、一段序列号与摘要"""
+    recorder = EventRecorder("query.json", register=False, stream=False)
+    recorder.start_game()
+    timestamp = recorder.game_start_time
+    for index, event in enumerate(events):
+        recorder.record_event(event["event_type"], event["data"], timestamp=timestamp + index * 0.01)
+    last = recorder.events[-1]["timestamp"]
+    window = (last - 1.0, last)
+    middle = recorder.sequence_id // 2
+    cases = {
+        "recent_window": (
+            lambda: scan_events(recorder.events, *window, None),
+            lambda: recorder.get_events(*window),
+        ),
+        "type_in_window": (
+            lambda: scan_events(recorder.events, *window, ["player_status_update"]),
+            lambda: recorder.get_events(*window, ["player_status_update"]),
+        ),
+        "sequence_range": (
+            lambda: [e for e in recorder.events if middle <= e["sequence_id"] <= middle + 100],
+            lambda: recorder.get_events_by_sequence(middle, middle + 100),
+        ),
+        "summary": (
+            lambda: scan_summary(recorder.events),
+            lambda: recorder.get_game_summary(),
+        ),
+    }
+    report = {}
+    for name, (scan, indexed) in cases.items():
+        assert name == "summary" or scan() == indexed(), f"{name}的查询结果不一致"
+        report[name] = {"scan": time_per_call(scan, repeat), "indexed": time_per_call(indexed, repeat)}
+    return report
+
+#endregion
+
+def run_benchmark(event_count: int, games: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    events = [synthetic_event(rng, index) for index in range(event_count)]
+    report: Dict = {"events": event_count, "games": games}
+    with tempfile.TemporaryDirectory() as log_dir:
+        for name, stream in (("snapshot", False), ("stream", True)):
+            results = [run_case(stream, events, Path(log_dir)) for _ in range(games)]
+            report[name] = {
+                key: distribution([result[key] for result in results])
+                for key in results[0]
+            }
+    report["queries"] = run_query_benchmark(events, repeat=max(1, 200000 // max(event_count, 1)))
+    return report
+
+def print_report(report: Dict) -> None:
+    print(f"每局{report['events']}个事件，共{report['games']}局")
+    print(f"{'case':<10}{'record(ev/s)':>16}{'end_game(ms)':>16}{'written(ev/s)':>16}{'load(ms)':>12}{'size(KB)':>12}")
+    for case in ("snapshot", "stream"):
+        result = report[case]
+        print(
+            f"{case:<10}{result['record_events_per_second']['p50']:>16.0f}"
+            f"{result['end_game_pause']['p50'] * 1e3:>16.2f}"
+            f"{result['written_events_per_second']['p50']:>16.0f}"
+            f"{result['load_time']['p50'] * 1e3:>12.2f}"
+            f"{result['file_bytes']['p50'] / 1024:>12.0f}"
+        )
+    print(f"{'query':<16}{'scan(us)':>12}{'indexed(us)':>14}")
+    for name, result in report["queries"].items():
+        print(f"{name:<16}{result['scan'] * 1e6:>12.1f}{result['indexed'] * 1e6:>14.1f}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="事件日志写入吞吐量与查询基准测试")
+    parser.add_argument("--events", type=int, default=20000, help="每局记录的事件数")
+    parser.add_argument("--games", type=int, default=5, help="每种方式重复的局数")
+    parser.add_argument("--seed", type=int, default=0, help="生成事件内容的随机种子")
+    parser.add_argument("--output", default="logs/benchmarks/event_log.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.events, args.games, args.seed)
+    print_report(report)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
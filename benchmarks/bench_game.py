@@ -0,0 +1,491 @@
+"""端到端游戏基准测试
+
+使用本地模拟LLM运行完整对局，统计吞吐量、各阶段决策延迟、LLM调用与ReAct迭代次数、
+提示词大小以及WebSocket广播延迟，结果写成JSON以便在提交之间比较
+
+    python -m benchmarks.bench_game --games 20 --output logs/benchmarks/game.json
+    python -m benchmarks.bench_game --baseline logs/benchmarks/game.json
+    python -m benchmarks.bench_game --action-mode react --output logs/benchmarks/react.json
+    python -m benchmarks.bench_game --action-mode react --context-tools off --output logs/benchmarks/react_tools.json
+    python -m benchmarks.bench_game --games 8 --concurrency 8 --backends 4 --max-in-flight 2 --no-broadcast
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import platform
+from dataclasses import replace
+import subprocess
+import tempfile
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import aiohttp
+from aiohttp import web
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, ChatResponseAsyncGen, ChatResponseGen
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.settings import Settings
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from src.batch.headless_ui_system import HeadlessUISystem
+from src.engine.game_config import GameConfig
+from src.engine.game_engine import GameContext
+from src.engine.player_engine import (
+    PlayerAgent, SeerAgent, SetupLLMSettings, VillagerAgent, WerewolfAgent, WitchAgent
+)
+from src.llm.delegating_llm import DelegatingLLM
+from src.llm.mock_llm import SimulatedLLM
+from src.llm.router import Backend, RoutedLLM
+from src.llm.session import PrefixTracker, current_session
+from src.web.event_recorder import EventRecorder
+from src.web.web_ui_system import WebUISystem
+from src.web.websocket_server import WebSocketServer
+
+__logger__ = logging.getLogger(__name__)
+
+# 玩家方法 -> 统计标签，夜晚行动按角色区分
+PHASE_METHODS = {
+    WerewolfAgent:  {"speech": "speech", "vote": "vote", "justify": "justify", "testament": "testament",
+                     "night_private_speech": "werewolf_speech", "night_action": "werewolf_vote"},
+    SeerAgent:      {"speech": "speech", "vote": "vote", "justify": "justify", "testament": "testament",
+                     "night_action": "seer"},
+    WitchAgent:     {"speech": "speech", "vote": "vote", "justify": "justify", "testament": "testament",
+                     "night_action": "witch"},
+    VillagerAgent:  {"speech": "speech", "vote": "vote", "justify": "justify", "testament": "testament"},
+}
+# 选择目标的行动，结构化行动模式只作用于这些阶段
+ACTION_LABELS = ("vote", "werewolf_vote", "seer", "witch")
+# 公开发言，启用stream_speech时逐字广播
+SPEECH_LABELS = ("speech", "justify", "testament")
+
+class ActionSample:
+    """一次玩家决策的测量数据"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.llm_calls = 0
+        self.llm_prompt_chars: List[int] = []
+        self.llm_prefix_chars: List[int] = []
+        self.history_chars: List[int] = []
+        self.history_messages: List[int] = []
+        self.structured_fallback = False
+        self.duration = 0.0
+
+_current_action: ContextVar[Optional[ActionSample]] = ContextVar("bench_current_action", default=None)
+
+class BenchmarkRecorder:
+    """收集所有决策样本与广播延迟"""
+
+    def __init__(self):
+        self.samples: List[ActionSample] = []
+        self.broadcast_latencies: List[float] = []
+        # 正在进行的公开发言: playerId -> (开始时间, 是否已看到文字)
+        self.speech_started: Dict[str, List] = {}
+        self.speech_first_text: List[float] = []
+        self.speech_full_text: List[float] = []
+
+    def instrument(self) -> None:
+        """包装玩家的各阶段方法与get_chat_history，按决策归集测量数据"""
+        for cls, methods in PHASE_METHODS.items():
+            for name, label in methods.items():
+                setattr(cls, name, self._wrap_action(getattr(cls, name), label))
+        PlayerAgent.get_chat_history = self._wrap_history(PlayerAgent.get_chat_history)
+        PlayerAgent.play_structured_action = self._wrap_structured(PlayerAgent.play_structured_action)
+
+    def _wrap_action(self, method, label: str):
+        recorder = self
+
+        @functools.wraps(method)
+        async def wrapper(player, *args, **kwargs):
+            sample = ActionSample(label)
+            token = _current_action.set(sample)
+            if label in SPEECH_LABELS:
+                recorder.speech_started[player.playerId] = [time.time(), False]
+            start_time = time.perf_counter()
+            try:
+                return await method(player, *args, **kwargs)
+            finally:
+                sample.duration = time.perf_counter() - start_time
+                _current_action.reset(token)
+                recorder.samples.append(sample)
+
+        return wrapper
+
+    def observe_speech(self, event_type: str, data: Dict, received_at: float) -> None:
+        """观察者收到发言事件时，统计从开始发言到看到第一段文字与完整发言的时间"""
+        started = self.speech_started.get(data.get("playerId"))
+        if started is None:
+            return
+        if event_type in ("speech_delta", "public_speech") and not started[1]:
+            started[1] = True
+            self.speech_first_text.append(received_at - started[0])
+        if event_type == "public_speech":
+            self.speech_full_text.append(received_at - started[0])
+            del self.speech_started[data["playerId"]]
+
+    @staticmethod
+    def _wrap_history(method):
+        @functools.wraps(method)
+        def wrapper(player, *args, **kwargs):
+            history = method(player, *args, **kwargs)
+            sample = _current_action.get()
+            if sample is not None:
+                sample.history_chars.append(sum(len(message.content or "") for message in history))
+                sample.history_messages.append(len(history))
+            return history
+
+        return wrapper
+
+    @staticmethod
+    def _wrap_structured(method):
+        @functools.wraps(method)
+        async def wrapper(player, *args, **kwargs):
+            response = await method(player, *args, **kwargs)
+            sample = _current_action.get()
+            if sample is not None and response is None:
+                sample.structured_fallback = True
+            return response
+
+        return wrapper
+
+class InstrumentedLLM(DelegatingLLM):
+    """统计每次决策中的LLM调用次数(即ReAct迭代次数)、完整提示词大小与同一会话内的前缀命中"""
+
+    _prefixes: PrefixTracker = PrivateAttr(default_factory=PrefixTracker)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "InstrumentedLLM"
+
+    @property
+    def prefixes(self) -> PrefixTracker:
+        return self._prefixes
+
+    def _record(self, messages: Sequence[ChatMessage]) -> None:
+        prefix, prompt_chars = self._prefixes.observe(current_session.get(), messages)
+        sample = _current_action.get()
+        if sample is not None:
+            sample.llm_calls += 1
+            sample.llm_prompt_chars.append(prompt_chars)
+            sample.llm_prefix_chars.append(prefix)
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        self._record(messages)
+        return self.llm.chat(messages, **kwargs)
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        self._record(messages)
+        return await self.llm.achat(messages, **kwargs)
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        self._record(messages)
+        return self.llm.stream_chat(messages, **kwargs)
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        self._record(messages)
+        return await self.llm.astream_chat(messages, **kwargs)
+
+#region 统计
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def distribution(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values) if values else 0.0,
+    }
+
+def prefix_hit_rate(samples: Sequence[ActionSample]) -> float:
+    """同一会话中与上一次请求共享的提示词前缀占比"""
+    prompt_chars = 0
+    prefix_chars = 0
+    for sample in samples:
+        prompt_chars += sum(sample.llm_prompt_chars)
+        prefix_chars += sum(sample.llm_prefix_chars)
+    return prefix_chars / prompt_chars if prompt_chars else 0.0
+
+def summarize_phases(samples: Sequence[ActionSample]) -> Dict[str, Dict]:
+    by_label: Dict[str, List[ActionSample]] = {}
+    for sample in samples:
+        by_label.setdefault(sample.label, []).append(sample)
+    return {
+        label: {
+            "actions": len(group),
+            "latency": distribution([sample.duration for sample in group]),
+            "llm_calls": sum(sample.llm_calls for sample in group),
+            "react_iterations": distribution([sample.llm_calls for sample in group]),
+            "history_chars": distribution([chars for sample in group for chars in sample.history_chars]),
+            "history_messages": distribution([count for sample in group for count in sample.history_messages]),
+            "llm_prompt_chars": distribution([chars for sample in group for chars in sample.llm_prompt_chars]),
+            "prefix_hit_rate": prefix_hit_rate(group),
+            "structured_fallbacks": sum(sample.structured_fallback for sample in group),
+        }
+        for label, group in sorted(by_label.items())
+    }
+
+def summarize_actions(samples: Sequence[ActionSample]) -> Dict[str, float]:
+    """所有选择目标的行动合计的每次行动LLM调用数与结构化行动回退比例"""
+    actions = [sample for sample in samples if sample.label in ACTION_LABELS]
+    return {
+        "actions": len(actions),
+        "llm_calls_per_action": sum(sample.llm_calls for sample in actions) / len(actions) if actions else 0.0,
+        "structured_fallback_rate": sum(sample.structured_fallback for sample in actions) / len(actions) if actions else 0.0,
+    }
+
+#endregion
+
+#region 对局
+
+def add_players(context: GameContext) -> None:
+    playerId: int = 1
+    for playerRole, playerCount in ProjectConfig().FindItem("room").items():
+        for _ in range(playerCount):
+            context.game.add_player(PlayerAgent.create(f"player{playerId}", playerRole))
+            playerId += 1
+
+async def play_game(context: GameContext) -> Dict:
+    start_time = time.perf_counter()
+    add_players(context)
+    await context.game.astart_game()
+    return {
+        "duration": time.perf_counter() - start_time,
+        "rounds": context.game.round,
+        "victory_conditions": context.game.victory_conditions,
+    }
+
+async def run_headless_games(games: int, concurrency: int) -> List[Dict]:
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def play() -> Dict:
+        async with slots:
+            return await play_game(GameContext.create(HeadlessUISystem()))
+
+    return await asyncio.gather(*(play() for _ in range(games)))
+
+async def run_broadcast_game(recorder: BenchmarkRecorder) -> Dict:
+    """运行一局连接了WebSocket观察者的游戏，测量从_send_event到客户端收到消息的延迟"""
+    event_queue: asyncio.Queue = asyncio.Queue()
+    websocket_server = WebSocketServer(register=False)
+    websocket_server.set_event_queue(event_queue)
+
+    async def websocket_handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await websocket_server._handle_connection(ws, request.path)
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/ws", websocket_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    consumer = asyncio.create_task(websocket_server.process_event_queue())
+
+    async def receive(ws) -> None:
+        async for message in ws:
+            data = json.loads(message.data)
+            if data.get("type") != "game_event":
+                continue
+            received_at = time.time()
+            if "emitted_at" in data:
+                recorder.broadcast_latencies.append(received_at - data["emitted_at"])
+            recorder.observe_speech(data.get("event_type"), data.get("data", {}), received_at)
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        event_recorder = EventRecorder(str(Path(log_dir) / "broadcast.json"), register=False)
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(f"http://127.0.0.1:{port}/ws") as ws:
+                receiver = asyncio.create_task(receive(ws))
+                context = GameContext.create(WebUISystem(websocket_server, event_recorder, register=False))
+                event_recorder.start_game()
+                result = await play_game(context)
+                event_recorder.end_game(context.llm_usage.as_dict())
+                while not event_queue.empty():
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.1)
+                receiver.cancel()
+                await asyncio.gather(receiver, return_exceptions=True)
+
+    consumer.cancel()
+    await asyncio.gather(consumer, return_exceptions=True)
+    await runner.cleanup()
+    return result
+
+def slot_hit_rate(llm: Any) -> float:
+    """模拟后端各槽位的前缀命中率，经路由分发时合计所有端点"""
+    simulated = [backend.llm for backend in llm.backends] if isinstance(llm, RoutedLLM) else [llm]
+    prefix_chars = sum(backend.slot_prefixes.prefix_chars for backend in simulated)
+    prompt_chars = sum(backend.slot_prefixes.prompt_chars for backend in simulated)
+    return prefix_chars / prompt_chars if prompt_chars else 0.0
+
+async def run_benchmark(games: int, concurrency: int, broadcast: bool) -> Dict:
+    llm: InstrumentedLLM = Settings.llm
+    recorder = BenchmarkRecorder()
+    recorder.instrument()
+
+    start_time = time.perf_counter()
+    results = await run_headless_games(games, concurrency)
+    wall_time = time.perf_counter() - start_time
+
+    report: Dict[str, Any] = {
+        "throughput": {
+            "games": len(results),
+            "concurrency": concurrency,
+            "wall_time": wall_time,
+            "games_per_hour": len(results) / wall_time * 3600 if wall_time > 0 else 0,
+            "game_duration": distribution([result["duration"] for result in results]),
+            "rounds": distribution([result["rounds"] for result in results]),
+        },
+        "phases": summarize_phases(recorder.samples),
+        "actions": summarize_actions(recorder.samples),
+        "prefix_cache": {
+            "session_hit_rate": llm.prefixes.hit_rate,
+            "slot_hit_rate": slot_hit_rate(llm.llm),
+        },
+    }
+    if isinstance(llm.llm, RoutedLLM):
+        report["backends"] = llm.llm.backend_stats()
+    if broadcast:
+        await run_broadcast_game(recorder)
+        report["broadcast"] = distribution(recorder.broadcast_latencies)
+        report["speech_visibility"] = {
+            "first_text": distribution(recorder.speech_first_text),
+            "full_text": distribution(recorder.speech_full_text),
+        }
+    return report
+
+#endregion
+
+#region 报告
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def headline_metrics(report: Dict) -> Dict[str, float]:
+    """用于提交之间比较的关键指标"""
+    metrics = {"games_per_hour": report["throughput"]["games_per_hour"]}
+    for label, phase in report["phases"].items():
+        metrics[f"{label}.p50"] = phase["latency"]["p50"]
+        metrics[f"{label}.p95"] = phase["latency"]["p95"]
+        metrics[f"{label}.iterations"] = phase["react_iterations"]["mean"]
+        metrics[f"{label}.prompt_chars"] = phase["llm_prompt_chars"]["mean"]
+        metrics[f"{label}.prefix_hit_rate"] = phase["prefix_hit_rate"]
+    metrics["actions.llm_calls_per_action"] = report["actions"]["llm_calls_per_action"]
+    metrics["actions.structured_fallback_rate"] = report["actions"]["structured_fallback_rate"]
+    metrics["prefix_cache.session_hit_rate"] = report["prefix_cache"]["session_hit_rate"]
+    metrics["prefix_cache.slot_hit_rate"] = report["prefix_cache"]["slot_hit_rate"]
+    if "broadcast" in report:
+        metrics["broadcast.p50"] = report["broadcast"]["p50"]
+        metrics["broadcast.p95"] = report["broadcast"]["p95"]
+        metrics["speech_visibility.first_text.p50"] = report["speech_visibility"]["first_text"]["p50"]
+        metrics["speech_visibility.full_text.p50"] = report["speech_visibility"]["full_text"]["p50"]
+    return metrics
+
+def print_report(report: Dict, baseline: Optional[Dict] = None) -> None:
+    previous = headline_metrics(baseline) if baseline else {}
+    print(f"{'metric':<32}{'value':>14}{'baseline':>14}{'change':>10}")
+    for name, value in headline_metrics(report).items():
+        line = f"{name:<32}{value:>14.4f}"
+        if name in previous:
+            change = (value - previous[name]) / previous[name] if previous[name] else 0.0
+            line += f"{previous[name]:>14.4f}{change:>+10.1%}"
+        print(line)
+
+#endregion
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="端到端游戏基准测试")
+    parser.add_argument("--games", type=int, default=10, help="无界面对局数")
+    parser.add_argument("--concurrency", type=int, default=1, help="同时进行的对局数")
+    parser.add_argument("--seed", type=int, default=0, help="模拟LLM的策略种子")
+    parser.add_argument("--time-scale", type=float, default=None, help="缩放模拟LLM的延迟，默认使用配置")
+    parser.add_argument("--action-mode", choices=["react", "structured"], default=None,
+                        help="覆盖配置中的行动模式，用于对比两种模式的每次行动LLM调用数")
+    parser.add_argument("--context-tools", choices=["on", "off"], default=None,
+                        help="覆盖配置中的context_tools，用于对比预先计算上下文工具前后的ReAct迭代次数")
+    parser.add_argument("--stream-speech", choices=["on", "off"], default=None,
+                        help="覆盖配置中的stream_speech，用于对比观察者看到第一段发言文字的时间")
+    parser.add_argument("--backends", type=int, default=0,
+                        help="经RoutedLLM分发到的模拟端点数，0表示不经路由直接使用一个模拟后端")
+    parser.add_argument("--max-in-flight", type=int, default=2, help="每个模拟端点同时进行的最大请求数")
+    parser.add_argument("--no-broadcast", action="store_true", help="跳过WebSocket广播延迟测量")
+    parser.add_argument("--output", default="logs/benchmarks/game.json", help="JSON结果输出路径")
+    parser.add_argument("--baseline", default=None, help="用于比较的历史JSON结果")
+    args = parser.parse_args(argv)
+
+    mock_config = ProjectConfig().FindItem("mock_llm", {})
+    latency_config = dict(mock_config.get("latency", {}))
+    if args.time_scale is not None:
+        latency_config["time_scale"] = args.time_scale
+    # 基准测试总是使用模拟后端，结果不受模型服务波动影响
+    def simulated_llm() -> SimulatedLLM:
+        return SimulatedLLM(
+            seed=args.seed,
+            max_info_calls=mock_config.get("max_info_calls", 1),
+            slots=mock_config.get("slots", 1),
+            structured_error_rate=mock_config.get("structured_error_rate", 0.0),
+            latency_config=latency_config,
+        )
+
+    if args.backends > 0:
+        SetupLLMSettings(InstrumentedLLM(RoutedLLM([
+            Backend(name=f"mock{index}", llm=simulated_llm(), max_in_flight=args.max_in_flight)
+            for index in range(args.backends)
+        ])))
+    else:
+        SetupLLMSettings(InstrumentedLLM(simulated_llm()))
+    if args.action_mode is not None:
+        structured_action = GameConfig.current().structured_action
+        GameConfig.override(structured_action=replace(structured_action, enabled=args.action_mode == "structured"))
+    if args.context_tools is not None:
+        GameConfig.override(context_tools=args.context_tools == "on")
+    if args.stream_speech is not None:
+        GameConfig.override(stream_speech=args.stream_speech == "on")
+
+    report = asyncio.run(run_benchmark(args.games, args.concurrency, not args.no_broadcast))
+    report["meta"] = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "latency": latency_config,
+        "structured_action": GameConfig.current().structured_action.enabled,
+        "context_tools": GameConfig.current().context_tools,
+        "stream_speech": GameConfig.current().stream_speech,
+        "backends": args.backends,
+        "max_in_flight": args.max_in_flight if args.backends > 0 else None,
+    }
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""服务器启动耗时基准测试
+
+用python -X importtime统计导入server模块的耗时与最慢的模块，再以子进程启动server.py，
+测量从进程启动到HTTP端口可以连接、/api/status可以响应以及智能体模块加载完成的耗时
+
+    python -m benchmarks.bench_importtime --runs 5 --output logs/benchmarks/importtime.json
+"""
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+
+from .bench_game import distribution
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """解析-X importtime的输出，返回(模块, 自身微秒, 累计微秒)"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # 分隔符后多出的空格表示嵌套导入的层级
+        modules.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def measure_import(module: str, top: int) -> Dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    modules = parse_importtime(result.stderr)
+    # 顶层模块(没有缩进)的累计耗时之和即为总导入耗时
+    total_us = sum(cumulative for name, _, cumulative in modules if not name.startswith(" "))
+    slowest = sorted(modules, key=lambda item: item[2], reverse=True)[:top]
+    return {
+        "module": module,
+        "total": total_us / 1e6,
+        "modules": len(modules),
+        "slowest": [{"module": name.strip(), "cumulative": cumulative / 1e6} for name, _, cumulative in slowest],
+    }
+
+def get_status(url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+def measure_server(host: str, port: int, timeout: float) -> Dict[str, float]:
+    """启动server.py并测量端口监听、状态接口响应与智能体模块就绪的耗时"""
+    timings: Dict[str, float] = {}
+    start_time = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "server.py"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start_time + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"server.py提前退出，返回码{process.returncode}")
+            if "listening" not in timings:
+                try:
+                    socket.create_connection((host, port), timeout=0.1).close()
+                except OSError:
+                    time.sleep(0.005)
+                    continue
+                timings["listening"] = time.perf_counter() - start_time
+            status = get_status(f"http://{host}:{port}/api/status")
+            if status is None:
+                time.sleep(0.005)
+                continue
+            timings.setdefault("status", time.perf_counter() - start_time)
+            if status.get("agent_stack") != "loading":
+                timings["agent_stack"] = time.perf_counter() - start_time
+                return timings
+            time.sleep(0.01)
+        raise TimeoutError(f"server.py在{timeout}秒内没有就绪")
+    finally:
+        process.terminate()
+        process.wait()
+
+def run_benchmark(runs: int, top: int, timeout: float) -> Dict:
+    web_config = ProjectConfig().FindItem("web", {})
+    host = web_config.get("http_host", "localhost")
+    port = web_config.get("http_port", 8080)
+    report: Dict = {
+        "runs": runs,
+        "imports": [measure_import(module, top) for module in (
+            "server", "src.engine.game_engine", "src.engine.player_engine"
+        )],
+    }
+    samples: Dict[str, List[float]] = {"listening": [], "status": [], "agent_stack": []}
+    for _ in range(runs):
+        for key, value in measure_server(host, port, timeout).items():
+            samples[key].append(value)
+    report["server"] = {key: distribution(values) for key, values in samples.items()}
+    return report
+
+def print_report(report: Dict) -> None:
+    for item in report["imports"]:
+        print(f"import {item['module']}: {item['total'] * 1e3:.1f}ms ({item['modules']}个模块)")
+    slowest = report["imports"][0]["slowest"]
+    print("server最慢的模块(累计):")
+    for item in slowest:
+        print(f"  {item['module']:<48}{item['cumulative'] * 1e3:>10.1f}ms")
+    print(f"{'server.py':<16}{'p50(ms)':>12}{'max(ms)':>12}")
+    for key, value in report["server"].items():
+        print(f"{key:<16}{value['p50'] * 1e3:>12.1f}{value['max'] * 1e3:>12.1f}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="服务器启动耗时基准测试")
+    parser.add_argument("--runs", type=int, default=5, help="启动server.py的次数")
+    parser.add_argument("--top", type=int, default=10, help="列出最慢的模块数")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单次启动的最长等待秒数")
+    parser.add_argument("--output", default="logs/benchmarks/importtime.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.runs, args.top, args.timeout)
+    print_report(report)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
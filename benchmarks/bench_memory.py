@@ -0,0 +1,85 @@
+"""PublicMemory读取开销的微基准测试
+
+按不断增长的记忆条数测量read_memory与read_since的耗时，并与逐条扫描再切片的旧实现对比，
+验证读取开销只与返回的条目数有关，不随对局变长而增长
+
+    python -m benchmarks.bench_memory --sizes 100 1000 10000 100000 --window 20
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from src.engine.player_engine import PublicMemory
+
+def scan_read_memory(memory: PublicMemory, allow_stats: List[str]) -> str:
+    """旧实现：扫描并格式化全部记忆后再截取最近的条目"""
+    all_memory = [memory.format_string.format(playerId=playerId, stats=stats, content=content)
+        for playerId, stats, content in memory.memory if stats in allow_stats]
+    return "---\n".join(all_memory[-memory.max_memory_count:])
+
+def fill_memory(memory: PublicMemory, size: int, stats_choices: List[str], rng: random.Random) -> None:
+    for index in range(size):
+        memory.add_memory(f"player{rng.randint(1, 8)}", f"第{index}条发言，" + "内容" * rng.randint(5, 40), rng.choice(stats_choices))
+
+def time_per_call(fn: Callable[[], object], min_time: float = 0.05) -> float:
+    """重复调用直到累计耗时超过min_time，返回单次调用的平均秒数"""
+    calls = 0
+    start_time = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_time:
+            return elapsed / calls
+
+def run_benchmark(sizes: List[int], window: int, seed: int) -> Dict:
+    allow_memory_stats: Dict[str, List[str]] = ProjectConfig().FindItem("allow_memory_stats")
+    stats_choices = sorted({stats for allow_stats in allow_memory_stats.values() for stats in allow_stats})
+    results = []
+    for size in sizes:
+        memory = PublicMemory(register=False)
+        memory.max_memory_count = window
+        fill_memory(memory, size, stats_choices, random.Random(seed))
+        row: Dict = {"entries": size}
+        for role, allow_stats in allow_memory_stats.items():
+            assert memory.read_memory(allow_stats) == scan_read_memory(memory, allow_stats)
+            row[role] = {
+                "read_memory": time_per_call(lambda: memory.read_memory(allow_stats)),
+                "read_since": time_per_call(lambda: memory.read_since(size - window, allow_stats)),
+                "scan": time_per_call(lambda: scan_read_memory(memory, allow_stats)),
+            }
+        results.append(row)
+    return {"window": window, "seed": seed, "results": results}
+
+def print_report(report: Dict) -> None:
+    print(f"{'entries':>10}{'role':>12}{'read_memory(us)':>18}{'read_since(us)':>18}{'scan(us)':>14}")
+    for row in report["results"]:
+        for role, timings in row.items():
+            if role == "entries":
+                continue
+            print(f"{row['entries']:>10}{role:>12}{timings['read_memory'] * 1e6:>18.2f}"
+                  f"{timings['read_since'] * 1e6:>18.2f}{timings['scan'] * 1e6:>14.2f}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="PublicMemory读取开销微基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000], help="记忆条数")
+    parser.add_argument("--window", type=int, default=20, help="max_memory_count读取窗口")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", default="logs/benchmarks/memory.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.window, args.seed)
+    print_report(report)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
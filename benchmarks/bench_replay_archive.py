@@ -0,0 +1,108 @@
+"""回放归档基准测试
+
+对比整局缩进JSON与按块压缩的回放文件：文件大小、写入耗时，以及跳转到任意序列号时的
+耗时与内存峰值(旧方式需要读取并解析整个文件，回放文件只解压所在的块)
+
+    python -m benchmarks.bench_replay_archive --events 20000 --seeks 50
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.web.event_recorder import EventRecorder
+from src.web.replay_archive import ReplayArchive
+
+from .bench_event_log import synthetic_event
+from .bench_game import distribution
+
+def seek_legacy(log_file: Path, sequence: int) -> Dict:
+    with open(log_file, "r", encoding="utf-8") as f:
+        events = json.load(f)["events"]
+    return events[sequence - 1]
+
+def seek_archive(archive: ReplayArchive, game_id: str, sequence: int) -> Dict:
+    return archive.open_game(game_id).get_event(sequence)
+
+def measure_seeks(seek, sequences: List[int]) -> Dict:
+    times: List[float] = []
+    peaks: List[float] = []
+    for sequence in sequences:
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        event = seek(sequence)
+        times.append(time.perf_counter() - start_time)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert event["sequence_id"] == sequence, "跳转到的事件序列号不一致"
+    return {"time": distribution(times), "peak_bytes": distribution(peaks)}
+
+def run_benchmark(event_count: int, seeks: int, block_events: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as log_dir:
+        recorder = EventRecorder(str(Path(log_dir) / "game.json"), register=False, stream=False)
+        recorder.start_game()
+        for index in range(event_count):
+            event = synthetic_event(rng, index)
+            recorder.record_event(event["event_type"], event["data"])
+
+        start_time = time.perf_counter()
+        recorder.save_events()
+        legacy_write = time.perf_counter() - start_time
+
+        archive = ReplayArchive(str(Path(log_dir) / "replays"), block_events=block_events)
+        start_time = time.perf_counter()
+        row = archive.archive_game("game", recorder.events)
+        archive_write = time.perf_counter() - start_time
+
+        sequences = [rng.randint(1, recorder.sequence_id) for _ in range(seeks)]
+        return {
+            "events": recorder.sequence_id,
+            "block_events": block_events,
+            "legacy": {
+                "bytes": recorder.log_file.stat().st_size,
+                "write_time": legacy_write,
+                "seek": measure_seeks(lambda sequence: seek_legacy(recorder.log_file, sequence), sequences),
+            },
+            "archive": {
+                "bytes": row["bytes"],
+                "blocks": row["blocks"],
+                "write_time": archive_write,
+                "seek": measure_seeks(lambda sequence: seek_archive(archive, "game", sequence), sequences),
+            },
+        }
+
+def print_report(report: Dict) -> None:
+    print(f"{report['events']}个事件，每块{report['block_events']}个事件")
+    print(f"{'case':<10}{'size(KB)':>12}{'write(ms)':>12}{'seek p50(ms)':>14}{'seek peak(KB)':>16}")
+    for case in ("legacy", "archive"):
+        result = report[case]
+        print(
+            f"{case:<10}{result['bytes'] / 1024:>12.0f}{result['write_time'] * 1e3:>12.1f}"
+            f"{result['seek']['time']['p50'] * 1e3:>14.2f}{result['seek']['peak_bytes']['p50'] / 1024:>16.0f}"
+        )
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="回放归档基准测试")
+    parser.add_argument("--events", type=int, default=20000, help="一局的事件数")
+    parser.add_argument("--seeks", type=int, default=50, help="随机跳转的次数")
+    parser.add_argument("--block-events", type=int, default=256, help="每个压缩块的事件数")
+    parser.add_argument("--seed", type=int, default=0, help="生成事件内容的随机种子")
+    parser.add_argument("--output", default="logs/benchmarks/replay_archive.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.events, args.seeks, args.block_events, args.seed)
+    print_report(report)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
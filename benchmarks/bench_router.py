@@ -0,0 +1,141 @@
+"""推理服务路由基准测试
+
+用按脚本响应的端点代替真实的推理服务：其中一个端点停止响应，等待stall秒后由客户端抛出
+httpx的读取超时(与Ollama客户端的request_timeout短于路由超时时的表现相同)。连续发出若干请求，
+检查该端点在第一次超时后即被标记为不健康，之后的请求不再被分配到它，并统计总耗时；
+再构造两个端点都满、队首的等待者已经尝试过即将空出的端点的情形，检查空出的名额交给
+后面能使用它的等待者，而不是空置到下一次释放
+
+    python -m benchmarks.bench_router --requests 20 --stall 0.2
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse
+from llama_index.core.llms import MockLLM
+
+from src.llm.router import Backend, RoutedLLM
+from src.llm.session import session_scope
+
+class ScriptedBackendLLM(MockLLM):
+    """等待latency秒后返回；stalled为真时等待stall秒后抛出httpx.ReadTimeout，fail_next次请求立即出错"""
+
+    latency: float = 0.01
+    stalled: bool = False
+    stall: float = 0.2
+    fail_next: int = 0
+    calls: int = 0
+
+    def __init__(self, latency: float = 0.01, stalled: bool = False, stall: float = 0.2, fail_next: int = 0) -> None:
+        super().__init__()
+        self.latency = latency
+        self.stalled = stalled
+        self.stall = stall
+        self.fail_next = fail_next
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        self.calls += 1
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            raise httpx.RemoteProtocolError("connection reset")
+        if self.stalled:
+            await asyncio.sleep(self.stall)
+            raise httpx.ReadTimeout("timed out")
+        await asyncio.sleep(self.latency)
+        return ChatResponse(message=ChatMessage(role="assistant", content="ok"))
+
+async def stalled_backend(requests: int, stall: float) -> Dict:
+    stalled = ScriptedBackendLLM(stalled=True, stall=stall)
+    healthy = ScriptedBackendLLM()
+    router = RoutedLLM(
+        [Backend(name="stalled", llm=stalled), Backend(name="healthy", llm=healthy)],
+        request_timeout=stall * 4, unhealthy_cooldown=60.0, max_errors=3,
+    )
+    messages = [ChatMessage(role="user", content="hi")]
+    start_time = time.perf_counter()
+    for index in range(requests):
+        # 每个请求一个会话，不受会话固定的影响，只按负载与健康状态分配
+        with session_scope(f"player{index}"):
+            await router.achat(messages)
+    elapsed = time.perf_counter() - start_time
+    backend = router.backends[0]
+    assert backend.timeouts == 1, f"httpx超时没有计为超时: timeouts={backend.timeouts}"
+    assert stalled.calls == 1, f"超时的端点没有立即标记为不健康，仍收到了{stalled.calls}个请求"
+    return {"elapsed": elapsed, "stalled_calls": stalled.calls, "backends": router.backend_stats()}
+
+async def handoff(latency: float) -> Dict:
+    """端点a、b各一个名额：
+
+    - 请求r1占用b(4倍延迟)
+    - 请求w1在a上出错，a已尝试过而b已满，开始等待
+    - 请求r2占用a，请求w2随后开始等待，排在w1之后
+
+    r2结束空出a时，w1不能使用a，名额应交给w2，w2约在2倍延迟后完成；
+    唤醒错了等待者时w2要等到r1结束，约5倍延迟后才完成
+    """
+    a = ScriptedBackendLLM(latency=latency, fail_next=1)
+    b = ScriptedBackendLLM(latency=latency * 4)
+    router = RoutedLLM([Backend(name="a", llm=a, max_in_flight=1), Backend(name="b", llm=b, max_in_flight=1)],
+                       max_errors=3, pin_sessions=False)
+    # 负载相同时按已分配的请求数选择，让r1落在b上
+    router.backends[0].requests = 1
+    messages = [ChatMessage(role="user", content="hi")]
+    finished: Dict[str, float] = {}
+    start_time = time.perf_counter()
+
+    async def request(name: str) -> None:
+        await router.achat(messages)
+        finished[name] = time.perf_counter() - start_time
+
+    tasks = [asyncio.create_task(request("r1"))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(request("w1")))
+    await asyncio.sleep(latency / 10)
+    tasks.append(asyncio.create_task(request("r2")))
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(request("w2")))
+    await asyncio.gather(*tasks)
+    assert finished["w2"] < latency * 3, (
+        f"空出的名额没有交给能使用它的等待者，w2在{finished['w2'] * 1e3:.0f}毫秒后才完成")
+    return finished
+
+async def run_benchmark(requests: int, stall: float) -> Dict:
+    return {
+        "requests": requests,
+        "stall": stall,
+        "stalled_backend": await stalled_backend(requests, stall),
+        "handoff": await handoff(stall / 2),
+    }
+
+def print_report(report: Dict) -> None:
+    result = report["stalled_backend"]
+    print(f"{report['requests']}个请求，停止响应的端点{report['stall'] * 1e3:.0f}毫秒后超时")
+    print(f"停止响应的端点收到{result['stalled_calls']}个请求，总耗时{result['elapsed'] * 1e3:.1f}毫秒")
+    for backend in result["backends"]:
+        print(f"  {backend['name']:<10}requests={backend['requests']:<4}timeouts={backend['timeouts']:<4}healthy={backend['healthy']}")
+    handoff = report["handoff"]
+    print("名额转交: " + ", ".join(f"{name}={handoff[name] * 1e3:.0f}ms" for name in ("r1", "r2", "w1", "w2")))
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="推理服务路由基准测试")
+    parser.add_argument("--requests", type=int, default=20, help="依次发出的请求数")
+    parser.add_argument("--stall", type=float, default=0.2, help="停止响应的端点抛出超时前等待的秒数")
+    parser.add_argument("--output", default="logs/benchmarks/router.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(args.requests, args.stall))
+    print_report(report)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
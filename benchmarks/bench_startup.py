@@ -0,0 +1,100 @@
+"""对局准备耗时的微基准测试
+
+对比每个座位都重新创建工具与ReActAgent的旧写法，与按角色共享工具、第一次决策时才从agent_pool
+取得智能体、对局结束后归还复用的新写法，分别测量一局的入座耗时与全部智能体就绪的耗时
+
+    python -m benchmarks.bench_startup --games 20
+"""
+import argparse
+import json
+import time
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from llama_index.core.agent import ReActAgent
+from src.engine.game_config import GameConfig
+from src.engine.game_engine import GameContext
+from src.engine.player_engine import EnsureLLMSettings, PlayerAgent, agent_pool, build_player_tools
+
+from .bench_game import distribution
+
+def legacy_setup(room_config: Dict[str, int]) -> List[ReActAgent]:
+    """旧实现：每个座位创建一组新工具并立即创建ReActAgent"""
+    config = GameConfig.current()
+    agents = []
+    for playerRole, playerCount in room_config.items():
+        for _ in range(playerCount):
+            agents.append(ReActAgent.from_tools(
+                build_player_tools(playerRole),
+                verbose=config.agent_verbose,
+                max_iterations=config.react_config.get("max_iterations", 10),
+            ))
+    return agents
+
+def shared_setup(room_config: Dict[str, int]) -> GameContext:
+    context = GameContext.create()
+    playerId = 1
+    for playerRole, playerCount in room_config.items():
+        for _ in range(playerCount):
+            context.game.add_player(PlayerAgent.create(f"player{playerId}", playerRole))
+            playerId += 1
+    return context
+
+def run_benchmark(games: int) -> Dict:
+    room_config = ProjectConfig().FindItem("room")
+    legacy_times: List[float] = []
+    seat_times: List[float] = []
+    ready_times: List[float] = []
+    for _ in range(games):
+        start_time = time.perf_counter()
+        legacy_setup(room_config)
+        legacy_times.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        context = shared_setup(room_config)
+        seat_times.append(time.perf_counter() - start_time)
+        # 所有玩家都完成第一次决策时智能体才全部就绪
+        for player in context.game.players.values():
+            player.agent
+        ready_times.append(time.perf_counter() - start_time)
+        for player in context.game.players.values():
+            player.release_agent()
+    return {
+        "games": games,
+        "players": sum(room_config.values()),
+        "legacy": distribution(legacy_times),
+        "shared_seat": distribution(seat_times),
+        "shared_ready": distribution(ready_times),
+        "agents_created": agent_pool.created,
+        "agents_reused": agent_pool.reused,
+    }
+
+def print_report(report: Dict) -> None:
+    print(f"{report['games']}局，每局{report['players']}名玩家")
+    print(f"{'case':<16}{'p50(ms)':>12}{'max(ms)':>12}")
+    for case in ("legacy", "shared_seat", "shared_ready"):
+        print(f"{case:<16}{report[case]['p50'] * 1e3:>12.3f}{report[case]['max'] * 1e3:>12.3f}")
+    print(f"agent_pool: 创建 {report['agents_created']}  复用 {report['agents_reused']}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="对局准备耗时微基准测试")
+    parser.add_argument("--games", type=int, default=20, help="准备的对局数")
+    parser.add_argument("--output", default="logs/benchmarks/startup.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    # 旧版ReActAgent每次创建都会发出弃用警告，不计入测量
+    warnings.simplefilter("ignore", DeprecationWarning)
+    EnsureLLMSettings()
+    report = run_benchmark(args.games)
+    print_report(report)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
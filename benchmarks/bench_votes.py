@@ -0,0 +1,206 @@
+"""投票收集基准测试
+
+用按脚本投票的玩家代替LLM智能体，每个玩家的决策耗时为固定的模拟延迟，对比逐个投票与
+并发投票收集一轮投票的耗时，并检查每一轮的计票数等于投票人数(并发投票的玩家各自持有
+技能状态，任何一张票都不会因为"该回合已经使用过技能"而丢失)；再分别以串行与并行夜晚
+(预言家与狼人/女巫分支同时行动)运行若干个夜晚，检查狼人击杀、预言家查验与女巫毒药都被
+记录，且女巫的药剂标记只出现在女巫自己的技能状态中，每瓶药在之后的夜晚不能再次使用；最后像tournament的--games-per-worker
+一样在同一进程内同时运行多局，检查各局的计票与夜晚结果互不干扰
+
+    python -m benchmarks.bench_votes --players 12 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.batch.headless_ui_system import HeadlessUISystem
+from src.engine.game_config import GameConfig, Role
+from src.engine.game_engine import GameContext, Player
+from src.engine.player_engine import AgentToolSkills
+
+from .bench_game import distribution
+
+class ScriptedVoter(Player):
+    """投票给下一个存活座位的玩家，与PlayerAgent.play_action一样在决策开始时重置技能状态"""
+
+    def __init__(self, playerId: str, playerRole: str, delay: float) -> None:
+        super().__init__(playerId, playerRole)
+        self.delay = delay
+
+    async def vote(self) -> None:
+        self.skill_stats.update(skill_used=False)
+        await asyncio.sleep(self.delay)
+        alive = GameContext.current().game.players.alive_ids()
+        target = alive[(alive.index(self.playerId) + 1) % len(alive)]
+        AgentToolSkills.vote(target)
+
+    async def speech(self) -> None:
+        pass
+
+    async def justify(self) -> None:
+        pass
+
+    async def testament(self) -> None:
+        pass
+
+    async def night_private_speech(self) -> None:
+        pass
+
+    async def night_action(self) -> None:
+        self.skill_stats.update(skill_used=False)
+        await asyncio.sleep(self.delay)
+        players = GameContext.current().game.players
+        villagers = [player.playerId for player in players.alive_players(Role.VILLAGER)]
+        if self.role == Role.WEREWOLF:
+            AgentToolSkills.werewolf_vote(villagers[0])
+        elif self.role == Role.SEER:
+            AgentToolSkills.seer_investigate(players.alive_players(Role.WEREWOLF)[0].playerId)
+        elif self.role == Role.WITCH:
+            AgentToolSkills.witch_poison(villagers[-1])
+
+async def collect_round(players: int, delay: float) -> float:
+    config = GameConfig.current()
+    context = GameContext.create(HeadlessUISystem())
+    with context.use():
+        for index in range(players):
+            context.game.add_player(ScriptedVoter(f"player{index + 1}", config.role_names[Role.VILLAGER], delay))
+        context.game.current_phase = config.translate.get("vote", "vote")
+        start_time = time.perf_counter()
+        await context.day._collect_votes()
+        elapsed = time.perf_counter() - start_time
+        tallies = sum(context.day.vote_data.values())
+        assert tallies == players, f"{players}名玩家投票，只记录了{tallies}票"
+    return elapsed
+
+NIGHT_ROLES = (Role.WEREWOLF, Role.WEREWOLF, Role.WEREWOLF, Role.SEER, Role.WITCH,
+               Role.VILLAGER, Role.VILLAGER, Role.VILLAGER)
+
+async def night_round(delay: float) -> float:
+    """运行一个夜晚：狼人投票与预言家查验在并行夜晚模式下同时进行"""
+    config = GameConfig.current()
+    context = GameContext.create(HeadlessUISystem())
+    with context.use():
+        for index, role in enumerate(NIGHT_ROLES):
+            context.game.add_player(ScriptedVoter(f"player{index + 1}", config.role_names[role], delay))
+        start_time = time.perf_counter()
+        await context.night.build_action_graph().run(concurrent=config.concurrency.parallel_night)
+        elapsed = time.perf_counter() - start_time
+        night = context.night
+        assert night.werewolf_kill_target == "player6", f"狼人击杀目标没有记录: {night.werewolf_kill_target}"
+        assert len(night.seer_results) == 1, "预言家的查验结果没有记录"
+        assert night.witch_poison_target == "player8", f"女巫的毒药没有记录: {night.witch_poison_target}"
+        for player in context.game.players.alive_players():
+            has_flag = "witch_poison" in player.skill_stats
+            assert has_flag == (player.role == Role.WITCH), f"{player.playerId}的技能状态中出现了女巫的药剂标记"
+    return elapsed
+
+class PhaseRecorder(HeadlessUISystem):
+    """按顺序记录广播的阶段"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.phases: List[str] = []
+
+    def phase(self, phase: str) -> None:
+        self.phases.append(phase)
+
+async def night_phases(delay: float) -> None:
+    """运行一个完整的夜晚，检查串行夜晚依次广播各行动阶段，并行夜晚只广播一个夜晚阶段，不出现交错的阶段"""
+    config = GameConfig.current()
+    ui = PhaseRecorder()
+    context = GameContext.create(ui)
+    with context.use():
+        for index, role in enumerate(NIGHT_ROLES):
+            context.game.add_player(ScriptedVoter(f"player{index + 1}", config.role_names[role], delay))
+        await context.night.start()
+    if config.concurrency.parallel_night:
+        keys = ("night_phase", "night_results")
+    else:
+        keys = ("werewolf_speech", "werewolf_vote", "witch_action", "seer_action", "night_results")
+    expected = [config.translate.get(key, key) for key in keys]
+    assert ui.phases == expected, f"夜晚广播的阶段为{ui.phases}，应为{expected}"
+
+def witch_potions() -> None:
+    """女巫在两个夜晚分别尝试使用解药与毒药：第一次生效并记录被救的玩家，第二次提示药剂已使用"""
+    config = GameConfig.current()
+    translate = config.translate
+    context = GameContext.create(HeadlessUISystem())
+    with context.use():
+        for index, role in enumerate(NIGHT_ROLES):
+            context.game.add_player(ScriptedVoter(f"player{index + 1}", config.role_names[role], 0))
+        witch = context.game.players.alive_players(Role.WITCH)[0]
+        context.game.current_player = witch
+        night = context.night
+        for target in ("player6", "player7"):
+            witch.skill_stats.update(skill_used=False)
+            night.werewolf_kill_target = target
+            night.witch_poison_target = None
+            saved = AgentToolSkills.witch_save()
+            witch.skill_stats.update(skill_used=False)
+            poisoned = AgentToolSkills.witch_poison("player8")
+            if target == "player6":
+                assert saved == translate.get("witch_save_success", "witch save success"), saved
+                assert night.werewolf_kill_target is None, "解药没有救下被击杀的玩家"
+                assert target in context.memory.memory[-2][2], f"解药的记录中没有被救的玩家: {context.memory.memory[-2][2]}"
+                assert night.witch_poison_target == "player8", "毒药没有生效"
+            else:
+                assert saved == translate.get("witch_save_already", "witch save already"), f"解药被再次使用: {saved}"
+                assert night.werewolf_kill_target == target, "已使用的解药仍然救下了玩家"
+                assert poisoned == translate.get("witch_poison_already", "witch poison already"), f"毒药被再次使用: {poisoned}"
+                assert night.witch_poison_target is None, "已使用的毒药仍然生效"
+
+async def concurrent_games(games: int, players: int, delay: float) -> float:
+    """同一进程内同时运行games局的投票与夜晚，每局使用自己的游戏上下文"""
+    start_time = time.perf_counter()
+    await asyncio.gather(*(
+        step for _ in range(games) for step in (collect_round(players, delay), night_round(delay))
+    ))
+    return time.perf_counter() - start_time
+
+async def run_benchmark(players: int, rounds: int, delay: float, games: int) -> Dict:
+    report: Dict = {"players": players, "rounds": rounds, "delay": delay, "games": games}
+    witch_potions()
+    base = GameConfig.current()
+    for name, concurrent in (("sequential", False), ("concurrent", True)):
+        GameConfig.override(concurrency=replace(base.concurrency, concurrent_vote=concurrent, max_concurrent_votes=0))
+        report[name] = distribution([await collect_round(players, delay) for _ in range(rounds)])
+    for name, parallel in (("sequential_night", False), ("parallel_night", True)):
+        GameConfig.override(concurrency=replace(base.concurrency, concurrent_vote=True, max_concurrent_votes=0,
+                                                parallel_night=parallel))
+        await night_phases(delay)
+        report[name] = distribution([await night_round(delay) for _ in range(rounds)])
+    report["concurrent_games"] = distribution([await concurrent_games(games, players, delay) for _ in range(rounds)])
+    GameConfig.override(concurrency=base.concurrency)
+    return report
+
+def print_report(report: Dict) -> None:
+    print(f"{report['players']}名玩家，{report['rounds']}轮，每次决策{report['delay'] * 1e3:.0f}毫秒，每轮计票数均等于投票人数，"
+          f"每个夜晚的击杀、查验与毒药均被记录，每瓶药只能使用一次，{report['games']}局同时进行时互不干扰")
+    print(f"{'case':<18}{'p50(ms)':>12}{'max(ms)':>12}")
+    for case in ("sequential", "concurrent", "sequential_night", "parallel_night", "concurrent_games"):
+        print(f"{case:<18}{report[case]['p50'] * 1e3:>12.2f}{report[case]['max'] * 1e3:>12.2f}")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="投票收集基准测试")
+    parser.add_argument("--players", type=int, default=12, help="投票人数")
+    parser.add_argument("--rounds", type=int, default=20, help="每种方式收集的轮数")
+    parser.add_argument("--games", type=int, default=4, help="同一进程内同时运行的对局数")
+    parser.add_argument("--delay", type=float, default=0.01, help="每次决策的模拟延迟秒数")
+    parser.add_argument("--output", default="logs/benchmarks/votes.json", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(args.players, args.rounds, args.delay, args.games))
+    print_report(report)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {output}")
+
+if __name__ == "__main__":
+    main()
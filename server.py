@@ -1,37 +1,22 @@
-from src.engine.game_engine import *
-from src.engine.player_engine import *
-from src.web.web_ui_system import WebUISystem
-from src.web.websocket_server import WebSocketServer
-from src.web.event_recorder import EventRecorder
-from src.web.replay_system import ReplaySystem
+# 只导入启动HTTP服务所需的模块，玩家智能体(llama_index与LLM后端)在端口监听后由preload_agent_stack加载
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from src.web.room_manager import GameRoom, RoomManager, agent_stack_status, preload_agent_stack
+from src.llm.metrics import PROMETHEUS_CONTENT_TYPE, llm_metrics
 import asyncio
-import threading
 from aiohttp import web
 from pathlib import Path
+from typing import Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 创建Web组件
-__WebSocketServer = WebSocketServer()
-__EventRecorder = EventRecorder()
-__ReplaySystem = ReplaySystem(__EventRecorder, __WebSocketServer)
-# 使用Web UI系统替换原有的UISystem
-__WebUISystem = WebUISystem(__WebSocketServer, __EventRecorder)
-logger.info(f"WebUISystem.__init__: event_queue id={id(__WebSocketServer.event_queue) if hasattr(__WebSocketServer, 'event_queue') else 'N/A'}")
-__GameController = GameController()
-__DaySystem = DaySystem()
-__NightSystem = NightSystem()
-__PublicMemory = PublicMemory()
+DEFAULT_ROOM_ID = "default"
 
 class GameEntry:
     def __init__(self):
-        # 创建事件队列用于游戏逻辑和Web服务器之间的通信
-        self.event_queue = asyncio.Queue()
-        logger.info(f"GameEntry.__init__: event_queue id={id(self.event_queue)}, event_loop id={id(asyncio.get_event_loop())}")
-        # 创建连接等待事件
-        self.connection_event = asyncio.Event()
+        # 房间管理器在事件循环启动后创建
+        self.room_manager: Optional[RoomManager] = None
         # 创建HTTP应用
         self.app = web.Application()
         self.setup_http_routes()
@@ -45,12 +30,26 @@ class GameEntry:
         # 主页
         self.app.router.add_get('/', self.index_handler)
         
-        # WebSocket路由
+        # WebSocket路由，通过?room=<id>订阅指定房间
         self.app.router.add_get('/ws', self.websocket_handler)
         
         # API路由
         self.app.router.add_get('/api/status', self.status_handler)
         self.app.router.add_get('/api/game-state', self.game_state_handler)
+        self.app.router.add_get('/api/rooms', self.list_rooms_handler)
+        self.app.router.add_post('/api/rooms', self.create_room_handler)
+        self.app.router.add_get('/api/rooms/{room_id}', self.room_handler)
+        self.app.router.add_get('/api/metrics', self.metrics_handler)
+        self.app.router.add_get('/api/replays', self.list_replays_handler)
+        self.app.router.add_get('/api/replays/{game_id}', self.replay_events_handler)
+        
+    def get_room(self, request) -> GameRoom:
+        """根据请求中的room参数获取房间，未指定时使用默认房间"""
+        room_id = request.query.get("room", DEFAULT_ROOM_ID)
+        room = self.room_manager.get_room(room_id)
+        if room is None:
+            raise web.HTTPNotFound(text=f"房间不存在: {room_id}")
+        return room
         
     async def index_handler(self, request):
         """主页处理器"""
@@ -65,110 +64,145 @@ class GameEntry:
             
     async def websocket_handler(self, request):
         """WebSocket处理器"""
+        room = self.get_room(request)
         ws = web.WebSocketResponse()
         await ws.prepare(request)
         
-        # 将WebSocket连接传递给WebSocketServer处理
-        await self.websocket_server._handle_connection(ws, request.path)
+        # 将WebSocket连接传递给房间的WebSocketServer处理
+        await room.websocket_server._handle_connection(ws, request.path)
         
         return ws
         
     async def status_handler(self, request):
         """状态API处理器"""
+        if self.room_manager is None:
+            return web.json_response({"server_status": "starting", "agent_stack": agent_stack_status()})
+        rooms = self.room_manager.rooms.values()
         status = {
             "server_status": "running",
-            "websocket_connections": self.websocket_server.get_observer_count(),
-            "total_events": len(self.event_recorder.events)
+            "agent_stack": agent_stack_status(),
+            "websocket_connections": sum(room.websocket_server.get_observer_count() for room in rooms),
+            "total_events": sum(len(room.event_recorder.events) for room in rooms),
+            "total_rooms": len(self.room_manager.rooms),
+            "running_games": self.room_manager.running_count(),
+            "max_running_games": self.room_manager.max_running_games
         }
         return web.json_response(status)
         
     async def game_state_handler(self, request):
         """游戏状态API处理器"""
-        game_state = await self.web_ui_system.get_game_state()
+        game_state = await self.get_room(request).web_ui_system.get_game_state()
         return web.json_response(game_state)
         
-    @property
-    def websocket_server(self) -> WebSocketServer:
-        return Architecture.Get(WebSocketServer)
-
-    @property
-    def event_recorder(self) -> EventRecorder:
-        return Architecture.Get(EventRecorder)
-
-    @property
-    def replay_system(self) -> ReplaySystem:
-        return Architecture.Get(ReplaySystem)
-        
-    @property
-    def web_ui_system(self) -> WebUISystem:
-        return Architecture.Get(WebUISystem)
+    async def list_rooms_handler(self, request):
+        """房间列表API处理器"""
+        return web.json_response(self.room_manager.list_rooms())
+        
+    async def create_room_handler(self, request):
+        """创建房间API处理器，可选参数: room_id, room(角色配置), autostart"""
+        body = {}
+        if request.can_read_body:
+            try:
+                body = await request.json()
+            except ValueError:
+                raise web.HTTPBadRequest(text="请求体必须是JSON对象")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text="请求体必须是JSON对象")
+        try:
+            room = self.room_manager.create_room(
+                room_id=body.get("room_id"),
+                room_config=body.get("room"),
+                autostart=bool(body.get("autostart", False))
+            )
+        except ValueError as e:
+            raise web.HTTPBadRequest(text=str(e))
+        except KeyError as e:
+            raise web.HTTPConflict(text=e.args[0])
+        except RuntimeError as e:
+            raise web.HTTPServiceUnavailable(text=str(e))
+        return web.json_response(room.summary(), status=201)
+        
+    async def room_handler(self, request):
+        """房间详情API处理器"""
+        room = self.room_manager.get_room(request.match_info["room_id"])
+        if room is None:
+            raise web.HTTPNotFound(text=f"房间不存在: {request.match_info['room_id']}")
+        return web.json_response(room.summary())
+        
+    async def list_replays_handler(self, request):
+        """回放归档目录API处理器"""
+        archive = self.room_manager.archive
+        if archive is None:
+            return web.json_response([])
+        return web.json_response(await asyncio.to_thread(archive.list_games))
+        
+    async def replay_events_handler(self, request):
+        """归档对局API处理器，可选参数: start(起始序列号), count(事件数，最多1000)"""
+        game_id = request.match_info["game_id"]
+        archive = self.room_manager.archive
+        try:
+            start = int(request.query.get("start", 0))
+            count = min(int(request.query.get("count", 100)), 1000)
+        except ValueError:
+            raise web.HTTPBadRequest(text="start与count必须是整数")
+        
+        def read_events():
+            game = archive.open_game(game_id) if archive is not None else None
+            if game is None:
+                return None
+            events = []
+            for event in game.iter_events(start):
+                if len(events) >= count:
+                    break
+                events.append(event)
+            return {"summary": game.summary, "total_events": len(game), "events": events}
+        
+        result = await asyncio.to_thread(read_events)
+        if result is None:
+            raise web.HTTPNotFound(text=f"回放不存在: {game_id}")
+        return web.json_response(result)
+        
+    async def metrics_handler(self, request):
+        """Prometheus指标API处理器"""
+        return web.Response(
+            body=llm_metrics.render().encode("utf-8"),
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE}
+        )
                 
     async def start_web_server(self):
         """启动Web服务器"""
         logger.info("start_web_server called")
-        # 设置事件队列和连接事件
-        self.websocket_server.set_event_queue(self.event_queue)
-        self.websocket_server.set_connection_event(self.connection_event)
-        
         # 启动HTTP服务器
         runner = web.AppRunner(self.app)
         await runner.setup()
         
-        site = web.TCPSite(runner, "localhost", 8080)
+        web_config = ProjectConfig().FindItem("web", {})
+        host = web_config.get("http_host", "localhost")
+        port = web_config.get("http_port", 8080)
+        site = web.TCPSite(runner, host, port)
         await site.start()
         
-        print("HTTP服务器启动在 http://localhost:8080")
-        print("WebSocket服务器启动在 ws://localhost:8765")
-        
-    async def wait_for_connection(self):
-        """等待至少一个用户连接"""
-        logger.info("wait_for_connection called")
-        print("等待用户连接...")
-        await self.connection_event.wait()
-        print(f"用户已连接，开始游戏。当前连接数: {self.websocket_server.get_observer_count()}")
-        
-    async def run_game_logic(self):
-        """在事件循环中运行异步游戏逻辑"""
-        logger.info("run_game_logic called")
-        config = ProjectConfig()
-        # 配置游戏房间
-        room:Dict[str,int] = config.FindItem("room")
-        game:GameController = Architecture.Get(GameController)
-        # 开始记录游戏事件
-        self.event_recorder.start_game()
-        playerId:int = 1
-        for playerRole,playerCount in room.items():
-            for i in range(playerCount):
-                game.add_player(PlayerAgent.create(f"player{playerId}",playerRole))
-                playerId += 1
-        # 开始游戏（假设start_game可以异步执行，否则直接调用）
-        if hasattr(game, 'start_game') and callable(getattr(game, 'start_game')):
-            result = game.start_game()
-            if hasattr(result, '__await__'):
-                await result
-        # 游戏结束后保存事件
-        self.event_recorder.end_game()
+        print(f"HTTP服务器启动在 http://{host}:{port}")
+        print(f"WebSocket订阅地址 ws://{host}:{port}/ws?room=<房间ID>")
+        return runner
         
     async def start(self) -> None:
-        """异步启动游戏"""
+        """异步启动服务器"""
         logger.info("GameEntry.start called")
+        self.room_manager = RoomManager.from_config()
+        runner = await self.start_web_server()
+        preload_agent_stack()
         try:
-            # 启动Web服务器
-            await self.start_web_server()
-            # 等待至少一个用户连接
-            await self.wait_for_connection()
-            # 同时运行游戏逻辑和消息处理
-            await asyncio.gather(
-                self.run_game_logic(),
-                self.websocket_server.process_event_queue()
-            )
+            # 默认房间在第一个观察者连接后开始游戏
+            self.room_manager.create_room(DEFAULT_ROOM_ID)
+            await asyncio.Event().wait()
         except Exception as e:
-            logger.exception(f"asyncio.gather or start failed: {e}")
+            logger.exception(f"server start failed: {e}")
+        finally:
+            await self.room_manager.shutdown()
+            await runner.cleanup()
 
 entry:GameEntry = GameEntry()
 
-Architecture.RegisterGeneric(
-    entry,
-     lambda: asyncio.run(entry.start()),
-     GameController
-     )
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(entry.start())
@@ -0,0 +1,50 @@
+import time
+import logging
+from typing import Optional
+
+from src.engine.game_engine import UISystem
+from src.web.event_recorder import EventRecorder
+
+__logger__ = logging.getLogger(__name__)
+
+class HeadlessUISystem(UISystem):
+    """无界面的UI系统，不输出到控制台，仅把游戏事件写入事件录制器"""
+
+    def __init__(self, event_recorder: Optional[EventRecorder] = None):
+        super().__init__(register=False)
+        self.event_recorder = event_recorder
+
+    def _record(self, event_type: str, data: dict) -> None:
+        if self.event_recorder is not None:
+            self.event_recorder.record_event(event_type, data)
+
+    def title(self, title: str) -> None:
+        self._record("title", {"title": title})
+
+    def phase(self, phase: str) -> None:
+        self._record("phase", {"phase": phase})
+
+    def public_speech(self, playerId: str, role: str, message: str) -> None:
+        self._record("public_speech", {
+            "playerId": playerId,
+            "role": role,
+            "message": message,
+            "speech_type": "public",
+            "timestamp": time.time()
+        })
+
+    def private_speech(self, playerId: str, role: str, message: str) -> None:
+        self._record("private_speech", {
+            "playerId": playerId,
+            "role": role,
+            "message": message,
+            "speech_type": "private",
+            "timestamp": time.time()
+        })
+
+    def system_message(self, message: str) -> None:
+        self._record("system_message", {
+            "message": message,
+            "message_type": "system",
+            "timestamp": time.time()
+        })
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from src.engine.game_engine import GameContext
+from src.engine.player_engine import PlayerAgent, SetupLLMSettings
+from src.llm.response_cache import CACHE_MODE_ENV, CACHE_MODES
+from src.web.event_recorder import EventRecorder
+from src.web.replay_archive import ReplayArchive
+
+from .headless_ui_system import HeadlessUISystem
+
+__logger__ = logging.getLogger(__name__)
+
+async def play_headless_game(game_index: int, output_dir: Path, room_config: Dict[str, int]) -> Dict:
+    """运行一局无界面游戏，返回该局的结果摘要"""
+    event_recorder = EventRecorder(str(output_dir / f"game_{game_index:05d}.json"), register=False)
+    context = GameContext.create(HeadlessUISystem(event_recorder), game_id=f"game_{game_index:05d}")
+    result: Dict = {"game_index": game_index, "pid": os.getpid()}
+    start_time = time.perf_counter()
+    try:
+        event_recorder.start_game()
+        playerId: int = 1
+        for playerRole, playerCount in room_config.items():
+            for _ in range(playerCount):
+                context.game.add_player(PlayerAgent.create(f"player{playerId}", playerRole))
+                playerId += 1
+        result.update(setup_time=time.perf_counter() - start_time)
+        await context.game.astart_game()
+        result.update(
+            victory_conditions=context.game.victory_conditions,
+            rounds=context.game.round,
+        )
+    except Exception as e:
+        __logger__.exception(f"第 {game_index} 局游戏失败: {e}")
+        result.update(error=repr(e))
+    finally:
+        event_recorder.end_game(context.llm_usage.as_dict())
+        # 工作进程退出时不会等待守护线程，结束前确认本局日志已写完
+        await asyncio.to_thread(event_recorder.wait_written)
+        await archive_game(game_index, output_dir, room_config, event_recorder, context)
+        # 同一工作进程之后的对局复用这些智能体
+        for player in context.game.players.values():
+            player.release_agent()
+        result.update(duration=time.perf_counter() - start_time)
+    return result
+
+async def archive_game(game_index: int, output_dir: Path, room_config: Dict[str, int],
+                       event_recorder: EventRecorder, context: GameContext) -> None:
+    """把一局写入输出目录下replays中的回放归档"""
+    archive = ReplayArchive.from_config(str(output_dir / "replays"))
+    if archive is None:
+        return
+    try:
+        await asyncio.to_thread(
+            archive.archive_game, f"game_{game_index:05d}", event_recorder.events,
+            roles=room_config, winner=context.game.victory_conditions, rounds=context.game.round,
+        )
+    except Exception as e:
+        __logger__.error(f"第 {game_index} 局归档回放失败: {e}")
+
+async def _play_games(game_indices: List[int], games_per_worker: int, output_dir: Path) -> List[Dict]:
+    # 同一进程内并发的对局各自持有游戏上下文，玩家各自持有技能状态，当前玩家与阶段按对局记录在任务上下文中
+    room_config = ProjectConfig().FindItem("room")
+    slots = asyncio.Semaphore(max(1, games_per_worker))
+
+    async def play(game_index: int) -> Dict:
+        async with slots:
+            return await play_headless_game(game_index, output_dir, room_config)
+
+    return await asyncio.gather(*(play(game_index) for game_index in game_indices))
+
+def run_worker(game_indices: List[int], games_per_worker: int, output_dir: str) -> List[Dict]:
+    """进程池工作函数，在单个进程内并发运行多局游戏"""
+    # 每个工作进程按当前环境重新建立LLM客户端，不复用父进程fork来的连接
+    SetupLLMSettings()
+    return asyncio.run(_play_games(game_indices, games_per_worker, Path(output_dir)))
+
+def run_tournament(
+    total_games:        int,
+    workers:            int = 1,
+    games_per_worker:   int = 1,
+    output_dir:         str = "logs/tournament"
+    ) -> Dict:
+    """把total_games局游戏分配到进程池中运行，返回汇总统计"""
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(workers, total_games))
+    chunks = [list(range(worker, total_games, workers)) for worker in range(workers)]
+
+    start_time = time.perf_counter()
+    results: List[Dict] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_worker, chunk, games_per_worker, output_dir) for chunk in chunks if chunk]
+        for future in futures:
+            results.extend(future.result())
+    wall_time = time.perf_counter() - start_time
+
+    return summarize_results(results, wall_time)
+
+def summarize_results(results: List[Dict], wall_time: float) -> Dict:
+    """汇总胜率、回合数与吞吐量"""
+    finished = [result for result in results if "error" not in result]
+    victories: Dict[str, int] = {}
+    for result in finished:
+        victory = result.get("victory_conditions") or "unknown"
+        victories[victory] = victories.get(victory, 0) + 1
+    rounds = [result["rounds"] for result in finished]
+    setup_times = [result["setup_time"] for result in results if "setup_time" in result]
+    return {
+        "total_games": len(results),
+        "finished_games": len(finished),
+        "failed_games": len(results) - len(finished),
+        "win_rates": {victory: count / len(finished) for victory, count in victories.items()} if finished else {},
+        "average_rounds": sum(rounds) / len(rounds) if rounds else 0,
+        "max_rounds": max(rounds) if rounds else 0,
+        "average_game_duration": sum(result["duration"] for result in results) / len(results) if results else 0,
+        "average_setup_time": sum(setup_times) / len(setup_times) if setup_times else 0,
+        "max_setup_time": max(setup_times) if setup_times else 0,
+        "wall_time": wall_time,
+        "games_per_hour": len(finished) / wall_time * 3600 if wall_time > 0 else 0,
+    }
+
+def print_summary(summary: Dict) -> None:
+    print(f"总局数: {summary['total_games']}  完成: {summary['finished_games']}  失败: {summary['failed_games']}")
+    for victory, rate in summary["win_rates"].items():
+        print(f"\t- {victory}: {rate:.1%}")
+    print(f"平均回合数: {summary['average_rounds']:.2f}  最大回合数: {summary['max_rounds']}")
+    print(f"单局平均耗时: {summary['average_game_duration']:.2f}秒")
+    print(f"单局准备耗时: 平均 {summary['average_setup_time'] * 1000:.2f}毫秒  最大 {summary['max_setup_time'] * 1000:.2f}毫秒")
+    print(f"总耗时: {summary['wall_time']:.2f}秒  吞吐量: {summary['games_per_hour']:.1f} 局/小时")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="无界面批量对局")
+    parser.add_argument("--games", type=int, default=10, help="总对局数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="进程池大小")
+    parser.add_argument("--games-per-worker", type=int, default=1, help="每个进程同时运行的对局数")
+    parser.add_argument("--output-dir", default="logs/tournament", help="每局事件记录的输出目录")
+    parser.add_argument("--cache-mode", choices=CACHE_MODES, default=None, help="本次运行的LLM响应缓存模式，覆盖配置")
+    args = parser.parse_args(argv)
+
+    if args.cache_mode is not None:
+        # 工作进程继承环境变量，在导入时按该模式创建缓存
+        os.environ[CACHE_MODE_ENV] = args.cache_mode
+
+    logging.basicConfig(level=logging.WARNING)
+    print_summary(run_tournament(args.games, args.workers, args.games_per_worker, args.output_dir))
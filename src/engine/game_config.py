@@ -0,0 +1,123 @@
+from Convention.Convention.Runtime.GlobalConfig      import ProjectConfig
+
+from dataclasses                                        import dataclass, replace
+from enum                                               import IntEnum
+from types                                              import MappingProxyType
+from typing                                             import *
+
+class Role(IntEnum):
+    """玩家角色，热路径上的角色判断使用整数比较而不是比较本地化的角色名"""
+    UNKNOWN     = 0
+    VILLAGER    = 1
+    WEREWOLF    = 2
+    SEER        = 3
+    WITCH       = 4
+
+# 角色 -> Translate中角色名的键
+ROLE_TRANSLATE_KEYS:Dict[Role,str] = {
+    Role.VILLAGER:  "villager",
+    Role.WEREWOLF:  "werewolf",
+    Role.SEER:      "seer",
+    Role.WITCH:     "witch",
+}
+
+def _freeze(value:Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key:_freeze(item) for key,item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+@dataclass(frozen=True)
+class ConcurrencyConfig:
+    concurrent_vote:        bool = False
+    # 0表示不限制，即所有存活玩家同时投票
+    max_concurrent_votes:   int  = 0
+    parallel_night:         bool = False
+
+@dataclass(frozen=True)
+class StructuredActionConfig:
+    # 启用后投票、狼人击杀、查验与用药先以一次结构化请求直接决定，失败时再回退到ReAct
+    enabled:                bool = False
+    # 包括第一次请求在内的最大请求次数
+    max_attempts:           int  = 2
+    # 把JSON Schema作为format参数交给后端做约束解码
+    constrained_decoding:   bool = True
+
+@dataclass(frozen=True)
+class GameConfig:
+    """游戏配置
+
+    config.json在第一次使用时读取一次并冻结为只读结构，引擎与智能体在热路径上直接读取字段，
+    不再反复构造ProjectConfig并查找Translate表
+    """
+    translate:          Mapping[str,Any]
+    role_names:         Mapping[Role,str]
+    role_by_name:       Mapping[str,Role]
+    room:               Mapping[str,int]
+    allow_memory_stats: Mapping[str,Tuple[str,...]]
+    max_memory_count:   int
+    memory_compaction:  Mapping[str,Any]
+    prompt_layout:      str
+    history_verbose:    bool
+    agent_verbose:      bool
+    react_config:       Mapping[str,Any]
+    game_prompt:        Mapping[str,Any]
+    role_prompt:        Mapping[str,Any]
+    dynamic_context:    Mapping[str,Any]
+    concurrency:        ConcurrencyConfig
+    structured_action:  StructuredActionConfig
+    context_tools:      bool
+    stream_speech:      bool
+
+    @classmethod
+    def from_project_config(cls) -> "GameConfig":
+        config = ProjectConfig()
+        translate = _freeze(config.FindItem("Translate",{}))
+        role_names = {role:translate.get(key,key) for role,key in ROLE_TRANSLATE_KEYS.items()}
+        return cls(
+            translate=          translate,
+            role_names=         MappingProxyType(role_names),
+            role_by_name=       MappingProxyType({name:role for role,name in role_names.items()}),
+            room=               _freeze(config.FindItem("room",{})),
+            allow_memory_stats= _freeze(config.FindItem("allow_memory_stats",{})),
+            max_memory_count=   config.FindItem("max_memory_count",0),
+            memory_compaction=  _freeze(config.FindItem("memory_compaction",{})),
+            prompt_layout=      config.FindItem("prompt_layout","classic"),
+            history_verbose=    config.FindItem("history_verbose",False),
+            agent_verbose=      config.FindItem("agent_verbose",False),
+            react_config=       _freeze(config.FindItem("react_config",{})),
+            game_prompt=        _freeze(config.FindItem("game_prompt",{})),
+            role_prompt=        _freeze(config.FindItem("role_prompt",{})),
+            dynamic_context=    _freeze(config.FindItem("dynamic_context",{})),
+            concurrency=        ConcurrencyConfig(**config.FindItem("concurrency_config",{})),
+            structured_action=  StructuredActionConfig(**config.FindItem("structured_action",{})),
+            context_tools=      config.FindItem("context_tools",False),
+            stream_speech=      config.FindItem("stream_speech",False),
+        )
+
+    @staticmethod
+    def current() -> "GameConfig":
+        global _current_game_config
+        if _current_game_config is None:
+            _current_game_config = GameConfig.from_project_config()
+        return _current_game_config
+
+    @staticmethod
+    def reload() -> "GameConfig":
+        """重新读取config.json"""
+        global _current_game_config
+        _current_game_config = None
+        return GameConfig.current()
+
+    @staticmethod
+    def override(**changes:Any) -> "GameConfig":
+        """以替换部分字段后的配置作为当前配置，用于在同一进程中对比不同设置"""
+        global _current_game_config
+        _current_game_config = replace(GameConfig.current(), **changes)
+        return _current_game_config
+
+    def role_of(self, role_name:str) -> Role:
+        return self.role_by_name.get(role_name, Role.UNKNOWN)
+
+_current_game_config:Optional[GameConfig] = None
@@ -2,84 +2,222 @@ from typing                                             import *
 
 from Convention.Convention.Runtime.Config            import *
 from Convention.Convention.Runtime.Architecture      import Architecture
-from Convention.Convention.Runtime.GlobalConfig      import ProjectConfig
 
 from abc                                                import ABC, abstractmethod
 
+from contextlib                                         import contextmanager
+from contextvars                                        import ContextVar
+
+from array                                              import array
+
+import                                                         asyncio
+import                                                         bisect
 import                                                         logging
 
+from src.llm.metrics                                    import LLMUsage
+
+from .game_config                                       import GameConfig, Role
+
 __logger__ = logging.getLogger(__name__)
 
 class Player(ABC):
-    def __init__(self,playerId:str,playerRole:str,*,skill_stats:Dict[str,bool]={}) -> None:
+    def __init__(self,playerId:str,playerRole:str,*,skill_stats:Optional[Dict[str,bool]]=None) -> None:
         self.playerId:      str     = playerId
         self.playerRole:    str     = playerRole
+        self.role:          Role    = GameConfig.current().role_of(playerRole)
         self.is_alive:      bool    = True
         self.cause_of_death:Optional[str] = None
-        skill_stats.update(skill_used=False)
-        self.skill_stats:   Dict[str,bool] = skill_stats
+        # 每个玩家持有自己的技能状态，并发行动的玩家之间、同一进程的不同对局之间互不影响
+        self.skill_stats:   Dict[str,bool] = dict(skill_stats or {})
+        self.skill_stats.update(skill_used=False)
+        # 所在的玩家表，死亡时由玩家表增量更新存活索引
+        self.table:         Optional[PlayerTable] = None
 
     def kill(self, cause_of_death:str) -> None:
         if self.is_alive:
             self.is_alive = False
             self.cause_of_death = cause_of_death
+            if self.table is not None:
+                self.table.on_player_killed(self)
 
     @property
     def is_werewolf(self) -> bool:
-        config = ProjectConfig()
-        return self.playerRole == config.FindItem("Translate",{}).get("werewolf","werewolf")
+        return self.role == Role.WEREWOLF
     
     @property
     def is_villager(self) -> bool:
-        config = ProjectConfig()
-        return self.playerRole == config.FindItem("Translate",{}).get("villager","villager")
+        return self.role == Role.VILLAGER
+
+    def release_agent(self) -> None:
+        """对局结束后释放玩家占用的智能体，默认没有需要释放的资源"""
+        pass
 
     @abstractmethod
-    def speech(self) -> None:
+    async def speech(self) -> None:
         pass
     
     @abstractmethod
-    def vote(self) -> None:
+    async def vote(self) -> None:
         pass
     
     @abstractmethod
-    def justify(self) -> None:
+    async def justify(self) -> None:
         pass
     
     @abstractmethod
-    def testament(self) -> None:
+    async def testament(self) -> None:
         pass
 
     @abstractmethod
-    def night_private_speech(self) -> None:
+    async def night_private_speech(self) -> None:
         pass
 
     @abstractmethod
-    def night_action(self) -> None:
+    async def night_action(self) -> None:
         pass
 
 #region 游戏主控
 
-class GameController:
+class PlayerTable(Mapping[str,Player]):
+    """按座位顺序存放玩家的紧凑表
+
+    以playerId为键的只读映射，同时维护存活座位、各角色存活座位与已死亡座位的有序索引，
+    玩家死亡时增量更新，存活列表与胜负判断不再需要遍历全部玩家
+    """
+
+    __slots__ = ("_players","_ids","_seat_of","_roles","_alive","_alive_seats","_alive_by_role","_dead_seats")
+
     def __init__(self) -> None:
-        config = ProjectConfig()
-        print(config.FindItem("Translate",{}).get("game_controller_registered","game controller registered"))
-        Architecture.RegisterGeneric(
-            self,
-            lambda: __logger__.log(
-                logging.INFO,
-                config.FindItem("Translate",{}).get("game_controller_registered","game controller registered")
-            ))
-        self.players:           Dict[str,Player]    = {}
-        self.current_player:    Player              = None
-        self.current_phase:     str                 = "night"
+        self._players:      List[Player]        = []
+        self._ids:          List[str]           = []
+        self._seat_of:      Dict[str,int]       = {}
+        self._roles:        array               = array("B")
+        self._alive:        bytearray           = bytearray()
+        self._alive_seats:  List[int]           = []
+        self._alive_by_role:Dict[Role,List[int]]= {role:[] for role in Role}
+        self._dead_seats:   List[int]           = []
+
+    def add(self, player:Player) -> None:
+        if player.playerId in self._seat_of:
+            raise ValueError(f"player {player.playerId} already exists")
+        seat = len(self._players)
+        self._players.append(player)
+        self._ids.append(player.playerId)
+        self._seat_of[player.playerId] = seat
+        self._roles.append(player.role)
+        self._alive.append(player.is_alive)
+        if player.is_alive:
+            self._alive_seats.append(seat)
+            self._alive_by_role[player.role].append(seat)
+        else:
+            self._dead_seats.append(seat)
+        player.table = self
+
+    def on_player_killed(self, player:Player) -> None:
+        seat = self._seat_of[player.playerId]
+        if not self._alive[seat]:
+            return
+        self._alive[seat] = 0
+        for seats in (self._alive_seats, self._alive_by_role[player.role]):
+            del seats[bisect.bisect_left(seats, seat)]
+        bisect.insort(self._dead_seats, seat)
+
+    def __getitem__(self, playerId:str) -> Player:
+        return self._players[self._seat_of[playerId]]
+
+    def __contains__(self, playerId:object) -> bool:
+        return playerId in self._seat_of
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def values(self) -> List[Player]:
+        return self._players
+
+    def items(self) -> Iterator[Tuple[str,Player]]:
+        return zip(self._ids, self._players)
+
+    def alive_players(self, role:Optional[Role]=None) -> List[Player]:
+        seats = self._alive_seats if role is None else self._alive_by_role[role]
+        return [self._players[seat] for seat in seats]
+
+    def alive_ids(self) -> List[str]:
+        return [self._ids[seat] for seat in self._alive_seats]
+
+    def dead_ids(self) -> List[str]:
+        return [self._ids[seat] for seat in self._dead_seats]
+
+    def alive_count(self, role:Optional[Role]=None) -> int:
+        return len(self._alive_seats if role is None else self._alive_by_role[role])
+
+    def alive_werewolf_count(self) -> int:
+        """狼人阵营存活人数"""
+        return len(self._alive_by_role[Role.WEREWOLF])
+
+    def alive_good_count(self) -> int:
+        """好人阵营(村民、预言家、女巫)存活人数"""
+        return len(self._alive_seats) - len(self._alive_by_role[Role.WEREWOLF])
+
+_current_player_var:ContextVar[Tuple[Optional["GameController"],Optional[Player]]] = ContextVar(
+    "current_player", default=(None, None))
+_current_phase_var: ContextVar[Tuple[Optional["GameController"],str]]             = ContextVar(
+    "current_phase", default=(None, "night"))
+
+class GameController:
+    def __init__(self, *, register:bool=True) -> None:
+        config = GameConfig.current()
+        if register:
+            print(config.translate.get("game_controller_registered","game controller registered"))
+            Architecture.RegisterGeneric(
+                self,
+                lambda: __logger__.log(
+                    logging.INFO,
+                    config.translate.get("game_controller_registered","game controller registered")
+                ))
+        # 所属的游戏上下文，为空时使用全局注册表
+        self.context:           Optional[GameContext] = None
+        self.players:           PlayerTable         = PlayerTable()
         self.round:             int                 = 0
         self.victory_conditions:Optional[str]       = None
+
+    # 当前行动玩家与当前阶段按协程上下文隔离，并发的行动之间互不干扰；
+    # 上下文变量只能在模块级创建(不会被回收)，值中带上所属的游戏主控，同一协程先后运行的对局互不可见
+
+    @property
+    def current_player(self) -> Optional[Player]:
+        owner, player = _current_player_var.get()
+        return player if owner is self else None
+
+    @current_player.setter
+    def current_player(self, player:Optional[Player]) -> None:
+        _current_player_var.set((self, player))
+
+    @property
+    def current_phase(self) -> str:
+        owner, phase = _current_phase_var.get()
+        return phase if owner is self else "night"
+
+    @current_phase.setter
+    def current_phase(self, phase:str) -> None:
+        _current_phase_var.set((self, phase))
         
     def start_game(self) -> None:
-        config = ProjectConfig()
-        ui:UISystem = Architecture.Get(UISystem)
-        translate = config.FindItem("Translate",{})
+        asyncio.run(self.astart_game())
+
+    async def astart_game(self) -> None:
+        if self.context is not None:
+            with self.context.use():
+                await self._run_game()
+        else:
+            await self._run_game()
+
+    async def _run_game(self) -> None:
+        config = GameConfig.current()
+        ui:UISystem = GameContext.current().ui
+        translate = config.translate
 
         self.round = 1
         self.current_phase = "night"
@@ -89,41 +227,38 @@ class GameController:
 
         print_colorful(ConsoleFrontColor.GREEN,translate.get("game_start","game start"))
 
+        memory = GameContext.current().memory
         while True:
             ui.title(translate.get("round","round {round}").format(round=self.round))
-            self.start_night()
+            # 上一回合的记忆在后台折叠，与本回合夜晚行动并发执行
+            memory.begin_round(self.round)
+            await self.start_night()
             if self.check_victory_conditions() is not None:
                 break
-            self.start_day()
+            await self.start_day()
             if self.check_victory_conditions() is not None:
                 break
             self.round += 1
+        await memory.finish_compaction()
         
         ui.system_message(self.victory_conditions)
     
     def add_player(self, player:Player) -> None:
-        self.players[player.playerId] = player
+        self.players.add(player)
 
-    def start_day(self) -> None:
-        Architecture.Get(DaySystem).start()
+    async def start_day(self) -> None:
+        await GameContext.current().day.start()
 
-    def start_night(self) -> None:
-        Architecture.Get(NightSystem).start()
+    async def start_night(self) -> None:
+        await GameContext.current().night.start()
 
     def check_victory_conditions(self) -> Optional[str]:
         if self.victory_conditions is not None:
             return self.victory_conditions
-        config = ProjectConfig()
-        translate = config.FindItem("Translate",{})
-        has_villager_alive = False
-        has_werewolf_alive = False
-        for player in self.players.values():
-            if not player.is_alive:
-                continue
-            if player.is_villager:
-                has_villager_alive = True
-            if player.is_werewolf:
-                has_werewolf_alive = True
+        config = GameConfig.current()
+        translate = config.translate
+        has_villager_alive = self.players.alive_count(Role.VILLAGER) > 0
+        has_werewolf_alive = self.players.alive_count(Role.WEREWOLF) > 0
         if not has_villager_alive:
             self.victory_conditions = translate.get("werewolf_victory","werewolf victory")
         if not has_werewolf_alive:
@@ -138,17 +273,18 @@ class GameController:
 #region 游戏流程展示
 
 class UISystem:
-    def __init__(self) -> None:
-        config = ProjectConfig()
-        print(config.FindItem("Translate",{}).get("ui_system_registered","ui system registered"))
-        Architecture.Register(
-            UISystem,
-            self,
-            lambda: __logger__.log(
-                logging.INFO,
-                config.FindItem("Translate",{}).get("ui_system_registered","ui system registered")
+    def __init__(self, *, register:bool=True) -> None:
+        config = GameConfig.current()
+        if register:
+            print(config.translate.get("ui_system_registered","ui system registered"))
+            Architecture.Register(
+                UISystem,
+                self,
+                lambda: __logger__.log(
+                    logging.INFO,
+                    config.translate.get("ui_system_registered","ui system registered")
+                )
             )
-        )
 
     def title(self,title:str) -> None:
         print_colorful(ConsoleFrontColor.RED,f"**{title}**")
@@ -159,6 +295,10 @@ class UISystem:
     def public_speech(self,playerId:str,role:str,message:str) -> None:
         print(f"\t- {ConsoleFrontColor.LIGHTBLUE_EX}{playerId}({role}){ConsoleFrontColor.RESET}：{message}")
 
+    def speech_delta(self,playerId:str,role:str,delta:str) -> None:
+        """公开发言生成过程中的增量文本，完整发言随后仍通过public_speech给出"""
+        pass
+
     def private_speech(self,playerId:str,role:str,message:str) -> None:
         print(f"\t- {ConsoleFrontColor.BLUE}{playerId}({role}){ConsoleFrontColor.RESET}：{message}")
 
@@ -167,84 +307,195 @@ class UISystem:
 
 #endregion
 
+#region 并发行动调度
+
+class DeferredEffects:
+    """并发行动期间暂存各玩家产生的效果，收集结束后按座位顺序统一生效"""
+
+    def __init__(self) -> None:
+        self._pending:Optional[Dict[str,Callable[[],None]]] = None
+
+    @property
+    def collecting(self) -> bool:
+        return self._pending is not None
+
+    def submit(self, playerId:str, effect:Callable[[],None]) -> None:
+        """提交一个效果，收集期间暂存，否则立即生效"""
+        if self._pending is not None:
+            self._pending[playerId] = effect
+        else:
+            effect()
+
+    async def gather(
+        self,
+        players:        List[Player],
+        turn:           Callable[[Player],Awaitable[None]],
+        max_concurrent: int
+        ) -> None:
+        """并发执行players的回合，结束后按players的顺序应用各自暂存的效果"""
+        semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+        async def turn_of(player:Player) -> None:
+            async with semaphore:
+                await turn(player)
+
+        self._pending = {}
+        try:
+            await asyncio.gather(*(turn_of(player) for player in players))
+        finally:
+            pending, self._pending = self._pending, None
+
+        for player in players:
+            effect = pending.get(player.playerId)
+            if effect is not None:
+                effect()
+
+class NightActionGraph:
+    """夜晚行动依赖图，节点按添加顺序构成拓扑序，彼此无依赖的分支可并发执行"""
+
+    def __init__(self) -> None:
+        self.actions:Dict[str,Tuple[Callable[[],Awaitable[None]],Tuple[str,...]]] = {}
+
+    def add(self, name:str, action:Callable[[],Awaitable[None]], *, after:Sequence[str]=()) -> "NightActionGraph":
+        if name in self.actions:
+            raise ValueError(f"night action {name} already exists")
+        for dependency in after:
+            if dependency not in self.actions:
+                raise ValueError(f"night action {name} depends on unknown action {dependency}")
+        self.actions[name] = (action, tuple(after))
+        return self
+
+    async def run(self, concurrent:bool=True) -> None:
+        if not concurrent:
+            for action,_ in self.actions.values():
+                await action()
+            return
+
+        tasks:Dict[str,asyncio.Task] = {}
+
+        async def run_action(action:Callable[[],Awaitable[None]], dependencies:List[asyncio.Task]) -> None:
+            if dependencies:
+                await asyncio.gather(*dependencies)
+            await action()
+
+        for name,(action,after) in self.actions.items():
+            tasks[name] = asyncio.ensure_future(run_action(action, [tasks[dependency] for dependency in after]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+#endregion
+
 #region 发言-投票[-辩护-投票]-放逐 白天环节
 
 class DaySystem:
-    def __init__(self) -> None:
-        Architecture.RegisterGeneric(
-            self,
-            lambda: None,
-            GameController
-        )
+    def __init__(self, *, register:bool=True) -> None:
+        if register:
+            Architecture.RegisterGeneric(
+                self,
+                lambda: None,
+                GameController
+            )
         self.vote_data:Dict[str,int] = {}
+        # 并发投票期间暂存的投票结果，按座位顺序统一生效
+        self.pending_votes:DeferredEffects = DeferredEffects()
 
-    def start(self) -> None:
-        game:GameController = Architecture.Get(GameController)
-        ui:UISystem = Architecture.Get(UISystem)
+    async def start(self) -> None:
+        context = GameContext.current()
+        game:GameController = context.game
+        ui:UISystem = context.ui
 
         # 检查胜利条件
         if game.check_victory_conditions():
             return
 
-        self._speech_and_vote()
+        await self._speech_and_vote()
 
-    def _speech_and_vote(self) -> None:
+    async def _speech_and_vote(self) -> None:
         self.vote_data.clear()
         
-        config = ProjectConfig()
-        ui:UISystem = Architecture.Get(UISystem)
-        game:GameController = Architecture.Get(GameController)
-        speech_translate = config.FindItem("Translate",{}).get("speech","speech")
-        vote_translate = config.FindItem("Translate",{}).get("vote","vote")
+        config = GameConfig.current()
+        context = GameContext.current()
+        ui:UISystem = context.ui
+        game:GameController = context.game
+        speech_translate = config.translate.get("speech","speech")
+        vote_translate = config.translate.get("vote","vote")
         # 进入发言阶段
         ui.phase(speech_translate)
         game.current_phase = speech_translate
-        for player in game.players.values():
+        for player in game.players.alive_players():
             game.current_player = player
-            if player.is_alive:
-                player.speech()
+            await player.speech()
         # 进入第一轮投票
         ui.phase(vote_translate)
         game.current_phase = vote_translate
-        for player in game.players.values():
-            game.current_player = player
-            if player.is_alive:
-                player.vote()
+        await self._collect_votes()
         # 第一轮投票结束
         result = self._check_vote_result()
         if len(result) == 1:
-            self._banished(result[0])
+            await self._banished(result[0])
         else:
-            self._justify_and_vote(result)
+            await self._justify_and_vote(result)
     
-    def _justify_and_vote(self, targetIds:List[str]) -> None:
+    async def _justify_and_vote(self, targetIds:List[str]) -> None:
         self.vote_data.clear()
 
-        config = ProjectConfig()
-        ui:UISystem = Architecture.Get(UISystem)
-        game:GameController = Architecture.Get(GameController)
-        justify_translate = config.FindItem("Translate",{}).get("justify","justify")
-        vote_translate = config.FindItem("Translate",{}).get("vote","vote")
+        config = GameConfig.current()
+        context = GameContext.current()
+        ui:UISystem = context.ui
+        game:GameController = context.game
+        justify_translate = config.translate.get("justify","justify")
+        vote_translate = config.translate.get("vote","vote")
         # 进入辩护发言阶段
         ui.phase(justify_translate)
         game.current_phase = justify_translate
         for targetId in targetIds:
             game.current_player = game.players[targetId]
-            game.current_player.justify()
+            await game.current_player.justify()
         # 进入第二轮投票
         ui.phase(vote_translate)
         game.current_phase = vote_translate
-        for player in game.players.values():
-            game.current_player = player
-            if player.is_alive:
-                player.vote()
+        await self._collect_votes()
         result = self._check_vote_result()
         # 辩护发言与第二轮投票结束
         if len(result) == 1:
-            self._banished(result[0])
+            await self._banished(result[0])
         else:
             self._abandon_banishment()
 
+    async def _collect_votes(self) -> None:
+        """收集所有存活玩家的投票
+
+        并发模式下所有玩家基于同一份发言记忆同时决策，
+        决策结果暂存后按座位顺序写入票数、记忆与界面，保证日志可复现
+        """
+        concurrency = GameConfig.current().concurrency
+        game:GameController = GameContext.current().game
+        voters = game.players.alive_players()
+
+        if not concurrency.concurrent_vote or len(voters) <= 1:
+            for player in voters:
+                game.current_player = player
+                await player.vote()
+            return
+
+        async def vote_of(player:Player) -> None:
+            game.current_player = player
+            await player.vote()
+
+        await self.pending_votes.gather(
+            voters,
+            vote_of,
+            concurrency.max_concurrent_votes or len(voters)
+            )
+
+    def submit_vote(self, playerId:str, apply_vote:Callable[[],None]) -> None:
+        """提交一张投票，并发收集期间暂存，否则立即生效"""
+        self.pending_votes.submit(playerId, apply_vote)
+
     def vote(self,targetId:str) -> None:
         if targetId not in self.vote_data:
             self.vote_data[targetId] = 1
@@ -260,25 +511,25 @@ class DaySystem:
                 result.append(targetId)
         return result
 
-    def _banished(self, targetId:str) -> None:
-        config = ProjectConfig()
-        game:GameController = Architecture.Get(GameController)
-        game.current_phase = config.FindItem("Translate",{}).get("testament","testament")
-        ui:UISystem = Architecture.Get(UISystem)
+    async def _banished(self, targetId:str) -> None:
+        config = GameConfig.current()
+        context = GameContext.current()
+        game:GameController = context.game
+        game.current_phase = config.translate.get("testament","testament")
+        ui:UISystem = context.ui
         ui.system_message(
-            config.FindItem("Translate",{}
-                ).get("banished_result","banished result:{targetId} has been banished"
+            config.translate.get("banished_result","banished result:{targetId} has been banished"
                 ).format(targetId=targetId)
             )
-        game.players[targetId].kill(config.FindItem("Translate",{}).get("banished","banished"))
-        game.players[targetId].testament()
+        game.players[targetId].kill(config.translate.get("banished","banished"))
+        await game.players[targetId].testament()
         self._back_to_day_system()
 
     def _abandon_banishment(self) -> None:
-        config = ProjectConfig()
-        ui:UISystem = Architecture.Get(UISystem)
+        config = GameConfig.current()
+        ui:UISystem = GameContext.current().ui
         ui.system_message(
-            config.FindItem("Translate",{}).get("abandon_banishment",f"no one has been banished")
+            config.translate.get("abandon_banishment",f"no one has been banished")
             )
         self._back_to_day_system()
 
@@ -290,32 +541,54 @@ class DaySystem:
 #region 拥有夜晚行动能力的角色依次进行{群体讨论/思考-决策发动技能} 夜晚环节
 
 class NightSystem:
-    def __init__(self) -> None:
-        Architecture.RegisterGeneric(
-            self,
-            lambda: None,
-            GameController
-        )
+    def __init__(self, *, register:bool=True) -> None:
+        if register:
+            Architecture.RegisterGeneric(
+                self,
+                lambda: None,
+                GameController
+            )
         self.werewolf_kill_target: Optional[str] = None
         self.werewolf_vote_data:Dict[str,int] = {}
-
-    def start(self) -> None:
-        config = ProjectConfig()
-        game: GameController = Architecture.Get(GameController)
-        ui: UISystem = Architecture.Get(UISystem)
+        self.witch_poison_target: Optional[str] = None
+        # 狼人投票在并发收集期间暂存，按座位顺序生效
+        self.pending_werewolf_votes:DeferredEffects = DeferredEffects()
+        # 夜晚行动产生的效果，在_execute_night_results中按固定顺序统一生效
+        self.seer_results:List[Callable[[],None]] = []
+        # 并行夜晚中各行动分支同时进行，不再各自广播阶段
+        self.parallel_night:bool = False
+
+    def build_action_graph(self) -> NightActionGraph:
+        """夜晚行动依赖图: 预言家 ∥ (狼人讨论 → 狼人投票 → 女巫)"""
+        return NightActionGraph(
+            ).add("werewolf_speech", self._werewolf_speech_start
+            ).add("werewolf_vote", self._werewolf_vote_start, after=["werewolf_speech"]
+            ).add("witch", self._witch_start, after=["werewolf_vote"]
+            ).add("seer", self._seer_start)
+
+    async def start(self) -> None:
+        config = GameConfig.current()
+        context = GameContext.current()
+        game: GameController = context.game
+        ui: UISystem = context.ui
         
         # 检查胜利条件
         if game.check_victory_conditions():
             return
-        
-        self._werewolf_start()
-        ui.system_message(
-            config.FindItem("Translate",{}
-                ).get("werewolf_current_target","werewolf current target: {targetId}")
-                .format(targetId=self.werewolf_kill_target)
-                )
-        self._witch_start()
-        self._seer_start()
+
+        self.werewolf_kill_target = None
+        self.werewolf_vote_data.clear()
+        self.witch_poison_target = None
+        self.seer_results.clear()
+
+        self.parallel_night = config.concurrency.parallel_night
+        if self.parallel_night:
+            # 预言家与狼人同时行动，只广播一个夜晚阶段，避免各分支的阶段交错
+            phase = config.translate.get("night_phase","night phase")
+            game.current_phase = phase
+            ui.phase(phase)
+
+        await self.build_action_graph().run(concurrent=self.parallel_night)
 
         self._execute_night_results()
 
@@ -325,6 +598,14 @@ class NightSystem:
         else:
             self.werewolf_vote_data[targetId] += 1
 
+    def submit_werewolf_vote(self, playerId:str, apply_vote:Callable[[],None]) -> None:
+        """提交一张狼人投票，并发收集期间暂存，否则立即生效"""
+        self.pending_werewolf_votes.submit(playerId, apply_vote)
+
+    def submit_seer_result(self, apply_result:Callable[[],None]) -> None:
+        """提交预言家查验结果，夜晚结算时生效"""
+        self.seer_results.append(apply_result)
+
     def _werewolf_vote_result(self) -> None:
         if not self.werewolf_vote_data.values():
             return
@@ -335,105 +616,216 @@ class NightSystem:
                 return
         return
 
-    def _werewolf_start(self) -> None:
-        """狼人夜晚行动"""
-        config = ProjectConfig()
-        game: GameController = Architecture.Get(GameController)
-        ui: UISystem = Architecture.Get(UISystem)
+    def _enter_phase(self, phase:str) -> None:
+        """进入夜晚行动阶段，并行夜晚中只更新本分支的当前阶段"""
+        context = GameContext.current()
+        context.game.current_phase = phase
+        if not self.parallel_night:
+            context.ui.phase(phase)
 
-        werewolves = [player for player in game.players.values() 
-                     if player.is_werewolf and player.is_alive]
-                     
-        self.werewolf_kill_target = None
-        self.werewolf_vote_data.clear()
-            
-        phase = config.FindItem("Translate",{}).get("werewolf_speech","werewolf speech")
-        game.current_phase = phase
-        ui.phase(phase)
+    def _alive_werewolves(self) -> List[Player]:
+        game: GameController = GameContext.current().game
+        return game.players.alive_players(Role.WEREWOLF)
+
+    async def _werewolf_speech_start(self) -> None:
+        """狼人夜晚讨论"""
+        config = GameConfig.current()
+        game: GameController = GameContext.current().game
+
+        self._enter_phase(config.translate.get("werewolf_speech","werewolf speech"))
         
-        for werewolf in werewolves:
+        for werewolf in self._alive_werewolves():
             game.current_player = werewolf
             if werewolf.is_alive:
-                werewolf.night_private_speech()
-        
-        phase = config.FindItem("Translate",{}).get("werewolf_vote","werewolf vote")
-        game.current_phase = phase
-        ui.phase(phase)
-        
-        for werewolf in werewolves:
+                await werewolf.night_private_speech()
+
+    async def _werewolf_vote_start(self) -> None:
+        """狼人夜晚投票，各狼人的投票互不依赖"""
+        config = GameConfig.current()
+        context = GameContext.current()
+        game: GameController = context.game
+        ui: UISystem = context.ui
+        concurrency = config.concurrency
+
+        werewolves = self._alive_werewolves()
+
+        self._enter_phase(config.translate.get("werewolf_vote","werewolf vote"))
+
+        async def vote_of(werewolf:Player) -> None:
             game.current_player = werewolf
-            if werewolf.is_alive:
-                werewolf.night_action()
+            await werewolf.night_action()
+
+        if concurrency.concurrent_vote and len(werewolves) > 1:
+            await self.pending_werewolf_votes.gather(
+                werewolves,
+                vote_of,
+                concurrency.max_concurrent_votes or len(werewolves)
+                )
+        else:
+            for werewolf in werewolves:
+                await vote_of(werewolf)
 
         self._werewolf_vote_result()
+        ui.system_message(
+            config.translate.get("werewolf_current_target","werewolf current target: {targetId}")
+                .format(targetId=self.werewolf_kill_target)
+                )
 
-    def _seer_start(self) -> None:
+    async def _seer_start(self) -> None:
         """预言家夜晚行动"""
-        config = ProjectConfig()
-        game: GameController = Architecture.Get(GameController)
-        ui: UISystem = Architecture.Get(UISystem)
+        config = GameConfig.current()
+        game: GameController = GameContext.current().game
         
-        seers = [player for player in game.players.values() 
-                if player.playerRole == config.FindItem("Translate",{}).get("seer","seer") 
-                and player.is_alive]
+        seers = game.players.alive_players(Role.SEER)
         
         if not seers:
             return
 
-        phase = config.FindItem("Translate",{}).get("seer_action","seer action")
-        game.current_phase = phase
-        ui.phase(phase)
+        self._enter_phase(config.translate.get("seer_action","seer action"))
         
         for seer in seers:
             game.current_player = seer
             if seer.is_alive:
-                seer.night_action()
+                await seer.night_action()
 
-    def _witch_start(self) -> None:
+    async def _witch_start(self) -> None:
         """女巫夜晚行动"""
-        config = ProjectConfig()
-        game: GameController = Architecture.Get(GameController)
-        ui: UISystem = Architecture.Get(UISystem)
+        config = GameConfig.current()
+        game: GameController = GameContext.current().game
         
         # 获取存活的女巫
-        witches = [player for player in game.players.values() 
-                  if player.playerRole == config.FindItem("Translate",{}).get("witch","witch") 
-                  and player.is_alive]
+        witches = game.players.alive_players(Role.WITCH)
         
         if not witches:
             return
 
-        phase = config.FindItem("Translate",{}).get("witch_action","witch action")
-        game.current_phase = phase
-        ui.phase(phase)
+        self._enter_phase(config.translate.get("witch_action","witch action"))
         
         for witch in witches:
             game.current_player = witch
             if witch.is_alive:
-                witch.night_action()
+                await witch.night_action()
     
     def _execute_night_results(self) -> None:
-        """执行夜晚结果"""
-        config = ProjectConfig()
-        game: GameController = Architecture.Get(GameController)
-        ui: UISystem = Architecture.Get(UISystem)
+        """执行夜晚结果，依次结算狼人击杀、女巫毒药与预言家查验"""
+        config = GameConfig.current()
+        context = GameContext.current()
+        game: GameController = context.game
+        ui: UISystem = context.ui
         
-        phase = config.FindItem("Translate",{}).get("night_results","night results")
+        phase = config.translate.get("night_results","night results")
         game.current_phase = phase
         ui.phase(phase)
         
         if self.werewolf_kill_target:
             game.players[self.werewolf_kill_target].kill(
-                config.FindItem("Translate",{}).get("werewolf_kill","werewolf kill"))
+                config.translate.get("werewolf_kill","werewolf kill"))
             ui.system_message(
-                config.FindItem("Translate",{}
-                    ).get("night_death","night death: {playerId} was killed by werewolves"
+                config.translate.get("night_death","night death: {playerId} was killed by werewolves"
                     ).format(playerId=self.werewolf_kill_target)
             )
         else:
             ui.system_message(
-                config.FindItem("Translate",{}
-                    ).get("night_no_kill","night no kill")
+                config.translate.get("night_no_kill","night no kill")
             )
 
+        if self.witch_poison_target:
+            game.players[self.witch_poison_target].kill(
+                config.translate.get("witch_kill","witch kill"))
+
+        for apply_result in self.seer_results:
+            apply_result()
+        self.seer_results.clear()
+
+#endregion
+
+#region 游戏上下文
+
+_current_game_context:ContextVar[Optional["GameContext"]] = ContextVar("current_game_context", default=None)
+
+class GameContext:
+    """单局游戏拥有的系统集合
+
+    替代全局Architecture注册表，通过上下文变量绑定到运行该局游戏的协程，
+    智能体与技能工具经由GameContext.current()获取所属对局的系统，
+    使同一进程内可以同时运行多局互不干扰的游戏
+    """
+
+    def __init__(
+        self,
+        ui:     "UISystem",
+        game:   "GameController",
+        day:    "DaySystem",
+        night:  "NightSystem",
+        memory: Any,
+        game_id:Optional[str] = None,
+        ) -> None:
+        self.ui:        UISystem        = ui
+        self.game:      GameController  = game
+        self.day:       DaySystem       = day
+        self.night:     NightSystem     = night
+        self.memory:    Any             = memory
+        # 用于在指标与事件中区分同一进程内的多局游戏
+        self.game_id:   str             = game_id if game_id is not None else f"{id(self):x}"
+        # 本局的LLM用量合计，游戏结束时写入game_end事件
+        self.llm_usage: LLMUsage        = LLMUsage()
+        game.context = self
+
+    @classmethod
+    def create(cls, ui:Optional["UISystem"]=None, game_id:Optional[str]=None) -> "GameContext":
+        """创建一局不注册到全局Architecture的独立游戏"""
+        from .memory import PublicMemory
+        return cls(
+            ui if ui is not None else UISystem(register=False),
+            GameController(register=False),
+            DaySystem(register=False),
+            NightSystem(register=False),
+            PublicMemory(register=False),
+            game_id=game_id,
+        )
+
+    @staticmethod
+    def current() -> "GameContext":
+        """当前协程绑定的游戏上下文，未绑定时回退到全局Architecture注册表"""
+        context = _current_game_context.get()
+        return context if context is not None else _global_game_context
+
+    @contextmanager
+    def use(self) -> Iterator["GameContext"]:
+        token = _current_game_context.set(self)
+        try:
+            yield self
+        finally:
+            _current_game_context.reset(token)
+
+class _ArchitectureGameContext(GameContext):
+    """兼容单局模式，从全局Architecture注册表解析各个系统"""
+
+    def __init__(self) -> None:
+        self.game_id:   str         = "global"
+        self.llm_usage: LLMUsage    = LLMUsage()
+
+    @property
+    def ui(self) -> "UISystem":
+        return Architecture.Get(UISystem)
+
+    @property
+    def game(self) -> "GameController":
+        return Architecture.Get(GameController)
+
+    @property
+    def day(self) -> "DaySystem":
+        return Architecture.Get(DaySystem)
+
+    @property
+    def night(self) -> "NightSystem":
+        return Architecture.Get(NightSystem)
+
+    @property
+    def memory(self) -> Any:
+        from .memory import PublicMemory
+        return Architecture.Get(PublicMemory)
+
+_global_game_context:GameContext = _ArchitectureGameContext()
+
 #endregion
@@ -0,0 +1,195 @@
+from Convention.Convention.Runtime.Architecture                 import Architecture
+
+import                                                             asyncio
+import                                                             bisect
+import                                                             heapq
+import                                                             logging
+
+from typing                                             import *
+
+from .game_config                                       import GameConfig
+from .game_engine                                       import GameController, GameContext
+
+__logger__ = logging.getLogger(__name__)
+
+#region 公共记忆
+
+class MemorySummarizer:
+    """把一个回合的记忆折叠为一条摘要，rule模式按环节截断拼接，llm模式调用模型概括"""
+
+    def __init__(self, compaction_config:Dict[str,Any]) -> None:
+        translate = GameConfig.current().translate
+        self.mode:str = compaction_config.get("mode","rule")
+        self.speech_chars:int = compaction_config.get("speech_chars",60)
+        self.summary_format:str = translate.get("memory_summary_format","- round {round} summary:\n{content}")
+        self.summary_prompt:str = translate.get(
+            "memory_summary_prompt",
+            "Summarize the following werewolf game records of round {round} in a few sentences, keeping who said what, votes and deaths:\n{content}")
+
+    def rule_summary(self, entries:List[Tuple[str,str,str]]) -> str:
+        groups:Dict[str,List[str]] = {}
+        for playerId,stats,content in entries:
+            content = content.replace("\n"," ").strip()
+            if len(content) > self.speech_chars:
+                content = content[:self.speech_chars] + "…"
+            groups.setdefault(stats,[]).append(f"{playerId}: {content}")
+        return "\n".join(f"{stats}: " + "；".join(items) for stats,items in groups.items())
+
+    async def summarize(self, round:int, entries:List[Tuple[str,str,str]]) -> str:
+        content = self.rule_summary(entries)
+        if self.mode == "llm":
+            try:
+                # 模型相关模块只在第一次需要模型时导入
+                from llama_index.core.settings import Settings
+                from .player_engine import EnsureLLMSettings
+                EnsureLLMSettings()
+                response = await Settings.llm.acomplete(self.summary_prompt.format(round=round,content=content))
+                content = response.text.strip() or content
+            except Exception as e:
+                __logger__.warning(f"第{round}回合记忆摘要失败，改用规则摘要: {e}")
+        return self.summary_format.format(round=round,content=content)
+
+class PublicMemory:
+    """公共记忆
+
+    每条记忆在写入时格式化一次，并按阶段(stats)与由allow_memory_stats派生的角色可见视图建立索引，
+    读取时只访问最终返回的条目。开启memory_compaction后，每个回合结束时在后台把该回合的记忆
+    按视图折叠为摘要，之后的读取返回历史回合摘要加上未折叠回合的原始记忆
+    """
+
+    def __init__(self, *, register:bool=True) -> None:
+        config = GameConfig.current()
+        self.memory:List[Tuple[str,str,str]] = []
+        self.format_string:str = config.translate.get("memory_format","- player {playerId} said {stats}: \n{content}")
+        self.max_memory_count:int = config.max_memory_count
+        # 与memory一一对应的格式化文本
+        self._formatted:List[str] = []
+        # 阶段 -> 该阶段记忆的下标
+        self._stats_index:Dict[str,List[int]] = {}
+        # 可见阶段集合 -> 可见记忆的下标
+        self._views:Dict[FrozenSet[str],List[int]] = {}
+        # 阶段 -> 包含该阶段的视图
+        self._views_by_stats:Dict[str,List[List[int]]] = {}
+
+        compaction_config = config.memory_compaction
+        self.compaction_enabled:bool = compaction_config.get("enabled",False)
+        self.summarizer = MemorySummarizer(compaction_config)
+        self.round:int = 1
+        # 回合 -> 该回合第一条记忆的下标
+        self._round_start:Dict[int,int] = {1: 0}
+        # 可见阶段集合 -> 已折叠回合的摘要
+        self._summaries:Dict[FrozenSet[str],List[str]] = {}
+        self.compacted_round:int = 0
+        # 每完成一次折叠加一，用于让增量读取方感知历史被改写
+        self.compactions:int = 0
+        self._compaction_task:Optional[asyncio.Task] = None
+
+        for allow_stats in config.allow_memory_stats.values():
+            self._view(allow_stats)
+        if register:
+            print(config.translate.get("public_memory_registered","public memory registered"))
+            Architecture.RegisterGeneric(
+                self, 
+                lambda: __logger__.log(
+                    logging.INFO,
+                    config.translate.get("public_memory_registered","public memory registered")
+                ), GameController)
+
+    def _view(self, allow_stats:Iterable[str]) -> List[int]:
+        key = frozenset(allow_stats)
+        view = self._views.get(key)
+        if view is None:
+            # 新的可见集合只在第一次读取时由各阶段索引合并得到，之后随写入增量维护
+            view = list(heapq.merge(*(self._stats_index.get(stats,[]) for stats in key)))
+            self._views[key] = view
+            for stats in key:
+                self._views_by_stats.setdefault(stats,[]).append(view)
+            if self.compacted_round:
+                self._summaries[key] = [
+                    self.summarizer.summary_format.format(round=round,content=self.summarizer.rule_summary(entries))
+                    for round in range(1,self.compacted_round+1)
+                    if (entries := self._round_entries(view,round))
+                ]
+        return view
+
+    def _round_entries(self, view:List[int], round:int) -> List[Tuple[str,str,str]]:
+        start = self._round_start.get(round,len(self.memory))
+        end = self._round_start.get(round+1,len(self.memory))
+        return [self.memory[index] for index in view[bisect.bisect_left(view,start):bisect.bisect_left(view,end)]]
+
+    def read_lines(self, allow_stats:List[str]) -> List[str]:
+        '''
+        读取可见的记忆条目：已折叠回合的摘要加上之后的原始记忆，最多max_memory_count条
+        '''
+        view = self._view(allow_stats)
+        summaries = self._summaries.get(frozenset(allow_stats),[])
+        raw_start = bisect.bisect_left(view,self._round_start[self.compacted_round+1]) if self.compacted_round else 0
+        if self.max_memory_count > 0:
+            raw_start = max(raw_start,len(view)-self.max_memory_count)
+        lines = summaries + [self._formatted[index] for index in view[raw_start:]]
+        return lines[-self.max_memory_count:] if self.max_memory_count > 0 else lines
+
+    def read_memory(self, allow_stats:List[str]) -> str:
+        return "---\n".join(self.read_lines(allow_stats))
+
+    def read_since(self, cursor:int, allow_stats:List[str]) -> Tuple[List[str],int]:
+        '''
+        从cursor位置起读取新增的可见记忆，返回格式化后的条目与新的读取位置
+        '''
+        view = self._view(allow_stats)
+        start = bisect.bisect_left(view, cursor)
+        return [self._formatted[index] for index in view[start:]], len(self.memory)
+
+    def add_memory(self,playerId:str,message:str,stats:Optional[str]=None):
+        if stats is None:
+            game:GameController = GameContext.current().game
+            stats = game.current_phase
+        index = len(self.memory)
+        self.memory.append((playerId,stats,message))
+        self._formatted.append(self.format_string.format(playerId=playerId,stats=stats,content=message))
+        self._stats_index.setdefault(stats,[]).append(index)
+        for view in self._views_by_stats.get(stats,[]):
+            view.append(index)
+
+    #region 回合折叠
+
+    def begin_round(self, round:int) -> None:
+        '''
+        标记新回合开始，并在后台折叠上一回合的记忆，与本回合的夜晚行动并发执行
+        '''
+        self.round = round
+        self._round_start[round] = len(self.memory)
+        if self.compaction_enabled and round > 1:
+            self._compaction_task = asyncio.create_task(self._compact_after(self._compaction_task, round-1))
+
+    async def _compact_after(self, previous:Optional[asyncio.Task], round:int) -> None:
+        if previous is not None:
+            await previous
+        await self.compact_round(round)
+
+    async def compact_round(self, round:int) -> None:
+        '''
+        把指定回合的记忆按各个可见视图折叠为摘要，全部完成后一次性替换
+        '''
+        views = list(self._views.items())
+        summaries = await asyncio.gather(*(
+            self.summarizer.summarize(round,entries) if (entries := self._round_entries(view,round)) else asyncio.sleep(0)
+            for _,view in views
+        ))
+        for (key,_),summary in zip(views,summaries):
+            if summary:
+                self._summaries.setdefault(key,[]).append(summary)
+        self.compacted_round = round
+        self.compactions += 1
+
+    async def finish_compaction(self) -> None:
+        '''
+        等待后台折叠完成
+        '''
+        if self._compaction_task is not None:
+            await self._compaction_task
+            self._compaction_task = None
+
+    #endregion
+
+#endregion
@@ -2,67 +2,76 @@ from Convention.Convention.Runtime.Config                       import *
 from Convention.Convention.Runtime.Architecture                 import Architecture
 from Convention.Convention.Runtime.GlobalConfig                 import ProjectConfig
 
+import                                                             asyncio
+import                                                             functools
+import                                                             inspect
+import                                                             json
 import                                                             logging                                                
+import                                                             re
+
+from contextlib                                         import contextmanager
+from contextvars                                        import ContextVar
 
 from typing                                             import *
 from llama_index.core.agent                             import ReActAgent
+from llama_index.core.chat_engine.types                 import AgentChatResponse, StreamingAgentChatResponse
 from llama_index.core.tools                             import BaseTool
-from llama_index.core.llms                              import ChatMessage,ChatResponse,MessageRole
+from llama_index.core.llms                              import ChatMessage,ChatResponse,LLM,MessageRole
 from llama_index.core.settings                          import Settings
-from llama_index.llms.ollama                            import Ollama
 
+from src.llm.metrics                                    import AgentCallRecord, agent_call_scope
+from src.llm.metrics_llm                                import MetricsLLM
+from src.llm.response_cache                             import ResponseCache, CachedLLM
+from src.llm.mock_llm                                   import SimulatedLLM
+from src.llm.router                                     import RoutedLLM
+from src.llm.session                                    import session_scope
+
+from .game_config                                       import GameConfig, Role
+from .memory                                            import MemorySummarizer, PublicMemory
 from .game_engine                                       import (
-    DaySystem, UISystem, GameController, Player, NightSystem
+    DaySystem, UISystem, GameController, Player, NightSystem, GameContext
 )
 
 __logger__ = logging.getLogger(__name__)
 
-def SetupLLMSettings() -> None:
+def CreateBackendLLM(backend_config:Dict[str,Any]) -> LLM:
+    """按单个推理服务端点的配置创建LLM，未给出的项使用config.json顶层的llm_backend、ollama_url与model"""
     config = ProjectConfig()
-    print(config.FindItem("Translate",{}).get("llm_settings_setup","llm settings setup"))
-    __logger__.log(
-        logging.INFO,
-        config.FindItem("Translate",{}).get("llm_settings_registered","llm settings registered")
-    )
-    config = ProjectConfig()
-    ollama_url = config.FindItem("ollama_url", None)
-    model = config.FindItem("model")
-    Settings.llm = Ollama(
-        model=model,
-        base_url=ollama_url,
+    if backend_config.get("backend", config.FindItem("llm_backend", "ollama")) == "mock":
+        return SimulatedLLM.from_config()
+    # Ollama客户端只在真正使用时导入
+    from llama_index.llms.ollama import Ollama
+    return Ollama(
+        model=backend_config.get("model", config.FindItem("model")),
+        base_url=backend_config.get("url", config.FindItem("ollama_url", None)),
         **config.FindItem("agent_config",{}),
     )
 
-SetupLLMSettings()
-
-#region 公共记忆
-
-class PublicMemory:
-    def __init__(self) -> None:
-        config = ProjectConfig()
-        print(config.FindItem("Translate",{}).get("public_memory_registered","public memory registered"))
-        self.memory:List[Tuple[str,str,str]] = []
-        Architecture.RegisterGeneric(
-            self, 
-            lambda: __logger__.log(
-                logging.INFO,
-                config.FindItem("Translate",{}).get("public_memory_registered","public memory registered")
-            ), GameController)
-
-    def read_memory(self, allow_stats:List[str]) -> str:
+def SetupLLMSettings(llm:Optional[LLM]=None) -> None:
+    """配置全局Settings.llm，给出llm时直接使用而不按config.json创建"""
+    global _llm_settings_ready
+    translate = GameConfig.current().translate
+    print(translate.get("llm_settings_setup","llm settings setup"))
+    __logger__.log(
+        logging.INFO,
+        translate.get("llm_settings_registered","llm settings registered")
+    )
+    if llm is None:
         config = ProjectConfig()
-        format_string = config.FindItem("Translate",{}).get("memory_format","- player {playerId} said {stats}: \n{content}")
-        all_memory = list([format_string.format(playerId=playerId,stats=stats,content=content) 
-            for playerId,stats,content in self.memory if stats in allow_stats])
-        max_memory_count = config.FindItem("max_memory_count")
-        read_memory = all_memory[-max_memory_count:] if len(all_memory)>max_memory_count else all_memory
-        return "---\n".join(read_memory)
+        llm = RoutedLLM.from_config(CreateBackendLLM) or CreateBackendLLM({})
+        cache = ResponseCache.from_config()
+        if cache is not None:
+            llm = CachedLLM(llm, cache, config.FindItem("agent_config",{}))
+        llm = MetricsLLM(llm)
+    Settings.llm = llm
+    _llm_settings_ready = True
 
-    def add_memory(self,playerId:str,message:str):
-        game:GameController = Architecture.Get((GameController))
-        self.memory.append((playerId,game.current_phase,message))
+def EnsureLLMSettings() -> None:
+    """导入本模块时不再配置LLM，第一次需要模型时才调用SetupLLMSettings"""
+    if not _llm_settings_ready:
+        SetupLLMSettings()
 
-#endregion
+_llm_settings_ready:bool = False
 
 #region 角色功能
 
@@ -77,14 +86,15 @@ class AgentToolSkills:
         参数:
             message: 玩家发言内容
         '''
-        game:GameController = Architecture.Get((GameController))
-        memory:PublicMemory = Architecture.Get((PublicMemory))
+        context = GameContext.current()
+        game:GameController = context.game
+        memory:PublicMemory = context.memory
         
         current_player:Player = game.current_player
         memory.add_memory(
             current_player.playerId,
             message)
-        ui:UISystem = Architecture.Get((UISystem))
+        ui:UISystem = context.ui
         ui.public_speech(
             current_player.playerId,
             current_player.playerRole,
@@ -111,36 +121,40 @@ class AgentToolSkills:
         返回:
             任务状态
         '''
-        config = ProjectConfig()
-        game:GameController = Architecture.Get((GameController))
-        voteSystem:DaySystem = Architecture.Get((DaySystem))
-        memory:PublicMemory = Architecture.Get((PublicMemory))
+        config = GameConfig.current()
+        context = GameContext.current()
+        game:GameController = context.game
+        voteSystem:DaySystem = context.day
+        memory:PublicMemory = context.memory
 
-        if game.current_phase != config.FindItem("Translate",{}).get("vote","vote"):
-            return config.FindItem("Translate",{}).get("not_vote_phase","not vote phase")
+        if game.current_phase != config.translate.get("vote","vote"):
+            return config.translate.get("not_vote_phase","not vote phase")
 
-        translate = config.FindItem("Translate",{})
+        translate = config.translate
         current_player:Player = game.current_player
 
         if current_player.skill_stats.get("skill_used",True):
-            return config.FindItem("Translate",{}).get("skill_already_used","skill already used")
+            return config.translate.get("skill_already_used","skill already used")
 
         if targetId == current_player.playerId:
-            return config.FindItem("Translate",{}).get("vote_self_not_allowed","vote self is not allowed")
+            return config.translate.get("vote_self_not_allowed","vote self is not allowed")
 
-        voteSystem.vote(targetId)
-        memory.add_memory(
-            current_player.playerId,
-            translate.get("vote_target",f"vote target:{targetId}").format(targetId=targetId))
-        ui:UISystem = Architecture.Get((UISystem))
-        ui.public_speech(
-            current_player.playerId,
-            current_player.playerRole,
-            translate.get("vote_target",f"vote target:{targetId}").format(targetId=targetId))
+        def apply_vote() -> None:
+            voteSystem.vote(targetId)
+            memory.add_memory(
+                current_player.playerId,
+                translate.get("vote_target",f"vote target:{targetId}").format(targetId=targetId))
+            ui:UISystem = GameContext.current().ui
+            ui.public_speech(
+                current_player.playerId,
+                current_player.playerRole,
+                translate.get("vote_target",f"vote target:{targetId}").format(targetId=targetId))
+
+        voteSystem.submit_vote(current_player.playerId, apply_vote)
             
         current_player.skill_stats.update(skill_used=True)
 
-        return config.FindItem("Translate",{}).get("vote_success","vote success")
+        return config.translate.get("vote_success","vote success")
 
     @staticmethod
     def justify(message:str) -> None:
@@ -150,14 +164,15 @@ class AgentToolSkills:
         参数:
             message: 玩家辩护内容
         '''
-        game:GameController = Architecture.Get((GameController))
-        memory:PublicMemory = Architecture.Get((PublicMemory))
+        context = GameContext.current()
+        game:GameController = context.game
+        memory:PublicMemory = context.memory
 
         current_player:Player = game.current_player
         memory.add_memory(
             current_player.playerId,
             message)
-        ui:UISystem = Architecture.Get((UISystem))
+        ui:UISystem = context.ui
         ui.public_speech(
             current_player.playerId,
             current_player.playerRole,
@@ -171,9 +186,10 @@ class AgentToolSkills:
         参数:
             message: 狼人发言内容
         '''
-        game:GameController = Architecture.Get((GameController))
-        ui:UISystem = Architecture.Get((UISystem))
-        memory: PublicMemory = Architecture.Get((PublicMemory))
+        context = GameContext.current()
+        game:GameController = context.game
+        ui:UISystem = context.ui
+        memory: PublicMemory = context.memory
 
         current_player:Player = game.current_player
         memory.add_memory(
@@ -206,37 +222,41 @@ class AgentToolSkills:
         返回:
             任务状态
         '''
-        config = ProjectConfig()
-        game: GameController = Architecture.Get((GameController))
-        night_system:NightSystem = Architecture.Get((NightSystem))
-        ui:UISystem = Architecture.Get((UISystem))
-
-        if game.current_phase != config.FindItem("Translate",{}).get("werewolf_vote","werewolf vote"):
-            return config.FindItem("Translate",{}).get("not_vote_phase","not vote phase")
+        config = GameConfig.current()
+        context = GameContext.current()
+        game: GameController = context.game
+        night_system:NightSystem = context.night
+        ui:UISystem = context.ui
+
+        if game.current_phase != config.translate.get("werewolf_vote","werewolf vote"):
+            return config.translate.get("not_vote_phase","not vote phase")
             
         current_player: Player = game.current_player
         if targetId not in game.players or not game.players[targetId].is_alive:
-            return config.FindItem("Translate",{}).get("not_vote_phase","not vote phase")
+            return config.translate.get("not_vote_phase","not vote phase")
             
         if current_player.skill_stats.get("skill_used",True):
-            return config.FindItem("Translate",{}).get("skill_already_used","skill already used")
+            return config.translate.get("skill_already_used","skill already used")
 
-        night_system.werewolf_vote(targetId)
-        
-        memory: PublicMemory = Architecture.Get((PublicMemory))
-        memory.add_memory(
-            current_player.playerId,
-            f"target: {targetId}"
-            )
-        ui.private_speech(
-            current_player.playerId,
-            current_player.playerRole,
-            str(targetId)
-            )
+        memory: PublicMemory = context.memory
+
+        def apply_vote() -> None:
+            night_system.werewolf_vote(targetId)
+            memory.add_memory(
+                current_player.playerId,
+                f"target: {targetId}"
+                )
+            ui.private_speech(
+                current_player.playerId,
+                current_player.playerRole,
+                str(targetId)
+                )
+
+        night_system.submit_werewolf_vote(current_player.playerId, apply_vote)
 
         current_player.skill_stats.update(skill_used=True)
 
-        return config.FindItem("Translate",{}).get("werewolf_vote_success","werewolf vote success")
+        return config.translate.get("werewolf_vote_success","werewolf vote success")
 
     @staticmethod
     def seer_investigate(targetId: str) -> None:
@@ -254,19 +274,21 @@ class AgentToolSkills:
         参数:
             targetId: 被查验的玩家ID
         '''
-        config = ProjectConfig()
-        game: GameController = Architecture.Get((GameController))
-        ui: UISystem = Architecture.Get((UISystem))
-        memory: PublicMemory = Architecture.Get((PublicMemory))
+        config = GameConfig.current()
+        context = GameContext.current()
+        game: GameController = context.game
+        ui: UISystem = context.ui
+        memory: PublicMemory = context.memory
+        night_system: NightSystem = context.night
 
         current_player: Player = game.current_player
-        translate = config.FindItem("Translate",{})
+        translate = config.translate
             
         if targetId not in game.players or not game.players[targetId].is_alive:
             return
 
         if current_player.skill_stats.get("skill_used",True):
-            return config.FindItem("Translate",{}).get("skill_already_used","skill already used")
+            return config.translate.get("skill_already_used","skill already used")
 
         message = translate.get("seer_result","investigation result: {targetId} {result}"
                 ).format(
@@ -274,14 +296,21 @@ class AgentToolSkills:
                     result=translate.get("is_werewolf","is werewolf") 
                     if game.players[targetId].is_werewolf 
                     else translate.get("not_werewolf","not werewolf"))
-        memory.add_memory(
-            current_player.playerId,
-            message
-            )
-        ui.private_speech(
-            current_player.playerId,
-            current_player.playerRole,
-            message)
+        stats = game.current_phase
+
+        # 查验结果在夜晚结算时按固定顺序生效，不与狼人分支的行动交错
+        def apply_result() -> None:
+            memory.add_memory(
+                current_player.playerId,
+                message,
+                stats
+                )
+            ui.private_speech(
+                current_player.playerId,
+                current_player.playerRole,
+                message)
+
+        night_system.submit_seer_result(apply_result)
 
         current_player.skill_stats.update(skill_used=True)
 
@@ -308,27 +337,28 @@ class AgentToolSkills:
         返回:
             任务状态
         '''
-        config = ProjectConfig()
-        game: GameController = Architecture.Get((GameController))
-        ui: UISystem = Architecture.Get((UISystem))
-        memory: PublicMemory = Architecture.Get((PublicMemory))
-        night_system: NightSystem = Architecture.Get((NightSystem))
+        config = GameConfig.current()
+        context = GameContext.current()
+        game: GameController = context.game
+        ui: UISystem = context.ui
+        memory: PublicMemory = context.memory
+        night_system: NightSystem = context.night
 
         current_player: Player = game.current_player
-        translate = config.FindItem("Translate",{})
+        translate = config.translate
         
         if current_player.skill_stats.get("skill_used",True):
-            return config.FindItem("Translate",{}).get("skill_already_used","skill already used")
+            return config.translate.get("skill_already_used","skill already used")
 
         current_player.skill_stats.update(skill_used=True)
 
         if current_player.skill_stats.get("witch_save",False):
-            return config.FindItem("Translate",{}).get("witch_save_already","witch save already")
+            return config.translate.get("witch_save_already","witch save already")
 
         if night_system.werewolf_kill_target:
-            night_system.werewolf_kill_target = None
             message = translate.get("witch_save_target","witch save target: {targetId}"
                     ).format(targetId=night_system.werewolf_kill_target)
+            night_system.werewolf_kill_target = None
             memory.add_memory(
                 current_player.playerId,
                 message
@@ -339,10 +369,11 @@ class AgentToolSkills:
                 message
                 )
 
-            current_player.skill_stats["witch_save"] = False
-            return config.FindItem("Translate",{}).get("witch_save_success","witch save success")
+            # 药剂只能使用一次，标记记录在女巫自己的技能状态中
+            current_player.skill_stats["witch_save"] = True
+            return config.translate.get("witch_save_success","witch save success")
         else:
-            return config.FindItem("Translate",{}).get("witch_save_not_target","witch save not target")
+            return config.translate.get("witch_save_not_target","witch save not target")
 
     @staticmethod
     def witch_poison(targetId: str) -> str:
@@ -365,26 +396,29 @@ class AgentToolSkills:
         返回:
             任务状态
         '''
-        config = ProjectConfig()
-        game: GameController = Architecture.Get((GameController))
-        ui: UISystem = Architecture.Get((UISystem))
-        memory: PublicMemory = Architecture.Get((PublicMemory))
+        config = GameConfig.current()
+        context = GameContext.current()
+        game: GameController = context.game
+        ui: UISystem = context.ui
+        memory: PublicMemory = context.memory
+        night_system: NightSystem = context.night
 
         current_player: Player = game.current_player
-        translate = config.FindItem("Translate",{})
+        translate = config.translate
         
         if current_player.skill_stats.get("skill_used",True):
-            return config.FindItem("Translate",{}).get("skill_already_used","skill already used")
+            return config.translate.get("skill_already_used","skill already used")
 
         current_player.skill_stats.update(skill_used=True)
 
         if current_player.skill_stats.get("witch_poison",False):
-            return config.FindItem("Translate",{}).get("witch_poison_already","witch poison already")
+            return config.translate.get("witch_poison_already","witch poison already")
 
         if targetId not in game.players or not game.players[targetId].is_alive:
-            return config.FindItem("Translate",{}).get("witch_poison_not_target","witch poison not target")
+            return config.translate.get("witch_poison_not_target","witch poison not target")
 
-        game.players[targetId].kill(translate.get("witch_kill","witch kill"))
+        # 毒杀在夜晚结算时生效，避免与并发的预言家查验产生竞争
+        night_system.witch_poison_target = targetId
         message = translate.get("witch_poison_target","witch poison target: {targetId}"
                 ).format(targetId=targetId)
         memory.add_memory(
@@ -397,8 +431,8 @@ class AgentToolSkills:
             message
             )
 
-        current_player.skill_stats["witch_poison"] = False
-        return config.FindItem("Translate",{}).get("witch_poison_success","witch poison success")
+        current_player.skill_stats["witch_poison"] = True
+        return config.translate.get("witch_poison_success","witch poison success")
 
     @staticmethod
     def get_alive_players() -> List[str]:
@@ -408,9 +442,8 @@ class AgentToolSkills:
         返回:
             存活玩家ID列表
         '''
-        game: GameController = Architecture.Get((GameController))
-        alive_players = [player.playerId for player in game.players.values() if player.is_alive]
-        return alive_players
+        game: GameController = GameContext.current().game
+        return game.players.alive_ids()
 
     @staticmethod
     def get_dead_players() -> List[str]:
@@ -420,9 +453,8 @@ class AgentToolSkills:
         返回:
             死亡玩家ID列表
         '''
-        game: GameController = Architecture.Get((GameController))
-        dead_players = [player.playerId for player in game.players.values() if not player.is_alive]
-        return dead_players
+        game: GameController = GameContext.current().game
+        return game.players.dead_ids()
 
     @staticmethod
     def get_night_kill_target() -> Optional[str]:
@@ -432,8 +464,9 @@ class AgentToolSkills:
         返回:
             狼人击杀目标的ID,如果没有则为空
         '''
-        night_system:NightSystem = Architecture.Get((NightSystem))
-        game: GameController = Architecture.Get((GameController))
+        context = GameContext.current()
+        night_system:NightSystem = context.night
+        game: GameController = context.game
         current_player: Player = game.current_player
         if current_player.skill_stats.get("witch_save",False):
             return None
@@ -444,7 +477,7 @@ class AgentToolSkills:
         '''
         获取玩家自己的id名称
         '''
-        game: GameController = Architecture.Get((GameController))
+        game: GameController = GameContext.current().game
         current_player: Player = game.current_player
         return current_player.playerId
 
@@ -453,7 +486,7 @@ class AgentToolSkills:
         '''
         获取玩家自己扮演的身份
         '''
-        game: GameController = Architecture.Get((GameController))
+        game: GameController = GameContext.current().game
         current_player: Player = game.current_player
         return current_player.playerRole
 
@@ -462,89 +495,224 @@ class AgentToolSkills:
         '''
         获取所有狼人的列表
         '''
-        game: GameController = Architecture.Get((GameController))
+        game: GameController = GameContext.current().game
         return [player.playerId for player in game.players.values() if player.is_werewolf]
 
 #endregion
 
-#region 玩家智能体
+#region 上下文工具
 
-class PlayerAgent(Player):
-    def get_chat_history(self) -> List[ChatMessage]:
-        memory:PublicMemory = Architecture.Get((PublicMemory))
-        config = ProjectConfig()
-        format_prompt_translate = config.FindItem("Translate",{}).get("prompt",{})
-        
-        # 获取当前游戏阶段
-        game:GameController = Architecture.Get((GameController))
-        current_phase = game.current_phase if game else "unknown"
-        
-        # 创建动态上下文管理器
-        context_manager = DynamicContextManager()
-        
-        # 构建动态提示词
-        dynamic_prompt = context_manager.build_dynamic_prompt(self, current_phase)
-        
-        # 获取基础游戏规则
-        game_prompt = config.FindItem("game_prompt", {})
-        basic_rules = game_prompt.get("basic_rules", "")
-        phase_rules = game_prompt.get("phase_rules", {})
-        current_phase_rule = phase_rules.get(current_phase, "")
-        
-        # 获取角色配置
-        role_prompt = config.FindItem("role_prompt", {})
-        role_config = role_prompt.get(self.playerRole, {})
-        role_introduction = role_config.get("role_introduction", "") if isinstance(role_config, dict) else str(role_config)
-        
-        # 构建完整的系统提示词
-        system_prompt = f"""# 游戏规则
-{basic_rules}
+# 只读且在一次决策内结果不变的工具，启用context_tools后在决策开始时计算一次写入提示词，按展示顺序排列
+CONTEXT_TOOLS:Dict[str,Callable[[],Any]] = {
+    "get_who_are_you":          AgentToolSkills.playerId_of_myself,
+    "get_player_role":          AgentToolSkills.playerRole_of_myself,
+    "who_is_werewolf":          AgentToolSkills.who_is_werewolf,
+    "get_alive_players":        AgentToolSkills.get_alive_players,
+    "get_dead_players":         AgentToolSkills.get_dead_players,
+    "get_night_kill_target":    AgentToolSkills.get_night_kill_target,
+}
+CONTEXT_TOOL_LABELS:Dict[str,str] = {
+    "get_who_are_you":          "你的玩家ID",
+    "get_player_role":          "你的身份",
+    "who_is_werewolf":          "狼人玩家",
+    "get_alive_players":        "当前仍存活的玩家",
+    "get_dead_players":         "当前已死亡的玩家",
+    "get_night_kill_target":    "当前狼人选择杀害的对象",
+}
 
-# 当前阶段规则
-{current_phase_rule}
+class TurnContext:
+    """一名玩家一次决策内的上下文工具结果
+
+    决策开始时(尚未让出事件循环，game.current_player仍是该玩家)计算一次，
+    提示词与之后模型仍然发起的工具调用都读取这份结果
+    """
+
+    def __init__(self, tool_names:Iterable[str]) -> None:
+        self.values:Dict[str,Any] = {name:CONTEXT_TOOLS[name]() for name in tool_names}
+
+_current_turn:ContextVar[Optional[TurnContext]] = ContextVar("current_turn", default=None)
+
+@contextmanager
+def turn_scope(tool_names:Iterable[str]) -> Iterator[Optional[TurnContext]]:
+    """未启用context_tools时不建立备忘，工具与提示词照旧实时读取"""
+    if not GameConfig.current().context_tools:
+        yield None
+        return
+    turn = TurnContext(tool_names)
+    token = _current_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        _current_turn.reset(token)
+
+def context_value(name:str) -> Any:
+    turn = _current_turn.get()
+    if turn is not None and name in turn.values:
+        return turn.values[name]
+    return CONTEXT_TOOLS[name]()
+
+_CONTEXT_TOOL_REFERENCE = re.compile(r"(?:使用|通过)([A-Za-z_]+)工具")
+
+def context_tool_docstring(docstring:str) -> str:
+    """把行动工具说明中要求先调用上下文工具的内容改为引用提示词中的「当前局面」"""
+    lines = [line for line in docstring.splitlines() if "【强制工具使用】" not in line]
+    return _CONTEXT_TOOL_REFERENCE.sub(
+        lambda match: "从「当前局面」中" if match.group(1) in CONTEXT_TOOLS else match.group(0),
+        "\n".join(lines))
 
-# 动态上下文
-{dynamic_prompt}
+#endregion
 
-# 角色介绍
-{role_introduction}
+#region 结构化行动
 
-# 工具使用要求
-{game_prompt.get("tool_usage_requirements", "")}
+# 放弃行动的选项，只在本回合的行动都可以不执行时提供(例如女巫不使用药剂)
+SKIP_ACTION = "skip"
+OPTIONAL_ACTIONS = ("witch_save", "witch_poison")
 
-# 当前仍存活的玩家
-{AgentToolSkills.get_alive_players()}
+class StructuredAction:
+    """结构化行动
 
-# 当前已死亡的玩家
-{AgentToolSkills.get_dead_players()}
+    把本回合的合法行动与目标写成JSON Schema，让模型在一次请求中直接给出决定，
+    本地校验后调用对应的技能，省去ReAct循环中先调用信息工具再行动的多次往返
+    """
 
-{
-f'''
-# 当前狼人选择杀害的对象
-{AgentToolSkills.get_night_kill_target()}
-''' if self.playerRole == config.FindItem("Translate",{}).get("witch","witch") else ""
-}
-"""
-        
-        history_memory = memory.read_memory(config.FindItem("allow_memory_stats")[self.playerRole])
+    def __init__(self, player:Player, tool_choice:str) -> None:
+        self.player:    Player                          = player
+        # 行动 -> 可选目标，None表示该行动不需要目标
+        self.options:   Dict[str,Optional[List[str]]]   = self.action_options(player, tool_choice)
 
-        result:List[ChatMessage] = [
-            ChatMessage.from_str(
-                system_prompt,
-                MessageRole.SYSTEM
-                ),
-            ChatMessage.from_str(
-                f"# {format_prompt_translate.get("known_speech_history","known speech history")}\n\n{
-                    history_memory
-                    }",
-                MessageRole.SYSTEM
-                )
-        ]
+    @staticmethod
+    def action_options(player:Player, tool_choice:str) -> Dict[str,Optional[List[str]]]:
+        context = GameContext.current()
+        game:GameController = context.game
+        night_system:NightSystem = context.night
+        actions = tool_choice.split(";")
+        targets = [playerId for playerId in context_value("get_alive_players") if playerId != player.playerId]
+        options:Dict[str,Optional[List[str]]] = {}
+        for action in actions:
+            if action == "witch_save":
+                if not player.skill_stats.get("witch_save",False) and night_system.werewolf_kill_target:
+                    options[action] = None
+            elif action == "witch_poison":
+                if not player.skill_stats.get("witch_poison",False) and targets:
+                    options[action] = targets
+            elif targets:
+                options[action] = targets
+        if all(action in OPTIONAL_ACTIONS for action in actions):
+            options[SKIP_ACTION] = None
+        return options
+
+    @property
+    def only_skip(self) -> bool:
+        return list(self.options) == [SKIP_ACTION]
+
+    def schema(self) -> Dict[str,Any]:
+        branches = []
+        for action, targets in self.options.items():
+            target = {"type":"null"} if targets is None else {"type":"string","enum":targets}
+            branches.append({
+                "type":"object",
+                "properties":{"action":{"type":"string","const":action},"target":target},
+                "required":["action","target"],
+            })
+        return {"anyOf":branches}
+
+    def prompt(self, message:str) -> str:
+        translate = GameConfig.current().translate
+        return translate.get(
+            "structured_action_prompt",
+            "{message}\nReply with one JSON object only. options: {options}\nJSON Schema: {schema}"
+            ).format(
+                message=message,
+                options=json.dumps(self.options, ensure_ascii=False),
+                schema=json.dumps(self.schema(), ensure_ascii=False))
+
+    def parse(self, content:str) -> Tuple[str,Optional[str]]:
+        """解析并校验模型给出的决定，不合法时抛出ValueError，错误信息会作为重试提示交给模型"""
+        start = content.find("{")
+        end = content.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError("没有找到JSON对象")
+        decision = json.loads(content[start:end+1])
+        if not isinstance(decision, dict):
+            raise ValueError("决定必须是JSON对象")
+        action = decision.get("action")
+        if action not in self.options:
+            raise ValueError(f"无效的行动: {action}，可执行的行动: {list(self.options)}")
+        targets = self.options[action]
+        if targets is None:
+            return action, None
+        target = decision.get("target")
+        if target not in targets:
+            raise ValueError(f"无效的目标: {target}，可选目标: {targets}")
+        return action, target
+
+    def apply(self, action:str, target:Optional[str]) -> None:
+        """调用与ReAct路径相同的技能执行决定"""
+        if action == SKIP_ACTION:
+            return
+        skill = getattr(AgentToolSkills, action)
+        result = skill() if target is None else skill(target)
+        if not self.player.skill_stats.get("skill_used",False):
+            raise ValueError(str(result))
 
-        if config.FindItem("history_verbose",False):
+#endregion
+
+#region 智能体池
+
+class AgentPool:
+    """按工具集缓存空闲的ReActAgent
+
+    每次请求都会以传入的chat_history替换智能体的对话记忆，工具又通过GameContext解析当前玩家而不含玩家状态，
+    因此一局结束后重置的智能体可以直接交给之后对局中拥有同一工具集的玩家，不必重新创建
+    """
+
+    def __init__(self) -> None:
+        self._idle:Dict[Tuple[int,...],List[ReActAgent]] = {}
+        self.created:int = 0
+        self.reused:int = 0
+
+    @staticmethod
+    def _key(tools:Sequence[BaseTool]) -> Tuple[int,...]:
+        # 同一角色的玩家共享同一组工具对象
+        return tuple(id(tool) for tool in tools)
+
+    def acquire(self, tools:Sequence[BaseTool]) -> ReActAgent:
+        idle = self._idle.get(self._key(tools))
+        if idle:
+            self.reused += 1
+            return idle.pop()
+        self.created += 1
+        # ReActAgent创建时绑定Settings.llm，第一次创建智能体即第一次需要模型
+        EnsureLLMSettings()
+        config = GameConfig.current()
+        return ReActAgent.from_tools(
+            list(tools),
+            verbose=config.agent_verbose,
+            max_iterations=config.react_config.get("max_iterations", 10),
+            )
+
+    def release(self, tools:Sequence[BaseTool], agent:ReActAgent) -> None:
+        agent.reset()
+        self._idle.setdefault(self._key(tools), []).append(agent)
+
+agent_pool:AgentPool = AgentPool()
+
+#endregion
+
+#region 玩家智能体
+
+class PlayerAgent(Player):
+    def get_chat_history(self) -> List[ChatMessage]:
+        context = GameContext.current()
+        game:GameController = context.game
+        current_phase = game.current_phase if game else "unknown"
+
+        result:List[ChatMessage] = self.prompt_builder.messages(current_phase, context.memory)
+
+        if GameConfig.current().history_verbose:
             print(f'''
 {"-"*10}** get_chat_history **{"-"*10}
-{history_memory}
+{self.prompt_builder.history_text}
 {"-"*10}** get_chat_history **{"-"*10}
 ''')
 
@@ -555,93 +723,187 @@ f'''
         tools:      List[BaseTool], 
         playerId:   str,
         playerRole: str,
-        skill_stats:Dict[str,bool]={}
+        skill_stats:Optional[Dict[str,bool]]=None
         ) -> None:
         super().__init__(
             playerId,
             playerRole,
             skill_stats=skill_stats
         )
-        config = ProjectConfig()
-        agent_config = config.FindItem("react_config", {})
-        max_iterations = agent_config.get("max_iterations", 10)  # 增加最大迭代次数
-        
-        self.agent:     ReActAgent  = ReActAgent.from_tools(
-            tools, 
-            verbose=config.FindItem("agent_verbose",False),
-            max_iterations=max_iterations,  # 设置最大迭代次数
-            )
+        self.tools:     List[BaseTool]          = tools
+        # ReActAgent在玩家第一次决策时才从agent_pool取得
+        self._agent:    Optional[ReActAgent]    = None
+        # 该玩家拥有的上下文工具，决策开始时计算并写入提示词
+        self.context_tool_names:List[str] = [
+            name for name in CONTEXT_TOOLS if name in {tool.metadata.name for tool in tools}
+            ]
+        self.prompt_builder:PromptBuilder = PromptBuilder(self)
+        # 同一玩家的请求使用同一会话，使后端能复用该玩家上一次请求的前缀缓存
+        self.session_id:str = f"{playerId}-{id(self):x}"
+
+    @property
+    def agent(self) -> ReActAgent:
+        if self._agent is None:
+            self._agent = agent_pool.acquire(self.tools)
+        return self._agent
 
-    def play_chat(self, message:str) -> ChatResponse:
-        try:
-            result:ChatResponse = self.agent.chat(f"{message}",self.get_chat_history())
-            return result
-        except ValueError as e:
-            if "Reached max iterations" in str(e):
-                # 当达到最大迭代次数时，提供备用响应
-                config = ProjectConfig()
-                translate = config.FindItem("Translate",{})
-                fallback_message = translate.get('fallback_speech', '我暂时无法详细分析，但我相信我的阵营会取得胜利。')
+    @override
+    def release_agent(self) -> None:
+        """把ReActAgent归还agent_pool，供之后的对局复用"""
+        if self._agent is not None:
+            agent_pool.release(self.tools, self._agent)
+            self._agent = None
+
+    @contextmanager
+    def agent_call(self, decision:str) -> Iterator[AgentCallRecord]:
+        """记录一次决策的耗时、LLM请求与工具调用，计入进程指标与本局用量"""
+        context = GameContext.current()
+        record = AgentCallRecord(
+            game=       context.game_id,
+            round=      context.game.round,
+            phase=      context.game.current_phase,
+            decision=   decision,
+            player=     self.playerId,
+            role=       self.playerRole,
+            )
+        with agent_call_scope(record, context.llm_usage):
+            yield record
+
+    async def play_chat(self, message:str, stream:bool=False) -> ChatResponse:
+        """对话类决策；stream为True时边生成边通过UISystem.speech_delta广播增量，完整文本仍作为返回值"""
+        with self.agent_call("chat") as call:
+            try:
+                with session_scope(self.session_id), turn_scope(self.context_tool_names):
+                    if stream:
+                        result = await self.play_stream_chat(message)
+                    else:
+                        result = await self.agent.achat(f"{message}",self.get_chat_history())
+                call.tool_calls = len(getattr(result, "sources", None) or [])
+                return result
+            except ValueError as e:
+                if "Reached max iterations" in str(e):
+                    call.max_iterations = True
+                    # 当达到最大迭代次数时，提供备用响应
+                    config = GameConfig.current()
+                    translate = config.translate
+                    fallback_message = translate.get('fallback_speech', '我暂时无法详细分析，但我相信我的阵营会取得胜利。')
                 
-                # 创建一个简单的 ChatResponse 对象
-                from llama_index.core.llms import ChatMessage
-                fallback_response = ChatMessage(
-                    role="assistant",
-                    content=fallback_message
-                )
-                return ChatResponse(message=fallback_response)
-            else:
-                raise e
-
-    def play_action(self, message:str, tool_choice:str) -> ChatResponse:
+                    # 创建一个简单的 ChatResponse 对象
+                    from llama_index.core.llms import ChatMessage
+                    fallback_response = ChatMessage(
+                        role="assistant",
+                        content=fallback_message
+                    )
+                    return ChatResponse(message=fallback_response)
+                else:
+                    raise e
+
+    async def play_stream_chat(self, message:str) -> AgentChatResponse:
+        ui:UISystem = GameContext.current().ui
+        response = await self.agent.astream_chat(f"{message}",self.get_chat_history())
+        if not isinstance(response, StreamingAgentChatResponse):
+            # 最终回答不是以流的形式产生(例如经过工具调用后直接结束)，整体作为一个增量发出
+            ui.speech_delta(self.playerId, self.playerRole, str(response))
+            return response
+        async for delta in response.async_response_gen():
+            if delta:
+                ui.speech_delta(self.playerId, self.playerRole, delta)
+        return AgentChatResponse(response=response.response, sources=response.sources)
+
+    async def play_structured_action(self, message:str, tool_choice:str) -> Optional[ChatResponse]:
+        """以结构化请求直接决定行动，请求次数用完仍没有合法决定时返回None，由ReAct路径接手"""
+        config = GameConfig.current()
+        action = StructuredAction(self, tool_choice)
+        if not action.options:
+            return None
+        if action.only_skip:
+            # 没有可执行的行动时不需要请求模型
+            return ChatResponse(message=ChatMessage(
+                role=MessageRole.ASSISTANT,
+                content=json.dumps({"action":SKIP_ACTION,"target":None})))
+
+        EnsureLLMSettings()
+        messages = self.get_chat_history() + [ChatMessage(role=MessageRole.USER, content=action.prompt(message))]
+        kwargs = {"format":action.schema()} if config.structured_action.constrained_decoding else {}
+        for _ in range(config.structured_action.max_attempts):
+            try:
+                with session_scope(self.session_id):
+                    response:ChatResponse = await Settings.llm.achat(messages, **kwargs)
+            except Exception as e:
+                __logger__.warning(f"{self.playerId} 结构化行动请求失败: {e}")
+                return None
+            try:
+                action.apply(*action.parse(response.message.content or ""))
+                return response
+            except ValueError as e:
+                messages = messages + [
+                    response.message,
+                    ChatMessage(
+                        role=MessageRole.USER,
+                        content=config.translate.get(
+                            "structured_action_retry","invalid decision: {error}").format(error=e)),
+                ]
+        __logger__.info(f"{self.playerId} 结构化行动没有得到合法决定，回退到ReAct: {tool_choice}")
+        return None
+
+    async def play_action(self, message:str, tool_choice:str) -> ChatResponse:
         self.skill_stats.update(skill_used=False)
-        for _ in range(1):
-            if(self.skill_stats.get("skill_used",False)):
-                break
-            result:ChatResponse = self.agent.chat(f"{message}",self.get_chat_history(),tool_choice=tool_choice)
+        result:Optional[ChatResponse] = None
+        structured = GameConfig.current().structured_action.enabled
+        with self.agent_call(tool_choice) as call, turn_scope(self.context_tool_names):
+            if structured:
+                result = await self.play_structured_action(message, tool_choice)
+                call.tool_calls = int(self.skill_stats.get("skill_used",False))
+            if result is None:
+                call.structured_fallback = structured
+                with session_scope(self.session_id):
+                    result = await self.agent.achat(f"{message}",self.get_chat_history(),tool_choice=tool_choice)
+                call.tool_calls += len(getattr(result, "sources", None) or [])
         if(not self.skill_stats.get("skill_used",False)):
-            ui:UISystem = Architecture.Get((UISystem))
+            ui:UISystem = GameContext.current().ui
             ui.private_speech(self.playerId,self.playerRole,f"没有执行行动")
         return result
 
     @override
-    def speech(self) -> None:
+    async def speech(self) -> None:
         """发言方法"""
-        config = ProjectConfig()
-        translate = config.FindItem("Translate",{})
+        config = GameConfig.current()
+        translate = config.translate
         message = f"{translate.get('speech_prompt', 'Please make your speech.')}"
-        AgentToolSkills.speech(str(self.play_chat(message)))
+        AgentToolSkills.speech(str(await self.play_chat(message, stream=config.stream_speech)))
 
     @override
-    def vote(self) -> None:
+    async def vote(self) -> None:
         """投票方法"""
-        config = ProjectConfig()
-        translate = config.FindItem("Translate",{})
+        config = GameConfig.current()
+        translate = config.translate
         message = f"{translate.get('vote_prompt', 'Please vote for a player to eliminate.')} Available targets: {AgentToolSkills.get_alive_players()}"
-        self.play_action(message,"vote")
+        await self.play_action(message,"vote")
 
     @override
-    def justify(self) -> None:
+    async def justify(self) -> None:
         """辩护方法"""
-        config = ProjectConfig()
-        translate = config.FindItem("Translate",{})
+        config = GameConfig.current()
+        translate = config.translate
         message = f"{translate.get('justify_prompt', 'Please justify your position.')}"
-        AgentToolSkills.justify(str(self.play_chat(message)))
+        AgentToolSkills.justify(str(await self.play_chat(message, stream=config.stream_speech)))
 
     @override
-    def testament(self) -> None:
+    async def testament(self) -> None:
         """遗言方法"""
-        config = ProjectConfig()
-        translate = config.FindItem("Translate",{})
-        message =str(self.play_chat(
-             f"{translate.get('testament_prompt', 'Please leave your testament.')}"
+        config = GameConfig.current()
+        translate = config.translate
+        message =str(await self.play_chat(
+             f"{translate.get('testament_prompt', 'Please leave your testament.')}",
+             stream=config.stream_speech
              ))
 
-        memory:PublicMemory = Architecture.Get((PublicMemory))
+        context = GameContext.current()
+        memory:PublicMemory = context.memory
         memory.add_memory(
             self.playerId,
             message)
-        ui:UISystem = Architecture.Get((UISystem))
+        ui:UISystem = context.ui
         ui.public_speech(
             self.playerId,
             self.playerRole,
@@ -649,21 +911,20 @@ f'''
 
     @classmethod
     def create(cls,playerId:str,playerRole:str) -> "PlayerAgent":
-        config = ProjectConfig()
-        translate = config.FindItem("Translate",{})
-        if playerRole == translate.get("werewolf","werewolf"):
+        role = GameConfig.current().role_of(playerRole)
+        if role == Role.WEREWOLF:
             return WerewolfAgent(playerId)
-        elif playerRole == translate.get("seer","seer"):
+        elif role == Role.SEER:
             return SeerAgent(playerId)
-        elif playerRole == translate.get("witch","witch"):
+        elif role == Role.WITCH:
             return WitchAgent(playerId)
         else:
             return VillagerAgent(playerId)
 
 class WerewolfAgent(PlayerAgent):
     def __init__(self,playerId:str) -> None:
-        config = ProjectConfig()
-        playerRole = config.FindItem("Translate",{}).get("werewolf","werewolf")
+        config = GameConfig.current()
+        playerRole = config.role_names[Role.WEREWOLF]
         super().__init__(
             create_player_tools(playerRole),
             playerId,
@@ -671,26 +932,25 @@ class WerewolfAgent(PlayerAgent):
             )
     
     @override
-    def night_private_speech(self) -> None:
+    async def night_private_speech(self) -> None:
         """狼人夜晚讨论"""
-        config = ProjectConfig()
-        message = config.FindItem("Translate",{}).get('werewolf_night_speech_prompt','werewolf,please discuss how to choose a target to kill')
-        AgentToolSkills.werewolf_private_speech(str(self.play_chat(message)))
+        config = GameConfig.current()
+        message = config.translate.get('werewolf_night_speech_prompt','werewolf,please discuss how to choose a target to kill')
+        AgentToolSkills.werewolf_private_speech(str(await self.play_chat(message)))
 
     @override
-    def night_action(self) -> None:
+    async def night_action(self) -> None:
         """狼人夜晚投票击杀玩家"""
-        config = ProjectConfig()
-        self.play_action(
-            f"{config.FindItem("Translate",{}
-                ).get('werewolf_night_prompt','werewolf,please vote a player to kill')}",
+        config = GameConfig.current()
+        await self.play_action(
+            f"{config.translate.get('werewolf_night_prompt','werewolf,please vote a player to kill')}",
             "werewolf_vote"
             )
 
 class SeerAgent(PlayerAgent):
     def __init__(self,playerId:str) -> None:
-        config = ProjectConfig()
-        playerRole = config.FindItem("Translate",{}).get("seer","seer")
+        config = GameConfig.current()
+        playerRole = config.role_names[Role.SEER]
         super().__init__(
             create_player_tools(playerRole),
             playerId,
@@ -698,24 +958,23 @@ class SeerAgent(PlayerAgent):
             )
     
     @override
-    def night_private_speech(self) -> None:
+    async def night_private_speech(self) -> None:
         """晚上不发言"""
         pass
 
     @override
-    def night_action(self) -> None:
+    async def night_action(self) -> None:
         """预言家在夜晚查验玩家身份"""
-        config = ProjectConfig()
-        self.play_action(
-            f"{config.FindItem("Translate",{}
-                ).get('seer_night_prompt','seer,please choose a player to investigate')}",
+        config = GameConfig.current()
+        await self.play_action(
+            f"{config.translate.get('seer_night_prompt','seer,please choose a player to investigate')}",
             "seer_investigate"
             )
 
 class WitchAgent(PlayerAgent):
     def __init__(self,playerId:str) -> None:
-        config = ProjectConfig()
-        playerRole = config.FindItem("Translate",{}).get("witch","witch")
+        config = GameConfig.current()
+        playerRole = config.role_names[Role.WITCH]
         super().__init__(
             create_player_tools(playerRole),
             playerId,
@@ -723,24 +982,23 @@ class WitchAgent(PlayerAgent):
             )
     
     @override
-    def night_private_speech(self) -> None:
+    async def night_private_speech(self) -> None:
         """晚上不发言"""
         pass
     
     @override
-    def night_action(self) -> None:
+    async def night_action(self) -> None:
         """女巫在夜晚使用药剂"""
-        config = ProjectConfig()
-        self.play_action(
-            f"{config.FindItem("Translate",{}
-                ).get('witch_night_prompt','witch,if someone is killed,you can save him or use poison')}",
+        config = GameConfig.current()
+        await self.play_action(
+            f"{config.translate.get('witch_night_prompt','witch,if someone is killed,you can save him or use poison')}",
             "witch_save;witch_poison"
             )
 
 class VillagerAgent(PlayerAgent):
     def __init__(self,playerId:str) -> None:
-        config = ProjectConfig()
-        playerRole = config.FindItem("Translate",{}).get("villager","villager")
+        config = GameConfig.current()
+        playerRole = config.role_names[Role.VILLAGER]
         super().__init__(
             create_player_tools(playerRole),
             playerId,
@@ -748,12 +1006,12 @@ class VillagerAgent(PlayerAgent):
             )
     
     @override
-    def night_private_speech(self) -> None:
+    async def night_private_speech(self) -> None:
         """晚上不发言"""
         pass
 
     @override
-    def night_action(self) -> None:
+    async def night_action(self) -> None:
         """村民晚上不行动"""
         pass
 
@@ -761,72 +1019,110 @@ class VillagerAgent(PlayerAgent):
 
 #region 工具创建
 
-def create_player_tools(player_role: str) -> List[BaseTool]:
-    """为不同角色创建相应的工具集"""
+def _function_tool(fn:Callable[..., Any], **kwargs) -> BaseTool:
+    """包装技能函数，同时提供异步版本，使achat路径直接在事件循环内执行技能而不进入线程池
+
+    启用context_tools时上下文工具改为返回本次决策的备忘结果，其余工具的说明不再要求先调用上下文工具
+    """
     from llama_index.core.tools import FunctionTool
-    
+
+    if GameConfig.current().context_tools:
+        name = kwargs.get("name", fn.__name__)
+        if name in CONTEXT_TOOLS:
+            kwargs["description"] = f"{name}{inspect.signature(fn)}\n{CONTEXT_TOOL_LABELS[name]}，本次决策的结果已在提示词的「当前局面」中给出，无需调用"
+            @functools.wraps(fn)
+            def memoized() -> Any:
+                return context_value(name)
+
+            fn = memoized
+        elif fn.__doc__ and "description" not in kwargs:
+            kwargs["description"] = f"{name}{inspect.signature(fn)}\n{context_tool_docstring(fn.__doc__)}"
+
+    @functools.wraps(fn)
+    async def async_fn(*args, **kw) -> Any:
+        return fn(*args, **kw)
+
+    return FunctionTool.from_defaults(fn=fn, async_fn=async_fn, **kwargs)
+
+def create_player_tools(player_role: str) -> List[BaseTool]:
+    """为不同角色创建相应的工具集
+
+    技能函数通过GameContext解析当前玩家，工具本身不含玩家状态，同一角色的工具只创建一次，
+    由该角色的所有玩家与之后的对局共享
+    """
+    config = GameConfig.current()
+    return list(_shared_player_tools(player_role, config.context_tools))
+
+@functools.lru_cache(maxsize=None)
+def _shared_player_tools(player_role: str, context_tools: bool) -> Tuple[BaseTool, ...]:
+    # context_tools改变工具说明，作为缓存键的一部分
+    return tuple(build_player_tools(player_role))
+
+def build_player_tools(player_role: str) -> List[BaseTool]:
+    """创建一组新的工具对象"""
     # 基础工具 - 所有角色都可以使用
     base_tools = [
-        FunctionTool.from_defaults(
-            fn=AgentToolSkills.vote,
-        ),
-        FunctionTool.from_defaults(
-            fn=AgentToolSkills.get_alive_players,
+        _function_tool(
+            AgentToolSkills.vote,
+            ),
+        _function_tool(
+            AgentToolSkills.get_alive_players,
             name="get_alive_players",
             description="获取所有存活玩家的列表。这是最重要的工具，在每次行动前都必须先调用此工具！"
         ),
-        FunctionTool.from_defaults(
-            fn=AgentToolSkills.get_dead_players,
+        _function_tool(
+            AgentToolSkills.get_dead_players,
             name="get_dead_players",
             description="获取所有死亡玩家的列表，用于了解游戏状态"
         ),
-        FunctionTool.from_defaults(
-            fn=AgentToolSkills.playerId_of_myself,
+        _function_tool(
+            AgentToolSkills.playerId_of_myself,
             name="get_who_are_you",
             description="获取玩家自己的ID名称，用于确认自己的身份"
         ),
-        FunctionTool.from_defaults(
-            fn=AgentToolSkills.playerRole_of_myself,
+        _function_tool(
+            AgentToolSkills.playerRole_of_myself,
             name="get_player_role",
             description="获取玩家自己扮演的身份，用于确认自己的角色和阵营"
         ),
     ]
     
-    config = ProjectConfig()
-    translate = config.FindItem("Translate",{})
+    role = GameConfig.current().role_of(player_role)
     
     # 根据角色添加特定工具
-    if player_role == translate.get("werewolf", "werewolf"):
+    if role == Role.WEREWOLF:
         # 狼人专用工具
         werewolf_tools = [
-            FunctionTool.from_defaults(
-                fn=AgentToolSkills.werewolf_vote,
+            _function_tool(
+                AgentToolSkills.werewolf_vote,
                 ),
-            FunctionTool.from_defaults(
-                fn=AgentToolSkills.who_is_werewolf,
+            _function_tool(
+                AgentToolSkills.who_is_werewolf,
                 ),
         ]
         return base_tools + werewolf_tools  # type: ignore
         
-    elif player_role == translate.get("seer", "seer"):
+    elif role == Role.SEER:
         # 预言家专用工具
         seer_tools = [
-            FunctionTool.from_defaults(
-                fn=AgentToolSkills.seer_investigate,)
+            _function_tool(
+                AgentToolSkills.seer_investigate,
+                )
         ]
         return base_tools + seer_tools  # type: ignore
         
-    elif player_role == translate.get("witch", "witch"):
+    elif role == Role.WITCH:
         # 女巫专用工具
         witch_tools = [
-            FunctionTool.from_defaults(
-                fn=AgentToolSkills.witch_save,
+            _function_tool(
+                AgentToolSkills.witch_save,
                 ),
-            FunctionTool.from_defaults(
-                fn=AgentToolSkills.witch_poison,
+            _function_tool(
+                AgentToolSkills.witch_poison,
                 ),
-            FunctionTool.from_defaults(
-                fn=AgentToolSkills.get_night_kill_target,)
+            _function_tool(
+                AgentToolSkills.get_night_kill_target,
+                )
         ]
         return base_tools + witch_tools  # type: ignore
         
@@ -842,11 +1138,12 @@ class DynamicContextManager:
     """动态上下文管理器，负责生成智能体玩家的动态提示词"""
     
     def __init__(self):
-        self.config = ProjectConfig()
-        self.translate = self.config.FindItem("Translate", {})
-        self.dynamic_context = self.config.FindItem("dynamic_context", {})
-        self.role_prompt = self.config.FindItem("role_prompt", {})
-        self.game_prompt = self.config.FindItem("game_prompt", {})
+        self.config = GameConfig.current()
+        self.translate = self.config.translate
+        self.dynamic_context = self.config.dynamic_context
+        self.role_prompt = self.config.role_prompt
+        self.game_prompt = self.config.game_prompt
+        self.context_tools = self.config.context_tools
         
         # 验证配置完整性
         self._validate_config()
@@ -898,7 +1195,7 @@ class DynamicContextManager:
             identity_statement = role_config.get("identity_statement", "")
             
             # 确定阵营
-            team = "狼人" if player_role == self.translate.get("werewolf", "werewolf") else "村民"
+            team = "狼人" if self.config.role_of(player_role) == Role.WEREWOLF else "村民"
             
             # 格式化身份声明
             formatted_identity = identity_statement.format(playerId=player_id) if identity_statement else f"你是{player_role}，你的名字是{player_id}。"
@@ -920,6 +1217,8 @@ class DynamicContextManager:
         """生成状态感知提示词"""
         try:
             state_template = self.dynamic_context.get("state_awareness", "")
+            if self.context_tools:
+                state_template = self.dynamic_context.get("context_state_awareness", state_template)
             state_reminder = state_template.format(phase=game_phase) if state_template else f"当前游戏阶段是{game_phase}。"
             
             # 添加阶段特定提示
@@ -989,11 +1288,49 @@ class DynamicContextManager:
             elif game_phase == "witch_action":
                 base_tools.extend(["witch_save", "witch_poison", "get_night_kill_target"])
             
+            if self.context_tools:
+                # 上下文工具的结果已写入提示词，不再强制调用
+                base_tools = [tool for tool in base_tools if tool not in CONTEXT_TOOLS]
             return base_tools
         except Exception as e:
             # 错误处理：返回基础工具列表
             return ["get_alive_players", "get_player_role"]
     
+    def tool_usage_requirements(self) -> str:
+        """工具使用提醒，启用context_tools时改为说明上下文信息已在提示词中给出"""
+        if self.context_tools:
+            return self.game_prompt.get("context_tool_requirements", "")
+        return self.game_prompt.get("tool_usage_requirements", "")
+    
+    def generate_victory_condition(self, player_role: str) -> str:
+        """生成胜利条件提示词"""
+        team = "狼人" if self.config.role_of(player_role) == Role.WEREWOLF else "村民"
+        victory_conditions = self.game_prompt.get("victory_conditions", {})
+        victory_condition = victory_conditions.get("werewolf" if team == "狼人" else "villager", "")
+        
+        victory_template = self.dynamic_context.get("victory_conditions", "")
+        return victory_template.format(victory_condition=victory_condition) if victory_template and victory_condition else f"胜利条件：{victory_condition}"
+    
+    def build_identity_prompt(self, player: 'Player') -> str:
+        """构建整局游戏中不变的身份与胜利条件提示词"""
+        return f"""# 身份强化
+{self.generate_identity_reinforcement(player.playerRole, player.playerId)}
+
+# 胜利条件
+{self.generate_victory_condition(player.playerRole)}"""
+    
+    def build_phase_prompt(self, player: 'Player', game_phase: str) -> str:
+        """构建随阶段变化的状态感知、策略指导与工具要求提示词"""
+        required_tools = self.get_required_tools_for_phase(player.playerRole, game_phase)
+        return f"""# 状态感知
+{self.generate_state_awareness(game_phase)}
+
+# 策略指导
+{self.generate_strategy_guidance(player.playerRole, game_phase)}
+
+# 工具使用要求
+{self.generate_tool_enforcement(required_tools)}"""
+    
     def build_dynamic_prompt(self, player: 'Player', game_phase: str) -> str:
         """构建完整的动态提示词"""
         try:
@@ -1010,12 +1347,7 @@ class DynamicContextManager:
             tool_part = self.generate_tool_enforcement(required_tools)
             
             # 获取胜利条件
-            team = "狼人" if player_role == self.translate.get("werewolf", "werewolf") else "村民"
-            victory_conditions = self.game_prompt.get("victory_conditions", {})
-            victory_condition = victory_conditions.get("werewolf" if team == "狼人" else "villager", "")
-            
-            victory_template = self.dynamic_context.get("victory_conditions", "")
-            victory_part = victory_template.format(victory_condition=victory_condition) if victory_template and victory_condition else f"胜利条件：{victory_condition}"
+            victory_part = self.generate_victory_condition(player_role)
             
             # 组合所有部分
             dynamic_prompt = f"""
@@ -1035,7 +1367,7 @@ class DynamicContextManager:
 {tool_part}
 
 # 重要提醒
-{self.game_prompt.get("tool_usage_requirements", "")}
+{self.tool_usage_requirements()}
 """
             
             return dynamic_prompt.strip()
@@ -1048,5 +1380,170 @@ class DynamicContextManager:
 请使用get_alive_players工具获取存活玩家列表。
 """
 
+PROMPT_LAYOUT_CLASSIC = "classic"
+PROMPT_LAYOUT_PREFIX_CACHE = "prefix_cache"
+
+class PromptBuilder:
+    """按玩家增量构建提示词
+
+    规则、角色介绍与动态上下文按阶段预编译一次；存活/死亡列表等状态只在变化时重新渲染；
+    历史记忆只追加新增的条目，不再每次重新格式化全部记忆。
+
+    prefix_cache布局按从稳定到易变排列消息：整局不变的规则与身份、只追加的历史记忆、
+    最后才是阶段规则与场上状态，使推理服务能够复用同一玩家上一次请求的前缀缓存
+    """
+
+    def __init__(self, player:'PlayerAgent'):
+        config = GameConfig.current()
+        self.player = player
+        self.layout:str = config.prompt_layout
+        if self.layout not in (PROMPT_LAYOUT_CLASSIC,PROMPT_LAYOUT_PREFIX_CACHE):
+            raise ValueError(f"未知的提示词布局: {self.layout}")
+        self.context_manager = DynamicContextManager()
+        self.game_prompt = self.context_manager.game_prompt
+        role_config = self.context_manager.role_prompt.get(player.playerRole, {})
+        self.role_introduction = role_config.get("role_introduction", "") if isinstance(role_config, Mapping) else str(role_config)
+        self.is_witch = player.role == Role.WITCH
+        self.context_tools:bool = config.context_tools
+        self.allow_stats:Sequence[str] = config.allow_memory_stats[player.playerRole]
+        self.max_memory_count:int = config.max_memory_count
+        self.history_title = f"# {self.context_manager.translate.get('prompt',{}).get('known_speech_history','known speech history')}\n\n"
+
+        self._static_prompts:Dict[str,str] = {}
+        self._stable_message:Optional[ChatMessage] = None
+        self._state_key:Optional[tuple] = None
+        self._system_message:Optional[ChatMessage] = None
+
+        self._memory:Optional[PublicMemory] = None
+        self._memory_compactions:int = 0
+        self._memory_cursor:int = 0
+        self._memory_lines:List[str] = []
+        self.history_text:str = ""
+        self._history_message:Optional[ChatMessage] = None
+
+    def messages(self, phase:str, memory:PublicMemory) -> List[ChatMessage]:
+        """按布局排列的提示词消息"""
+        if self.layout == PROMPT_LAYOUT_PREFIX_CACHE:
+            return [self.stable_message(), self.history_message(memory), self.system_message(phase)]
+        return [self.system_message(phase), self.history_message(memory)]
+
+    def stable_message(self) -> ChatMessage:
+        """prefix_cache布局中整局游戏不变的部分"""
+        if self._stable_message is None:
+            self._stable_message = ChatMessage.from_str(
+                f"""# 游戏规则
+{self.game_prompt.get("basic_rules", "")}
+
+{self.context_manager.build_identity_prompt(self.player)}
+
+# 角色介绍
+{self.role_introduction}
+
+# 工具使用要求
+{self.context_manager.tool_usage_requirements()}
+""",
+                MessageRole.SYSTEM
+                )
+        return self._stable_message
+
+    def static_prompt(self, phase:str) -> str:
+        """阶段相关但在整局游戏中不变的部分"""
+        if phase in self._static_prompts:
+            return self._static_prompts[phase]
+        if self.layout == PROMPT_LAYOUT_PREFIX_CACHE:
+            self._static_prompts[phase] = f"""# 当前阶段规则
+{self.game_prompt.get("phase_rules", {}).get(phase, "")}
+
+{self.context_manager.build_phase_prompt(self.player, phase)}
+
+"""
+        else:
+            self._static_prompts[phase] = f"""# 游戏规则
+{self.game_prompt.get("basic_rules", "")}
+
+# 当前阶段规则
+{self.game_prompt.get("phase_rules", {}).get(phase, "")}
+
+# 动态上下文
+{self.context_manager.build_dynamic_prompt(self.player, phase)}
+
+# 角色介绍
+{self.role_introduction}
+
+# 工具使用要求
+{self.context_manager.tool_usage_requirements()}
+
+"""
+        return self._static_prompts[phase]
+
+    def system_message(self, phase:str) -> ChatMessage:
+        """系统提示词，只有阶段或场上状态变化时才重新渲染"""
+        if self.context_tools:
+            return self.context_system_message(phase)
+        alive_players = AgentToolSkills.get_alive_players()
+        dead_players = AgentToolSkills.get_dead_players()
+        kill_target = AgentToolSkills.get_night_kill_target() if self.is_witch else None
+        state_key = (phase, tuple(alive_players), tuple(dead_players), kill_target)
+        if state_key != self._state_key:
+            self._state_key = state_key
+            witch_part = f"""
+# 当前狼人选择杀害的对象
+{kill_target}
+""" if self.is_witch else ""
+            self._system_message = ChatMessage.from_str(
+                f"""{self.static_prompt(phase)}# 当前仍存活的玩家
+{alive_players}
+
+# 当前已死亡的玩家
+{dead_players}
+
+{witch_part}
+""",
+                MessageRole.SYSTEM
+                )
+        return self._system_message
+
+    def context_system_message(self, phase:str) -> ChatMessage:
+        """context_tools模式的系统提示词，以本次决策的上下文工具结果作为「当前局面」"""
+        values = [(name, context_value(name)) for name in self.player.context_tool_names]
+        state_key = (phase, tuple((name, tuple(value) if isinstance(value, list) else value) for name, value in values))
+        if state_key != self._state_key:
+            self._state_key = state_key
+            situation = "\n".join(f"- {CONTEXT_TOOL_LABELS[name]}({name}): {value}" for name, value in values)
+            self._system_message = ChatMessage.from_str(
+                f"""{self.static_prompt(phase)}# 当前局面
+{situation}
+""",
+                MessageRole.SYSTEM
+                )
+        return self._system_message
+
+    def history_message(self, memory:PublicMemory) -> ChatMessage:
+        """已知发言历史，只格式化上次读取之后新增的记忆，历史被折叠为摘要后整体重读一次"""
+        if memory is not self._memory or memory.compactions != self._memory_compactions:
+            self._memory = memory
+            self._memory_compactions = memory.compactions
+            self._memory_cursor = len(memory.memory)
+            self._memory_lines = memory.read_lines(self.allow_stats)
+            self.history_text = "---\n".join(self._memory_lines)
+            self._history_message = None
+            new_lines = []
+        else:
+            new_lines, self._memory_cursor = memory.read_since(self._memory_cursor, self.allow_stats)
+        if new_lines:
+            if self.history_text and len(self._memory_lines) + len(new_lines) <= self.max_memory_count:
+                self.history_text += "---\n" + "---\n".join(new_lines)
+                self._memory_lines.extend(new_lines)
+            else:
+                self._memory_lines.extend(new_lines)
+                del self._memory_lines[:-self.max_memory_count]
+                self.history_text = "---\n".join(self._memory_lines)
+        if new_lines or self._history_message is None:
+            self._history_message = ChatMessage.from_str(
+                f"{self.history_title}{self.history_text}",
+                MessageRole.SYSTEM
+                )
+        return self._history_message
+
 #endregion
 
@@ -0,0 +1,239 @@
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+RATIO_BUCKETS = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 直方图按这些标签聚合；对局与玩家只写入每局统计，避免标签组合随对局数无限增长
+METRIC_LABELS = ("phase", "decision", "role")
+
+@dataclass
+class AgentCallRecord:
+    """一次智能体决策(一次ReActAgent对话或结构化行动)的记录"""
+
+    game: str
+    round: int
+    phase: str
+    decision: str
+    player: str
+    role: str
+    start_time: float = field(default_factory=time.perf_counter)
+    wall_time: float = 0.0
+    # 从决策开始到第一个token的秒数，后端没有给出且不是流式请求时为None
+    ttft: Optional[float] = None
+    llm_requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # 各次请求的提示词字符数，以及其中与同一会话上一次请求相同的前缀字符数
+    prompt_chars: int = 0
+    prefix_chars: int = 0
+    tool_calls: int = 0
+    structured_fallback: bool = False
+    max_iterations: bool = False
+
+    @property
+    def labels(self) -> Tuple[str, ...]:
+        return (self.phase, self.decision, self.role)
+
+    @property
+    def prefix_hit_rate(self) -> Optional[float]:
+        return self.prefix_chars / self.prompt_chars if self.prompt_chars else None
+
+    def observe_request(self, prompt_tokens: int, completion_tokens: int, first_token: Optional[float],
+                        prompt_chars: int = 0, prefix_chars: int = 0) -> None:
+        """记录决策中的一次LLM请求，first_token为该请求首个token的perf_counter时间"""
+        self.llm_requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.prompt_chars += prompt_chars
+        self.prefix_chars += prefix_chars
+        if self.ttft is None and first_token is not None:
+            self.ttft = first_token - self.start_time
+
+@dataclass
+class LLMUsage:
+    """一局游戏的LLM用量合计，写入game_end事件"""
+
+    agent_calls: int = 0
+    llm_requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    prompt_chars: int = 0
+    prefix_chars: int = 0
+    tool_calls: int = 0
+    structured_fallbacks: int = 0
+    max_iterations: int = 0
+    wall_time: float = 0.0
+    by_player: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    def add(self, record: AgentCallRecord) -> None:
+        self.agent_calls += 1
+        self.llm_requests += record.llm_requests
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.prompt_chars += record.prompt_chars
+        self.prefix_chars += record.prefix_chars
+        self.tool_calls += record.tool_calls
+        self.structured_fallbacks += record.structured_fallback
+        self.max_iterations += record.max_iterations
+        self.wall_time += record.wall_time
+        player = self.by_player.setdefault(record.player, {
+            "role": record.role, "agent_calls": 0, "llm_requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "prompt_chars": 0, "prefix_chars": 0, "wall_time": 0.0,
+        })
+        player["agent_calls"] += 1
+        player["llm_requests"] += record.llm_requests
+        player["prompt_tokens"] += record.prompt_tokens
+        player["completion_tokens"] += record.completion_tokens
+        player["prompt_chars"] += record.prompt_chars
+        player["prefix_chars"] += record.prefix_chars
+        player["wall_time"] += record.wall_time
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "agent_calls": self.agent_calls,
+            "llm_requests": self.llm_requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "prompt_chars": self.prompt_chars,
+            "prefix_chars": self.prefix_chars,
+            "prefix_hit_rate": self.prefix_chars / self.prompt_chars if self.prompt_chars else 0.0,
+            "tool_calls": self.tool_calls,
+            "structured_fallbacks": self.structured_fallbacks,
+            "max_iterations": self.max_iterations,
+            "wall_time": self.wall_time,
+            "by_player": self.by_player,
+        }
+
+#region Prometheus
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = METRIC_LABELS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float],
+                 label_names: Sequence[str] = METRIC_LABELS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        # 标签 -> (各区间的计数(最后一个为+Inf), 总和)
+        self.series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        counts, total = self.series.setdefault(labels, ([0] * (len(self.buckets) + 1), [0.0]))
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _format_labels(self.label_names, labels, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total[0]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+#endregion
+
+class LLMMetrics:
+    """进程内所有对局的智能体决策指标，按阶段、决策类型与角色聚合为直方图"""
+
+    def __init__(self) -> None:
+        self.wall_time = Histogram("wolves_agent_call_seconds", "智能体决策的总耗时", SECONDS_BUCKETS)
+        self.ttft = Histogram("wolves_agent_ttft_seconds", "从决策开始到第一个token的耗时", SECONDS_BUCKETS)
+        self.prompt_tokens = Histogram("wolves_agent_prompt_tokens", "单次决策的提示词token数合计", TOKEN_BUCKETS)
+        self.completion_tokens = Histogram("wolves_agent_completion_tokens", "单次决策生成的token数合计", TOKEN_BUCKETS)
+        self.iterations = Histogram("wolves_agent_llm_requests", "单次决策的LLM请求数(ReAct迭代次数)", COUNT_BUCKETS)
+        self.tool_calls = Histogram("wolves_agent_tool_calls", "单次决策调用的工具数", COUNT_BUCKETS)
+        self.prefix_hit_rate = Histogram(
+            "wolves_agent_prefix_hit_ratio", "单次决策的提示词中与同一会话上一次请求相同的前缀占比", RATIO_BUCKETS)
+        # 两个计数器之比为整体前缀命中率，不受各次决策提示词长短不同的影响
+        self.prompt_chars = Counter("wolves_agent_prompt_chars_total", "LLM请求的提示词字符数")
+        self.prefix_chars = Counter("wolves_agent_prefix_chars_total", "LLM请求中与同一会话上一次请求相同的前缀字符数")
+        self.structured_fallbacks = Counter("wolves_agent_structured_fallbacks_total", "结构化行动回退到ReAct的次数")
+        self.max_iterations = Counter("wolves_agent_max_iterations_total", "达到ReAct最大迭代次数而使用备用回答的次数")
+        self.errors = Counter("wolves_agent_errors_total", "以异常结束的决策数")
+
+    def record(self, record: AgentCallRecord, failed: bool = False) -> None:
+        labels = record.labels
+        self.wall_time.observe(labels, record.wall_time)
+        if record.ttft is not None:
+            self.ttft.observe(labels, record.ttft)
+        self.prompt_tokens.observe(labels, record.prompt_tokens)
+        self.completion_tokens.observe(labels, record.completion_tokens)
+        self.iterations.observe(labels, record.llm_requests)
+        self.tool_calls.observe(labels, record.tool_calls)
+        if record.prefix_hit_rate is not None:
+            self.prefix_hit_rate.observe(labels, record.prefix_hit_rate)
+            self.prompt_chars.inc(labels, record.prompt_chars)
+            self.prefix_chars.inc(labels, record.prefix_chars)
+        if record.structured_fallback:
+            self.structured_fallbacks.inc(labels)
+        if record.max_iterations:
+            self.max_iterations.inc(labels)
+        if failed:
+            self.errors.inc(labels)
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        lines: List[str] = []
+        for metric in (self.wall_time, self.ttft, self.prompt_tokens, self.completion_tokens, self.iterations,
+                       self.tool_calls, self.prefix_hit_rate, self.prompt_chars, self.prefix_chars,
+                       self.structured_fallbacks, self.max_iterations, self.errors):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+llm_metrics = LLMMetrics()
+
+# 当前协程正在进行的决策，LLM请求据此归属到决策
+current_call: ContextVar[Optional[AgentCallRecord]] = ContextVar("current_agent_call", default=None)
+
+@contextmanager
+def agent_call_scope(record: AgentCallRecord, usage: Optional[LLMUsage] = None) -> Iterator[AgentCallRecord]:
+    """在决策结束时记录耗时，并计入进程指标与所属对局的用量"""
+    token = current_call.set(record)
+    failed = True
+    try:
+        yield record
+        failed = False
+    finally:
+        current_call.reset(token)
+        record.wall_time = time.perf_counter() - record.start_time
+        llm_metrics.record(record, failed)
+        if usage is not None:
+            usage.add(record)
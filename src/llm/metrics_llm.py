@@ -0,0 +1,157 @@
+import time
+from typing import Any, Optional, Sequence, Tuple
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+)
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from .delegating_llm import DelegatingLLM
+from .metrics import current_call
+from .session import PrefixTracker, current_session
+
+def _usage(raw: Any) -> Tuple[int, int, Optional[float]]:
+    """从Ollama风格的响应中读取(提示词token数, 生成token数, 首字延迟秒数)"""
+    if not isinstance(raw, dict):
+        return 0, 0, None
+    prompt_tokens = raw.get("prompt_eval_count") or 0
+    completion_tokens = raw.get("eval_count") or 0
+    durations = [raw.get(key) for key in ("load_duration", "prompt_eval_duration") if raw.get(key)]
+    return prompt_tokens, completion_tokens, sum(durations) / 1e9 if durations else None
+
+class MetricsLLM(DelegatingLLM):
+    """把每次LLM请求的token数、首字延迟与前缀命中计入当前决策
+
+    非流式请求的首字延迟取自后端返回的加载与预填充耗时，流式请求直接测量首个片段的到达时间；
+    前缀命中按会话比较本次与上一次请求的提示词，即推理服务可以复用的前缀缓存比例
+    """
+
+    _prefixes: PrefixTracker = PrivateAttr(default_factory=lambda: PrefixTracker(max_sessions=4096))
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MetricsLLM"
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.llm, "model", None)
+
+    @property
+    def prefixes(self) -> PrefixTracker:
+        return self._prefixes
+
+    def _prefix(self, messages: Sequence[ChatMessage]) -> Tuple[int, int]:
+        return self._prefixes.observe(current_session.get(), messages)
+
+    @staticmethod
+    def _observe(request_start: float, response: Any, prefix: Tuple[int, int], first_token: Optional[float] = None) -> None:
+        record = current_call.get()
+        if record is None:
+            return
+        prompt_tokens, completion_tokens, ttft = _usage(getattr(response, "raw", None))
+        if first_token is None and ttft is not None:
+            first_token = request_start + ttft
+        prefix_chars, prompt_chars = prefix
+        record.observe_request(prompt_tokens, completion_tokens, first_token, prompt_chars, prefix_chars)
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        request_start = time.perf_counter()
+        prefix = self._prefix(messages)
+        response = self.llm.chat(messages, **kwargs)
+        self._observe(request_start, response, prefix)
+        return response
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        request_start = time.perf_counter()
+        prefix = self._prefix([ChatMessage(role="user", content=prompt)])
+        response = self.llm.complete(prompt, formatted=formatted, **kwargs)
+        self._observe(request_start, response, prefix)
+        return response
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        request_start = time.perf_counter()
+        prefix = self._prefix(messages)
+        response = await self.llm.achat(messages, **kwargs)
+        self._observe(request_start, response, prefix)
+        return response
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        request_start = time.perf_counter()
+        prefix = self._prefix([ChatMessage(role="user", content=prompt)])
+        response = await self.llm.acomplete(prompt, formatted=formatted, **kwargs)
+        self._observe(request_start, response, prefix)
+        return response
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        request_start = time.perf_counter()
+        prefix = self._prefix(messages)
+        stream = self.llm.stream_chat(messages, **kwargs)
+
+        def gen() -> ChatResponseGen:
+            first_token = last = None
+            for last in stream:
+                first_token = first_token or time.perf_counter()
+                yield last
+            self._observe(request_start, last, prefix, first_token)
+
+        return gen()
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        request_start = time.perf_counter()
+        prefix = self._prefix([ChatMessage(role="user", content=prompt)])
+        stream = self.llm.stream_complete(prompt, formatted=formatted, **kwargs)
+
+        def gen() -> CompletionResponseGen:
+            first_token = last = None
+            for last in stream:
+                first_token = first_token or time.perf_counter()
+                yield last
+            self._observe(request_start, last, prefix, first_token)
+
+        return gen()
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        request_start = time.perf_counter()
+        prefix = self._prefix(messages)
+        stream = await self.llm.astream_chat(messages, **kwargs)
+        # 流在其他任务中被消费时仍计入发起请求的决策
+        record = current_call.get()
+
+        async def gen() -> ChatResponseAsyncGen:
+            first_token = last = None
+            async for last in stream:
+                first_token = first_token or time.perf_counter()
+                yield last
+            token = current_call.set(record)
+            try:
+                self._observe(request_start, last, prefix, first_token)
+            finally:
+                current_call.reset(token)
+
+        return gen()
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        request_start = time.perf_counter()
+        prefix = self._prefix([ChatMessage(role="user", content=prompt)])
+        stream = await self.llm.astream_complete(prompt, formatted=formatted, **kwargs)
+        record = current_call.get()
+
+        async def gen() -> CompletionResponseAsyncGen:
+            first_token = last = None
+            async for last in stream:
+                first_token = first_token or time.perf_counter()
+                yield last
+            token = current_call.set(record)
+            try:
+                self._observe(request_start, last, prefix, first_token)
+            finally:
+                current_call.reset(token)
+
+        return gen()
@@ -0,0 +1,381 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms import LLM
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+from .session import PrefixTracker, current_session
+
+# 行动工具按优先级排列，任务提示中出现的第一个可用工具即为本回合要执行的行动
+ACTION_TOOLS = ("werewolf_vote", "seer_investigate", "witch_save", "witch_poison", "vote")
+# 行动前可能先调用的信息工具
+INFO_TOOLS = ("get_alive_players", "get_player_role", "get_who_are_you", "get_dead_players")
+
+SPEECH_TEMPLATES = (
+    "我认为{target}的发言有些可疑，大家可以多关注一下。",
+    "目前信息不多，我暂时相信{target}，先听听其他人的看法。",
+    "{target}昨天的投票很奇怪，我倾向于怀疑他。",
+    "我是好人，希望大家理性分析，不要被带节奏，{target}值得再观察。",
+)
+
+class LatencyModel:
+    """模拟推理服务的延迟: 首字延迟(time-to-first-token)加按生成速度(tokens/sec)计算的输出时间，
+    设置prefill_tokens_per_second时首字延迟再加上未命中前缀缓存部分的预填充时间
+    """
+
+    def __init__(self, latency_config: Dict[str, Any]):
+        self.model = latency_config.get("model", "fixed")
+        self.ttft = latency_config.get("ttft", 0.0)
+        self.ttft_std = latency_config.get("ttft_std", 0.0)
+        self.tokens_per_second = latency_config.get("tokens_per_second", 0.0)
+        self.tokens_per_second_std = latency_config.get("tokens_per_second_std", 0.0)
+        self.chars_per_token = latency_config.get("chars_per_token", 1.5)
+        self.time_scale = latency_config.get("time_scale", 1.0)
+        self.prefill_tokens_per_second = latency_config.get("prefill_tokens_per_second", 0.0)
+        self.trace: List[Dict[str, float]] = []
+        self._trace_index = 0
+        if self.model == "trace":
+            with open(latency_config["trace_path"], "r", encoding="utf-8") as f:
+                self.trace = [json.loads(line) for line in f if line.strip()]
+            if not self.trace:
+                raise ValueError(f"延迟轨迹为空: {latency_config['trace_path']}")
+        elif self.model not in ("fixed", "normal"):
+            raise ValueError(f"未知的延迟模型: {self.model}")
+
+    def count_tokens(self, text: str) -> int:
+        return max(1, int(len(text) / self.chars_per_token))
+
+    def prefill_time(self, uncached_chars: int) -> float:
+        if self.prefill_tokens_per_second <= 0 or uncached_chars <= 0:
+            return 0.0
+        return uncached_chars / self.chars_per_token / self.prefill_tokens_per_second * self.time_scale
+
+    def sample(self, rng: random.Random) -> Tuple[float, float]:
+        """返回(首字延迟秒数, 每个token的生成间隔秒数)"""
+        if self.model == "trace":
+            sample = self.trace[self._trace_index % len(self.trace)]
+            self._trace_index += 1
+            ttft = sample.get("ttft", 0.0)
+            tokens_per_second = sample.get("tokens_per_second", 0.0)
+        elif self.model == "normal":
+            ttft = max(0.0, rng.gauss(self.ttft, self.ttft_std))
+            tokens_per_second = max(0.0, rng.gauss(self.tokens_per_second, self.tokens_per_second_std))
+        else:
+            ttft = self.ttft
+            tokens_per_second = self.tokens_per_second
+        token_interval = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        return ttft * self.time_scale, token_interval * self.time_scale
+
+class SimulatedLLM(LLM):
+    """确定性的本地模拟LLM后端
+
+    按种子化策略返回格式正确的ReAct工具调用与发言，并按延迟模型模拟首字延迟与生成速度，
+    使测试与基准测试不依赖模型服务
+    """
+
+    seed: int = Field(default=0, description="策略随机种子")
+    max_info_calls: int = Field(default=1, description="执行行动前最多调用的信息工具次数")
+    slots: int = Field(default=1, description="模拟推理服务的并行槽位数，每个槽位保留上一次请求的前缀缓存")
+    structured_error_rate: float = Field(default=0.0, description="结构化请求返回无效决定的概率，用于覆盖重试与回退路径")
+    latency_config: Dict[str, Any] = Field(default_factory=dict, description="延迟模型配置")
+
+    _latency: LatencyModel = PrivateAttr()
+    _call_count: int = PrivateAttr(default=0)
+    _slot_prefixes: PrefixTracker = PrivateAttr()
+    _session_slots: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._latency = LatencyModel(self.latency_config)
+        self._slot_prefixes = PrefixTracker()
+
+    @classmethod
+    def from_config(cls) -> "SimulatedLLM":
+        mock_config = ProjectConfig().FindItem("mock_llm", {})
+        return cls(
+            seed=mock_config.get("seed", 0),
+            max_info_calls=mock_config.get("max_info_calls", 1),
+            slots=mock_config.get("slots", 1),
+            structured_error_rate=mock_config.get("structured_error_rate", 0.0),
+            latency_config=mock_config.get("latency", {}),
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SimulatedLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=32768,
+            num_output=1024,
+            is_chat_model=True,
+            model_name="simulated",
+        )
+
+    @property
+    def call_count(self) -> int:
+        return self._call_count
+
+    #region 策略
+
+    def _rng(self, messages: Sequence[ChatMessage]) -> random.Random:
+        """由种子与消息内容派生随机数，结果与并发调度顺序无关"""
+        digest = hashlib.sha256(
+            "\n".join(f"{message.role}:{message.content}" for message in messages).encode("utf-8")
+        ).hexdigest()
+        return random.Random(f"{self.seed}:{digest}")
+
+    @staticmethod
+    def _tool_names(messages: Sequence[ChatMessage]) -> List[str]:
+        for message in messages:
+            if message.role == MessageRole.SYSTEM and "Tool Name:" in (message.content or ""):
+                return re.findall(r"Tool Name: (\w+)", message.content)
+        return []
+
+    @staticmethod
+    def _split_turn(messages: Sequence[ChatMessage]) -> Tuple[str, List[str]]:
+        """返回本回合的任务提示，以及该提示之后已执行过的工具"""
+        task = ""
+        task_index = 0
+        for index, message in enumerate(messages):
+            content = message.content or ""
+            if message.role == MessageRole.USER and not content.startswith("Observation:"):
+                task = content
+                task_index = index
+        called = []
+        for message in messages[task_index + 1:]:
+            if message.role == MessageRole.ASSISTANT:
+                called.extend(re.findall(r"Action: (\w+)", message.content or ""))
+        return task, called
+
+    @staticmethod
+    def _players(messages: Sequence[ChatMessage]) -> Tuple[Optional[str], List[str], Optional[str]]:
+        """从提示词中解析自己的ID、存活玩家与今晚的击杀目标"""
+        text = "\n".join(message.content or "" for message in messages)
+        myself = re.search(r"你的名字是(player\d+)", text)
+        alive_section = re.search(r"当前仍存活的玩家(?:\(\w+\): )?\s*\[([^\]]*)\]", text)
+        if alive_section is None:
+            alive_section = re.search(r"Available targets: \[([^\]]*)\]", text)
+        alive = re.findall(r"player\d+", alive_section.group(1)) if alive_section else sorted(set(re.findall(r"player\d+", text)))
+        kill_target = re.search(r"当前狼人选择杀害的对象(?:\(\w+\): )?\s*(player\d+)", text)
+        return (
+            myself.group(1) if myself else None,
+            alive,
+            kill_target.group(1) if kill_target else None,
+        )
+
+    @staticmethod
+    def _format_action(tool: str, kwargs: Dict[str, Any]) -> str:
+        return (
+            f"Thought: 我需要使用工具来完成当前行动。\n"
+            f"Action: {tool}\n"
+            f"Action Input: {json.dumps(kwargs, ensure_ascii=False)}"
+        )
+
+    @staticmethod
+    def _format_answer(answer: str) -> str:
+        return f"Thought: I can answer without using any more tools. I'll use the user's language to answer\nAnswer: {answer}"
+
+    @staticmethod
+    def _schema(messages: Sequence[ChatMessage], schema: Any) -> Optional[Dict[str, Any]]:
+        """结构化请求的JSON Schema，没有通过format参数传入时从最后一条提示中解析"""
+        if isinstance(schema, dict):
+            return schema
+        if not messages or messages[-1].role != MessageRole.USER:
+            return None
+        match = re.search(r"JSON Schema: (\{.*\})\s*$", messages[-1].content or "")
+        return json.loads(match.group(1)) if match else None
+
+    def _respond_structured(self, rng: random.Random, schema: Dict[str, Any]) -> str:
+        """按Schema中各行动分支的合法目标给出JSON决定"""
+        options: Dict[str, Optional[List[str]]] = {}
+        for branch in schema.get("anyOf", [schema]):
+            properties = branch.get("properties", {})
+            action = properties.get("action", {}).get("const")
+            if action is not None:
+                options[action] = properties.get("target", {}).get("enum")
+        if rng.random() < self.structured_error_rate:
+            return rng.choice(("我决定投给player0。", json.dumps({"action": "unknown", "target": None})))
+
+        if "witch_save" in options and rng.random() < 0.5:
+            action = "witch_save"
+        elif "witch_poison" in options and rng.random() < 0.3:
+            action = "witch_poison"
+        else:
+            action = next((action for action in options if action not in ("witch_save", "witch_poison")), "skip")
+        targets = options.get(action)
+        target = rng.choice(targets) if targets else None
+        return json.dumps({"action": action, "target": target}, ensure_ascii=False)
+
+    def _respond(self, messages: Sequence[ChatMessage], schema: Any = None) -> str:
+        rng = self._rng(messages)
+        schema = self._schema(messages, schema)
+        if schema is not None:
+            return self._respond_structured(rng, schema)
+        tools = self._tool_names(messages)
+        task, called = self._split_turn(messages)
+        myself, alive, kill_target = self._players(messages)
+        candidates = [playerId for playerId in alive if playerId != myself] or alive
+        target = rng.choice(candidates) if candidates else "player1"
+
+        if not tools:
+            # 没有工具描述时是一次直接的对话调用
+            return rng.choice(SPEECH_TEMPLATES).format(target=target)
+
+        action = next((tool for tool in ACTION_TOOLS if tool in tools and tool in task), None)
+        if action is None:
+            return self._format_answer(rng.choice(SPEECH_TEMPLATES).format(target=target))
+        if any(tool in ACTION_TOOLS for tool in called):
+            return self._format_answer("行动已完成。")
+
+        # 提示词中已按"标签(工具名): 结果"给出的信息不再调用工具查询
+        known = set(re.findall(r"\((\w+)\): ", "\n".join(message.content or "" for message in messages)))
+        info_tools = [tool for tool in INFO_TOOLS if tool in tools and tool not in known]
+        info_calls = sum(1 for tool in called if tool in INFO_TOOLS)
+        if info_tools and info_calls < self.max_info_calls and rng.random() < 0.5:
+            return self._format_action(info_tools[info_calls % len(info_tools)], {})
+
+        if action in ("witch_save", "witch_poison"):
+            if kill_target and "witch_save" in tools and rng.random() < 0.5:
+                return self._format_action("witch_save", {})
+            if "witch_poison" in tools and rng.random() < 0.3:
+                return self._format_action("witch_poison", {"targetId": target})
+            return self._format_answer("今晚不使用药剂。")
+        return self._format_action(action, {"targetId": target})
+
+    #endregion
+
+    #region 延迟模拟
+
+    @property
+    def slot_prefixes(self) -> PrefixTracker:
+        """各槽位的前缀缓存命中统计"""
+        return self._slot_prefixes
+
+    def _slot(self) -> Optional[str]:
+        """会话首次出现时按轮转分配槽位，之后固定在该槽位上"""
+        session = current_session.get()
+        if session is None:
+            return None
+        if session not in self._session_slots:
+            self._session_slots[session] = len(self._session_slots) % max(1, self.slots)
+        return f"slot{self._session_slots[session]}"
+
+    def _prepare(self, messages: Sequence[ChatMessage], schema: Any = None) -> Tuple[str, float, float, int, Dict[str, int]]:
+        """返回(回答, 首字延迟, 每个token的生成间隔, 回答token数, 与Ollama相同字段的用量统计)"""
+        self._call_count += 1
+        text = self._respond(messages, schema)
+        ttft, token_interval = self._latency.sample(self._rng(messages))
+        prefix, total = self._slot_prefixes.observe(self._slot(), messages)
+        ttft += self._latency.prefill_time(total - prefix)
+        tokens = self._latency.count_tokens(text)
+        raw = {
+            "prompt_eval_count": max(1, int(total / self._latency.chars_per_token)),
+            "prompt_eval_duration": int(ttft * 1e9),
+            "eval_count": tokens,
+        }
+        return text, ttft, token_interval, tokens, raw
+
+    @staticmethod
+    def _chunks(text: str, tokens: int) -> List[str]:
+        size = max(1, -(-len(text) // tokens))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        text, ttft, token_interval, tokens, raw = self._prepare(messages, kwargs.get("format"))
+        time.sleep(ttft + token_interval * tokens)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text), raw=raw)
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        text, ttft, token_interval, tokens, raw = self._prepare(messages, kwargs.get("format"))
+        await asyncio.sleep(ttft + token_interval * tokens)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=text), raw=raw)
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        text, ttft, token_interval, tokens, raw = self._prepare(messages, kwargs.get("format"))
+
+        def gen() -> ChatResponseGen:
+            time.sleep(ttft)
+            content = ""
+            chunks = self._chunks(text, tokens)
+            for index, delta in enumerate(chunks):
+                time.sleep(token_interval * max(1, int(len(delta) / self._latency.chars_per_token)))
+                content += delta
+                # 与Ollama一样只在最后一个片段中给出用量统计
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=content),
+                    delta=delta,
+                    raw=raw if index == len(chunks) - 1 else None,
+                )
+
+        return gen()
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        text, ttft, token_interval, tokens, raw = self._prepare(messages, kwargs.get("format"))
+
+        async def gen() -> ChatResponseAsyncGen:
+            await asyncio.sleep(ttft)
+            content = ""
+            chunks = self._chunks(text, tokens)
+            for index, delta in enumerate(chunks):
+                await asyncio.sleep(token_interval * max(1, int(len(delta) / self._latency.chars_per_token)))
+                content += delta
+                # 与Ollama一样只在最后一个片段中给出用量统计
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=content),
+                    delta=delta,
+                    raw=raw if index == len(chunks) - 1 else None,
+                )
+
+        return gen()
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        response = self.chat([ChatMessage(role=MessageRole.USER, content=prompt)])
+        return CompletionResponse(text=response.message.content)
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        response = await self.achat([ChatMessage(role=MessageRole.USER, content=prompt)])
+        return CompletionResponse(text=response.message.content)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        def gen() -> CompletionResponseGen:
+            for response in self.stream_chat([ChatMessage(role=MessageRole.USER, content=prompt)]):
+                yield CompletionResponse(text=response.message.content, delta=response.delta)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        async def gen() -> CompletionResponseAsyncGen:
+            async for response in await self.astream_chat([ChatMessage(role=MessageRole.USER, content=prompt)]):
+                yield CompletionResponse(text=response.message.content, delta=response.delta)
+
+        return gen()
+
+    #endregion
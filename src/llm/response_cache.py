@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+)
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import LLM
+
+from .delegating_llm import DelegatingLLM
+
+__logger__ = logging.getLogger(__name__)
+
+CACHE_OFF = "off"
+CACHE_READ_ONLY = "read_only"
+CACHE_READ_WRITE = "read_write"
+CACHE_MODES = (CACHE_OFF, CACHE_READ_ONLY, CACHE_READ_WRITE)
+
+# 单次运行覆盖配置中的缓存模式
+CACHE_MODE_ENV = "WOLVES_LLM_CACHE_MODE"
+
+class ResponseCache:
+    """基于SQLite的LLM响应缓存，按总字节数做LRU淘汰"""
+
+    def __init__(self, path: str, mode: str = CACHE_READ_WRITE, max_bytes: int = 256 * 1024 * 1024):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"未知的缓存模式: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._total_bytes = 0
+
+        if mode == CACHE_READ_WRITE:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            self._connection.commit()
+        elif mode == CACHE_READ_ONLY and self.path.exists():
+            self._connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+
+        if self._connection is not None:
+            self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @classmethod
+    def from_config(cls) -> Optional["ResponseCache"]:
+        cache_config = ProjectConfig().FindItem("response_cache", {})
+        mode = os.environ.get(CACHE_MODE_ENV, cache_config.get("mode", CACHE_OFF))
+        if mode == CACHE_OFF:
+            return None
+        return cls(
+            cache_config.get("path", "logs/llm_cache.sqlite3"),
+            mode=mode,
+            max_bytes=cache_config.get("max_bytes", 256 * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(model: str, params: Dict[str, Any], messages: Sequence[ChatMessage], **kwargs: Any) -> str:
+        """由模型、采样参数与完整消息列表计算缓存键"""
+        payload = {
+            "model": model,
+            "params": params,
+            "messages": [(str(message.role), message.content) for message in messages],
+            "kwargs": kwargs,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if self._connection is None:
+                self.misses += 1
+                return None
+            row = self._connection.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.mode == CACHE_READ_WRITE:
+                self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if self.mode != CACHE_READ_WRITE or self._connection is None:
+            return
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        size = len(data.encode("utf-8"))
+        with self._lock:
+            previous = self._connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self.writes += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """按最近访问时间淘汰，直到总大小回到上限的90%以内"""
+        # 多进程共享同一缓存文件时以数据库中的实际大小为准
+        self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY last_access ASC")
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "total_bytes": self._total_bytes,
+        }
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+class CachedLLM(DelegatingLLM):
+    """在内部LLM之前查询响应缓存，命中时不再访问模型服务"""
+
+    _cache: ResponseCache = PrivateAttr()
+    _params: Dict[str, Any] = PrivateAttr()
+    _model: str = PrivateAttr()
+
+    def __init__(self, llm: LLM, cache: ResponseCache, params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        super().__init__(llm, **kwargs)
+        self._cache = cache
+        # request_timeout不影响生成结果，不参与缓存键
+        self._params = {key: value for key, value in (params or {}).items() if key != "request_timeout"}
+        # Ollama的metadata会请求模型服务，优先直接读取模型名
+        self._model = getattr(llm, "model", None) or llm.metadata.model_name
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedLLM"
+
+    @property
+    def cache(self) -> ResponseCache:
+        return self._cache
+
+    def _key(self, messages: Sequence[ChatMessage], **kwargs: Any) -> str:
+        return ResponseCache.make_key(self._model, self._params, messages, **kwargs)
+
+    @staticmethod
+    def _dump(response: ChatResponse) -> Dict[str, Any]:
+        return {
+            "role": str(response.message.role.value if hasattr(response.message.role, "value") else response.message.role),
+            "content": response.message.content,
+            "additional_kwargs": response.message.additional_kwargs,
+        }
+
+    @staticmethod
+    def _load(value: Dict[str, Any]) -> ChatResponse:
+        return ChatResponse(
+            message=ChatMessage(
+                role=value["role"],
+                content=value["content"],
+                additional_kwargs=value.get("additional_kwargs", {}),
+            )
+        )
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        key = self._key(messages, **kwargs)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return self._load(cached)
+        response = self.llm.chat(messages, **kwargs)
+        self._cache.put(key, self._dump(response))
+        return response
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        key = self._key(messages, **kwargs)
+        # SQLite查询与写入(含提交与淘汰)在线程中执行，不阻塞同一事件循环上其他对局的决策
+        cached = await asyncio.to_thread(self._cache.get, key)
+        if cached is not None:
+            return self._load(cached)
+        response = await self.llm.achat(messages, **kwargs)
+        await asyncio.to_thread(self._cache.put, key, self._dump(response))
+        return response
+
+    # 流式对话与普通对话共用缓存键：命中时把完整回复作为一个增量块返回，
+    # 未命中时原样转发内部LLM的增量，流完整结束后缓存拼接好的回复，中途停止读取的流不写入缓存
+
+    def _replay(self, value: Dict[str, Any]) -> ChatResponseGen:
+        response = self._load(value)
+        response.delta = response.message.content
+        yield response
+
+    def _record(self, key: str, stream: ChatResponseGen) -> ChatResponseGen:
+        response: Optional[ChatResponse] = None
+        for response in stream:
+            yield response
+        if response is not None:
+            self._cache.put(key, self._dump(response))
+
+    async def _areplay(self, value: Dict[str, Any]) -> ChatResponseAsyncGen:
+        for response in self._replay(value):
+            yield response
+
+    async def _arecord(self, key: str, stream: ChatResponseAsyncGen) -> ChatResponseAsyncGen:
+        response: Optional[ChatResponse] = None
+        async for response in stream:
+            yield response
+        if response is not None:
+            await asyncio.to_thread(self._cache.put, key, self._dump(response))
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        key = self._key(messages, **kwargs)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return self._replay(cached)
+        return self._record(key, self.llm.stream_chat(messages, **kwargs))
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        key = self._key(messages, **kwargs)
+        cached = await asyncio.to_thread(self._cache.get, key)
+        if cached is not None:
+            return self._areplay(cached)
+        return self._arecord(key, await self.llm.astream_chat(messages, **kwargs))
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        key = self._key([ChatMessage(role="user", content=prompt)], formatted=formatted, **kwargs)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return CompletionResponse(text=cached["content"])
+        response = self.llm.complete(prompt, formatted=formatted, **kwargs)
+        self._cache.put(key, {"role": "assistant", "content": response.text})
+        return response
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        key = self._key([ChatMessage(role="user", content=prompt)], formatted=formatted, **kwargs)
+        cached = await asyncio.to_thread(self._cache.get, key)
+        if cached is not None:
+            return CompletionResponse(text=cached["content"])
+        response = await self.llm.acomplete(prompt, formatted=formatted, **kwargs)
+        await asyncio.to_thread(self._cache.put, key, {"role": "assistant", "content": response.text})
+        return response
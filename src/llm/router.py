@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms import LLM
+
+from .delegating_llm import DelegatingLLM
+from .session import current_session
+
+__logger__ = logging.getLogger(__name__)
+
+# 路由自身的超时与后端客户端(如Ollama的request_timeout，通常短于路由的超时)抛出的超时
+TIMEOUT_ERRORS = (asyncio.TimeoutError, TimeoutError, httpx.TimeoutException)
+
+def is_timeout(error: BaseException) -> bool:
+    """请求是否因超时失败，客户端库包装后重新抛出的异常按其原因判断"""
+    return isinstance(error, TIMEOUT_ERRORS) or isinstance(error.__cause__, TIMEOUT_ERRORS)
+
+@dataclass(eq=False)
+class Backend:
+    """一个推理服务端点及其负载与健康状态"""
+
+    name: str
+    llm: LLM
+    weight: float = 1.0
+    # 0表示不限制同时进行的请求数
+    max_in_flight: int = 0
+    in_flight: int = 0
+    requests: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    consecutive_errors: int = 0
+    unhealthy_until: float = 0.0
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.weight if self.weight > 0 else float("inf")
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.max_in_flight <= 0 or self.in_flight < self.max_in_flight
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "weight": self.weight,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "healthy": self.is_healthy(time.monotonic()),
+        }
+
+class RoutedLLM(DelegatingLLM):
+    """把请求分发到多个推理服务端点
+
+    同一会话(玩家)的请求尽量固定到同一端点以复用其前缀缓存，固定的端点已满或不健康时
+    改投按权重计算负载最低的端点；所有端点都满时排队等待。请求超时的端点立即标记为不健康，
+    连续出错达到max_errors次的端点同样标记，冷却unhealthy_cooldown秒后重新参与分配；
+    失败的请求在尚未尝试过的端点上重试
+    """
+
+    request_timeout: float = Field(default=0.0, description="单次请求(流式请求为首个片段)的超时秒数，0表示不限制")
+    unhealthy_cooldown: float = Field(default=30.0, description="端点被标记为不健康后暂停分配的秒数")
+    max_errors: int = Field(default=3, description="连续出错多少次后把端点标记为不健康")
+    pin_sessions: bool = Field(default=True, description="是否把同一会话的请求固定到同一端点")
+    max_pinned_sessions: int = Field(default=4096, description="最多记住的会话固定关系数")
+
+    _backends: List[Backend] = PrivateAttr()
+    _pins: "OrderedDict[str, Backend]" = PrivateAttr(default_factory=OrderedDict)
+    # 等待名额的请求及其已尝试过的端点
+    _waiters: Deque[Tuple[asyncio.Future, Sequence[Backend]]] = PrivateAttr(default_factory=deque)
+
+    def __init__(self, backends: Sequence[Backend], **kwargs: Any) -> None:
+        if not backends:
+            raise ValueError("至少需要一个推理服务端点")
+        super().__init__(backends[0].llm, **kwargs)
+        self._backends = list(backends)
+
+    @classmethod
+    def from_config(cls, create_llm: Callable[[Dict[str, Any]], LLM]) -> Optional["RoutedLLM"]:
+        """按config.json中的llm_router创建路由，未配置端点时返回None
+
+        create_llm根据单个端点的配置创建对应的LLM
+        """
+        router_config = ProjectConfig().FindItem("llm_router", {})
+        backend_configs = router_config.get("backends", [])
+        if not backend_configs:
+            return None
+        backends = [
+            Backend(
+                name=backend_config.get("name", backend_config.get("url", f"backend{index}")),
+                llm=create_llm(backend_config),
+                weight=backend_config.get("weight", 1.0),
+                max_in_flight=backend_config.get("max_in_flight", 0),
+            )
+            for index, backend_config in enumerate(backend_configs)
+        ]
+        return cls(
+            backends,
+            request_timeout=router_config.get("request_timeout", 0.0),
+            unhealthy_cooldown=router_config.get("unhealthy_cooldown", 30.0),
+            max_errors=router_config.get("max_errors", 3),
+            pin_sessions=router_config.get("pin_sessions", True),
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RoutedLLM"
+
+    @property
+    def backends(self) -> List[Backend]:
+        return self._backends
+
+    @property
+    def model(self) -> Optional[str]:
+        # 供CachedLLM计算缓存键，各端点应部署同一模型
+        return getattr(self._backends[0].llm, "model", None)
+
+    def backend_stats(self) -> List[Dict[str, Any]]:
+        return [backend.stats() for backend in self._backends]
+
+    #region 分配
+
+    def _healthy(self, tried: Sequence[Backend]) -> List[Backend]:
+        """尚未尝试过的健康端点；所有端点都不健康时仍然尝试，而不是直接拒绝请求"""
+        now = time.monotonic()
+        candidates = [backend for backend in self._backends if backend not in tried]
+        return [backend for backend in candidates if backend.is_healthy(now)] or candidates
+
+    def _select(self, tried: Sequence[Backend], wait_for_capacity: bool) -> Optional[Backend]:
+        """选择本次请求的端点，wait_for_capacity为真且所有端点都满时返回None"""
+        healthy = self._healthy(tried)
+        session = current_session.get() if self.pin_sessions else None
+        pinned = self._pins.get(session) if session is not None else None
+        if pinned is not None and pinned in healthy and pinned.has_capacity:
+            self._pins.move_to_end(session)
+            return pinned
+        available = [backend for backend in healthy if backend.has_capacity]
+        if not available:
+            if wait_for_capacity:
+                return None
+            available = healthy
+        backend = min(available, key=lambda backend: (backend.load, backend.requests / max(backend.weight, 1e-9)))
+        if session is not None and (pinned is None or pinned not in healthy):
+            self._pins[session] = backend
+            self._pins.move_to_end(session)
+            while len(self._pins) > self.max_pinned_sessions:
+                self._pins.popitem(last=False)
+        return backend
+
+    async def _acquire(self, tried: Sequence[Backend]) -> Backend:
+        while True:
+            backend = self._select(tried, wait_for_capacity=True)
+            if backend is not None:
+                break
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append((waiter, tried))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # 已被唤醒却取消等待时把名额转交给下一个等待者
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_next()
+                raise
+        backend.in_flight += 1
+        backend.requests += 1
+        return backend
+
+    def _release(self, backend: Backend) -> None:
+        backend.in_flight -= 1
+        self._wake_next()
+
+    def _wake_next(self) -> None:
+        """唤醒第一个能使用空出名额的等待者
+
+        已尝试过空出名额的端点的等待者被唤醒后仍会选不到端点，唤醒它会让名额空置，
+        因此跳过这些等待者，它们留在队列中原来的位置
+        """
+        for entry in list(self._waiters):
+            waiter, tried = entry
+            if waiter.done():
+                self._waiters.remove(entry)
+            elif any(backend.has_capacity for backend in self._healthy(tried)):
+                self._waiters.remove(entry)
+                waiter.set_result(None)
+                return
+
+    def _on_success(self, backend: Backend) -> None:
+        backend.consecutive_errors = 0
+
+    def _on_failure(self, backend: Backend, error: BaseException) -> None:
+        backend.errors += 1
+        backend.consecutive_errors += 1
+        timed_out = is_timeout(error)
+        if timed_out:
+            backend.timeouts += 1
+        if timed_out or backend.consecutive_errors >= self.max_errors:
+            backend.unhealthy_until = time.monotonic() + self.unhealthy_cooldown
+            __logger__.warning(f"推理服务端点{backend.name}标记为不健康({self.unhealthy_cooldown}秒): {error!r}")
+
+    async def _arun(self, call: Callable[[LLM], Awaitable[Any]], release: bool = True) -> Tuple[Backend, Any]:
+        """在选出的端点上执行请求，失败时换到尚未尝试过的端点重试
+
+        release为假时成功的请求不释放名额，由调用方在流式输出结束后释放
+        """
+        tried: List[Backend] = []
+        while True:
+            backend = await self._acquire(tried)
+            succeeded = False
+            try:
+                if self.request_timeout > 0:
+                    result = await asyncio.wait_for(call(backend.llm), self.request_timeout)
+                else:
+                    result = await call(backend.llm)
+                succeeded = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self._on_failure(backend, error)
+                tried.append(backend)
+                if len(tried) >= len(self._backends):
+                    raise
+                __logger__.warning(f"推理服务端点{backend.name}请求失败，改投其他端点: {error!r}")
+                continue
+            finally:
+                if release or not succeeded:
+                    self._release(backend)
+            self._on_success(backend)
+            return backend, result
+
+    def _run(self, call: Callable[[LLM], Any]) -> Any:
+        """同步请求不排队等待名额，只按负载选择端点并在失败时换端点重试"""
+        tried: List[Backend] = []
+        while True:
+            backend = self._select(tried, wait_for_capacity=False)
+            backend.in_flight += 1
+            backend.requests += 1
+            try:
+                result = call(backend.llm)
+            except Exception as error:
+                self._on_failure(backend, error)
+                tried.append(backend)
+                if len(tried) >= len(self._backends):
+                    raise
+                continue
+            finally:
+                backend.in_flight -= 1
+            self._on_success(backend)
+            return result
+
+    async def _astream(self, open_stream: Callable[[LLM], Awaitable[Any]]) -> Any:
+        """取得首个片段后才认为端点可用，其余片段输出完毕后释放名额"""
+
+        async def first_chunk(llm: LLM) -> Tuple[Any, Any]:
+            stream = (await open_stream(llm)).__aiter__()
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+
+        backend, (stream, first) = await self._arun(first_chunk, release=False)
+
+        async def gen() -> Any:
+            try:
+                if first is None:
+                    return
+                yield first
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                self._release(backend)
+
+        return gen()
+
+    #endregion
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._run(lambda llm: llm.chat(messages, **kwargs))
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._run(lambda llm: llm.complete(prompt, formatted=formatted, **kwargs))
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        return self._run(lambda llm: llm.stream_chat(messages, **kwargs))
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        return self._run(lambda llm: llm.stream_complete(prompt, formatted=formatted, **kwargs))
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        _, response = await self._arun(lambda llm: llm.achat(messages, **kwargs))
+        return response
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        _, response = await self._arun(lambda llm: llm.acomplete(prompt, formatted=formatted, **kwargs))
+        return response
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        return await self._astream(lambda llm: llm.astream_chat(messages, **kwargs))
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        return await self._astream(lambda llm: llm.astream_complete(prompt, formatted=formatted, **kwargs))
@@ -0,0 +1,51 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from llama_index.core.base.llms.types import ChatMessage
+
+# 当前LLM请求所属的会话，同一玩家的请求共用一个会话，后端据此把请求固定到同一槽位
+current_session: ContextVar[Optional[str]] = ContextVar("current_llm_session", default=None)
+
+@contextmanager
+def session_scope(session_id: str) -> Iterator[str]:
+    token = current_session.set(session_id)
+    try:
+        yield session_id
+    finally:
+        current_session.reset(token)
+
+def serialize_prompt(messages: Sequence[ChatMessage]) -> str:
+    """把消息列表按发送顺序展开为一个字符串，用于比较前缀"""
+    return "".join(f"<{message.role}>{message.content or ''}" for message in messages)
+
+class PrefixTracker:
+    """按会话记录上一次请求的提示词，统计与其共享的前缀比例(前缀命中率)"""
+
+    def __init__(self, max_sessions: Optional[int] = None) -> None:
+        # 会话按玩家创建，长时间运行的服务器中只保留最近活跃的max_sessions个会话
+        self._last_prompts: Dict[str, str] = {}
+        self.max_sessions = max_sessions
+        self.requests = 0
+        self.prompt_chars = 0
+        self.prefix_chars = 0
+
+    def observe(self, session: Optional[str], messages: Sequence[ChatMessage]) -> Tuple[int, int]:
+        """记录一次请求，返回(可复用的前缀字符数, 提示词总字符数)"""
+        prompt = serialize_prompt(messages)
+        previous = self._last_prompts.get(session) if session is not None else None
+        prefix = len(os.path.commonprefix([previous, prompt])) if previous else 0
+        if session is not None:
+            self._last_prompts.pop(session, None)
+            self._last_prompts[session] = prompt
+            if self.max_sessions is not None and len(self._last_prompts) > self.max_sessions:
+                del self._last_prompts[next(iter(self._last_prompts))]
+        self.requests += 1
+        self.prompt_chars += len(prompt)
+        self.prefix_chars += prefix
+        return prefix, len(prompt)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.prefix_chars / self.prompt_chars if self.prompt_chars else 0.0
@@ -1,23 +1,133 @@
+import atexit
+import bisect
+import heapq
 import json
+import queue
+import threading
 import time
 import logging
-from typing import List, Dict, Optional
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Set
 from pathlib import Path
 
 from Convention.Convention.Runtime.Architecture import Architecture
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
 
 __logger__ = logging.getLogger(__name__)
 
+class EventLogWriter:
+    """在后台线程中把事件以紧凑的JSON行追加到文件
+
+    攒够flush_events条或flush_bytes字节，或第一条未写入的事件已等待flush_interval秒时
+    写入一批并刷新到操作系统，进程崩溃时最多丢失最后一批
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, path: Path, flush_events: int = 256, flush_bytes: int = 65536, flush_interval: float = 1.0):
+        self.path = Path(path)
+        self.flush_events = max(1, flush_events)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self.error: Optional[BaseException] = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f"event-log:{self.path.name}", daemon=True)
+        _open_writers.add(self)
+        self._thread.start()
+
+    def write(self, event: Dict) -> None:
+        self._queue.put(event)
+
+    def close(self) -> None:
+        """写入剩余的事件后关闭文件，不等待写入完成"""
+        self._queue.put(EventLogWriter._CLOSE)
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待写入线程结束，返回是否已结束"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self) -> None:
+        try:
+            with open(self.path, "wb") as f:
+                batch: List[bytes] = []
+                size = 0
+                deadline: Optional[float] = None
+                closing = False
+                while not closing:
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        item = None
+                    if item is EventLogWriter._CLOSE:
+                        closing = True
+                    elif item is not None:
+                        line = json.dumps(item, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+                        batch.append(line + b"\n")
+                        size += len(line) + 1
+                        if deadline is None:
+                            deadline = time.monotonic() + self.flush_interval
+                    # 事件持续到达时get不会超时，因此直接比较截止时间，最早的事件等待不超过flush_interval秒
+                    expired = deadline is not None and time.monotonic() >= deadline
+                    if batch and (closing or expired or len(batch) >= self.flush_events or size >= self.flush_bytes):
+                        f.write(b"".join(batch))
+                        f.flush()
+                        self.written += len(batch)
+                        self.batches += 1
+                        batch.clear()
+                        size = 0
+                        deadline = None
+        except Exception as e:
+            self.error = e
+            __logger__.error(f"写入事件日志失败: {self.path}: {e}")
+        finally:
+            _open_writers.discard(self)
+
+_open_writers: Set[EventLogWriter] = set()
+
+@atexit.register
+def _close_open_writers() -> None:
+    """写入线程是守护线程，进程正常退出前写完尚未关闭的日志"""
+    writers = list(_open_writers)
+    for writer in writers:
+        writer.close()
+    for writer in writers:
+        writer.join(5.0)
+
+def iter_event_log(filename: str) -> Iterator[Dict]:
+    """逐行读取JSONL事件日志，跳过崩溃时写了一半的最后一行"""
+    with open(filename, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                __logger__.warning(f"跳过无法解析的事件行: {filename}:{line_number}")
+
 class EventRecorder:
-    def __init__(self, log_file: str = "game_events.json"):
-        Architecture.RegisterGeneric(
-            self,
-            lambda: __logger__.info(f"事件录制器初始化，日志文件: {log_file}"),
-        )
+    def __init__(self, log_file: str = "game_events.json", *, register: bool = True, stream: Optional[bool] = None):
+        """stream为真时每局的事件由后台线程实时追加到JSONL文件，为None时读取web.event_log配置"""
+        if register:
+            Architecture.RegisterGeneric(
+                self,
+                lambda: __logger__.info(f"事件录制器初始化，日志文件: {log_file}"),
+            )
         self.log_file = Path(log_file)
         self.events: List[Dict] = []
         self.sequence_id = 0
         self.game_start_time = None
+
+        log_config: Dict[str, Any] = ProjectConfig().FindItem("web", {}).get("event_log", {})
+        self.stream = log_config.get("stream", False) if stream is None else stream
+        self.flush_events = log_config.get("flush_events", 256)
+        self.flush_bytes = log_config.get("flush_bytes", 65536)
+        self.flush_interval = log_config.get("flush_interval", 1.0)
+        self.games = 0
+        self.writer: Optional[EventLogWriter] = None
+        self._reset_indexes()
         
         # 确保日志目录存在
         self.log_file.parent.mkdir(parents=True, exist_ok=True)
@@ -29,6 +139,15 @@ class EventRecorder:
         self.game_start_time = time.time()
         self.sequence_id = 0
         self.events.clear()
+        self._reset_indexes()
+        self.games += 1
+        if self.stream:
+            # 每局写入单独的文件
+            if self.writer is not None:
+                self.writer.close()
+            self.writer = EventLogWriter(
+                self.game_log_path(), self.flush_events, self.flush_bytes, self.flush_interval
+            )
         
         # 记录游戏开始事件
         self.record_event("game_start", {
@@ -38,18 +157,25 @@ class EventRecorder:
         
         __logger__.info("开始记录游戏事件")
         
-    def end_game(self):
-        """结束游戏记录"""
+    def end_game(self, llm_usage: Optional[Dict] = None):
+        """结束游戏记录，llm_usage为本局的LLM用量合计，写入game_end事件"""
         if self.game_start_time:
             game_duration = time.time() - self.game_start_time
-            self.record_event("game_end", {
+            data = {
                 "duration": game_duration,
                 "total_events": len(self.events),
                 "message": "游戏结束"
-            })
+            }
+            if llm_usage is not None:
+                data["llm_usage"] = llm_usage
+            self.record_event("game_end", data)
             
-            # 保存事件到文件
-            self.save_events()
+            if self.writer is not None:
+                # 剩余的事件由写入线程写完，不阻塞调用方
+                self.writer.close()
+            else:
+                # 保存事件到文件
+                self.save_events()
             __logger__.info(f"游戏结束，共记录 {len(self.events)} 个事件，持续时间: {game_duration:.2f}秒")
             
     def record_event(self, event_type: str, data: dict, timestamp: Optional[float] = None) -> int:
@@ -67,36 +193,103 @@ class EventRecorder:
         }
         
         self.events.append(event)
+        self._index_event(event)
+        if self.writer is not None:
+            self.writer.write(event)
         
         __logger__.debug(f"记录事件: {event_type} (序列号: {self.sequence_id})")
         return self.sequence_id
         
+    #region 索引
+
+    def _reset_indexes(self):
+        # 序列号与时间戳各自有序的数组，与之平行的数组为事件在self.events中的位置
+        self._sequence_keys: List[int] = []
+        self._sequence_positions: List[int] = []
+        self._position_by_sequence: Dict[int, int] = {}
+        self._time_keys: List[float] = []
+        self._time_positions: List[int] = []
+        # 时间戳是否随记录顺序不减，是时时间范围即位置范围
+        self._time_ordered = True
+        self._type_positions: Dict[str, List[int]] = {}
+        self._type_counts: Dict[str, int] = {}
+
+    @staticmethod
+    def _insert_sorted(keys: List, positions: List[int], key, position: int) -> bool:
+        """按键插入位置，返回是否追加在末尾"""
+        if not keys or keys[-1] <= key:
+            keys.append(key)
+            positions.append(position)
+            return True
+        index = bisect.bisect_right(keys, key)
+        keys.insert(index, key)
+        positions.insert(index, position)
+        return False
+
+    def _index_event(self, event: Dict):
+        position = len(self.events) - 1
+        event_type = event["event_type"]
+        self._insert_sorted(self._sequence_keys, self._sequence_positions, event["sequence_id"], position)
+        self._position_by_sequence[event["sequence_id"]] = position
+        if not self._insert_sorted(self._time_keys, self._time_positions, event["timestamp"], position):
+            self._time_ordered = False
+        self._type_positions.setdefault(event_type, []).append(position)
+        self._type_counts[event_type] = self._type_counts.get(event_type, 0) + 1
+
+    def _rebuild_indexes(self):
+        """self.events被整体替换后重建索引"""
+        events = self.events
+        self.events = []
+        self._reset_indexes()
+        for event in events:
+            self.events.append(event)
+            self._index_event(event)
+
+    def _positions_in_time_range(self, start_time: Optional[float], end_time: Optional[float]) -> Iterable[int]:
+        low = 0 if start_time is None else bisect.bisect_left(self._time_keys, start_time)
+        high = len(self._time_keys) if end_time is None else bisect.bisect_right(self._time_keys, end_time)
+        if self._time_ordered:
+            return range(low, high)
+        return sorted(self._time_positions[low:high])
+
+    #endregion
+        
+    def get_event(self, sequence: int) -> Optional[Dict]:
+        """按序列号获取单个事件"""
+        position = self._position_by_sequence.get(sequence)
+        return self.events[position] if position is not None else None
+        
     def get_events(self, start_time: Optional[float] = None, 
                    end_time: Optional[float] = None,
                    event_types: Optional[List[str]] = None) -> List[Dict]:
-        """获取指定时间范围和类型的事件"""
-        filtered_events = self.events
-        
-        # 按时间过滤
-        if start_time is not None:
-            filtered_events = [e for e in filtered_events if e["timestamp"] >= start_time]
-            
-        if end_time is not None:
-            filtered_events = [e for e in filtered_events if e["timestamp"] <= end_time]
-            
-        # 按事件类型过滤
-        if event_types is not None:
-            filtered_events = [e for e in filtered_events if e["event_type"] in event_types]
-            
-        return filtered_events
+        """获取指定时间范围和类型的事件，按记录顺序返回"""
+        if start_time is None and end_time is None and event_types is None:
+            return self.events
+        if event_types is None:
+            return [self.events[position] for position in self._positions_in_time_range(start_time, end_time)]
+        type_positions = [self._type_positions[t] for t in set(event_types) if t in self._type_positions]
+        if self._time_ordered:
+            # 时间范围即位置范围，在各类型的位置数组中二分后按位置归并
+            window = self._positions_in_time_range(start_time, end_time)
+            type_positions = [
+                positions[bisect.bisect_left(positions, window.start):bisect.bisect_left(positions, window.stop)]
+                for positions in type_positions
+            ]
+            return [self.events[position] for position in heapq.merge(*type_positions)]
+        event_types = set(event_types)
+        return [
+            self.events[position] for position in self._positions_in_time_range(start_time, end_time)
+            if self.events[position]["event_type"] in event_types
+        ]
         
     def get_events_by_sequence(self, start_sequence: int, end_sequence: Optional[int] = None) -> List[Dict]:
         """按序列号获取事件"""
         if end_sequence is None:
             end_sequence = self.sequence_id
             
-        return [e for e in self.events 
-                if start_sequence <= e["sequence_id"] <= end_sequence]
+        low = bisect.bisect_left(self._sequence_keys, start_sequence)
+        high = bisect.bisect_right(self._sequence_keys, end_sequence)
+        return [self.events[position] for position in sorted(self._sequence_positions[low:high])]
                 
     def get_latest_events(self, count: int) -> List[Dict]:
         """获取最新的事件"""
@@ -107,20 +300,27 @@ class EventRecorder:
         if not self.events:
             return {}
             
-        event_types = {}
-        for event in self.events:
-            event_type = event["event_type"]
-            event_types[event_type] = event_types.get(event_type, 0) + 1
-            
         return {
             "total_events": len(self.events),
-            "event_types": event_types,
+            "event_types": dict(self._type_counts),
             "start_time": self.game_start_time,
             "end_time": self.events[-1]["timestamp"] if self.events else None,
             "duration": (self.events[-1]["timestamp"] - self.game_start_time) 
                        if self.events and self.game_start_time else 0
         }
         
+    def game_log_path(self) -> Path:
+        """流式模式下当前这局的日志文件，同一录制器的第二局起在文件名中加上局号"""
+        if self.games <= 1:
+            return self.log_file.with_suffix(".jsonl")
+        return self.log_file.with_name(f"{self.log_file.stem}.{self.games}.jsonl")
+
+    def wait_written(self, timeout: Optional[float] = None) -> bool:
+        """等待已结束对局的事件全部写入文件，返回是否写完"""
+        if self.writer is None:
+            return True
+        return self.writer.join(timeout)
+        
     def save_events(self, filename: Optional[str] = None):
         """保存事件到文件"""
         if filename is None:
@@ -139,14 +339,18 @@ class EventRecorder:
             __logger__.error(f"保存事件失败: {e}")
             
     def load_events(self, filename: str) -> bool:
-        """从文件加载事件"""
+        """从文件加载事件，.jsonl文件逐行读取"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if Path(filename).suffix == ".jsonl":
+                self.events = list(iter_event_log(filename))
+            else:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.events = data.get("events", [])
+            self._rebuild_indexes()
                 
-            self.events = data.get("events", [])
             if self.events:
-                self.sequence_id = max(e["sequence_id"] for e in self.events)
+                self.sequence_id = self._sequence_keys[-1]
                 self.game_start_time = self.events[0]["timestamp"]
                 
             __logger__.info(f"从文件加载了 {len(self.events)} 个事件: {filename}")
@@ -159,6 +363,7 @@ class EventRecorder:
     def clear_events(self):
         """清空所有事件"""
         self.events.clear()
+        self._reset_indexes()
         self.sequence_id = 0
         self.game_start_time = None
         __logger__.info("已清空所有事件")
@@ -168,19 +373,12 @@ class EventRecorder:
         if not self.events:
             return {}
             
-        stats = {
+        return {
             "total_events": len(self.events),
-            "event_type_counts": {},
+            "event_type_counts": dict(self._type_counts),
             "time_range": {
                 "start": self.events[0]["timestamp"],
                 "end": self.events[-1]["timestamp"],
                 "duration": self.events[-1]["timestamp"] - self.events[0]["timestamp"]
             }
-        }
-        
-        # 统计事件类型
-        for event in self.events:
-            event_type = event["event_type"]
-            stats["event_type_counts"][event_type] = stats["event_type_counts"].get(event_type, 0) + 1
-            
-        return stats 
\ No newline at end of file
+        } 
\ No newline at end of file
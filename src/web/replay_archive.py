@@ -0,0 +1,296 @@
+import argparse
+import bisect
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+
+from .event_recorder import EventRecorder
+
+__logger__ = logging.getLogger(__name__)
+
+MAGIC = b"WOLVESRP"
+# 文件末尾: 索引偏移、索引长度、MAGIC
+FOOTER = struct.Struct("<QQ8s")
+REPLAY_SUFFIX = ".replay"
+CATALOG_FILE = "catalog.jsonl"
+
+#region 单局回放文件
+
+class ReplayFileWriter:
+    """把一局的事件按block_events条一块写成zlib压缩块，最后写入块索引
+
+    文件布局: MAGIC | 块... | 压缩的JSON索引 | 页脚，先写到临时文件，关闭时才替换为正式文件
+    """
+
+    def __init__(self, path: Path, block_events: int = 256, compress_level: int = 6):
+        self.path = Path(path)
+        self.block_events = max(1, block_events)
+        self.compress_level = compress_level
+        self.blocks: List[List[Any]] = []
+        self.total_events = 0
+        self.raw_bytes = 0
+        self._pending: List[bytes] = []
+        self._first: Optional[Dict] = None
+        self._last: Optional[Dict] = None
+        self._temp_path = self.path.with_name(self.path.name + ".tmp")
+        self._file = open(self._temp_path, "wb")
+        self._file.write(MAGIC)
+
+    def add(self, event: Dict) -> None:
+        if self._first is None:
+            self._first = event
+        self._pending.append(json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8"))
+        self._last = event
+        if len(self._pending) >= self.block_events:
+            self._write_block()
+
+    def _write_block(self) -> None:
+        raw = b"\n".join(self._pending)
+        data = zlib.compress(raw, self.compress_level)
+        # 块索引: 首个序列号, 末个序列号, 首个事件的位置, 事件数, 偏移, 压缩后长度, 首个时间戳
+        self.blocks.append([
+            self._first["sequence_id"], self._last["sequence_id"], self.total_events,
+            len(self._pending), self._file.tell(), len(data), self._first["timestamp"],
+        ])
+        self._file.write(data)
+        self.total_events += len(self._pending)
+        self.raw_bytes += len(raw)
+        self._pending.clear()
+        self._first = None
+
+    def close(self, summary: Dict) -> None:
+        """写入剩余的事件、索引与页脚，summary随索引保存"""
+        if self._pending:
+            self._write_block()
+        index = zlib.compress(json.dumps({
+            "total_events": self.total_events,
+            "blocks": self.blocks,
+            "summary": summary,
+        }, ensure_ascii=False, default=str).encode("utf-8"), self.compress_level)
+        index_offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(FOOTER.pack(index_offset, len(index), MAGIC))
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self) -> None:
+        """放弃写入并删除临时文件"""
+        self._file.close()
+        self._temp_path.unlink(missing_ok=True)
+
+class ArchivedGame:
+    """按需读取的单局回放文件
+
+    打开时只读取块索引，按位置或序列号取事件时只解压所在的块，并缓存最近读取的一块；
+    可像列表一样按位置下标访问，供ReplaySession直接回放
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是回放文件: {self.path}")
+            f.seek(-FOOTER.size, os.SEEK_END)
+            index_offset, index_length, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"回放文件不完整: {self.path}")
+            f.seek(index_offset)
+            index = json.loads(zlib.decompress(f.read(index_length)))
+        self.total_events: int = index["total_events"]
+        self.summary: Dict = index["summary"]
+        self.blocks: List[List[Any]] = index["blocks"]
+        self._first_sequences = [block[0] for block in self.blocks]
+        self._first_positions = [block[2] for block in self.blocks]
+        self._cached_block: Optional[int] = None
+        self._cached_events: List[Dict] = []
+        self.blocks_read = 0
+
+    def __len__(self) -> int:
+        return self.total_events
+
+    def read_block(self, block_index: int) -> List[Dict]:
+        if block_index != self._cached_block:
+            _, _, _, _, offset, length, _ = self.blocks[block_index]
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                raw = zlib.decompress(f.read(length))
+            self._cached_events = [json.loads(line) for line in raw.split(b"\n")]
+            self._cached_block = block_index
+            self.blocks_read += 1
+        return self._cached_events
+
+    def __getitem__(self, position: int) -> Dict:
+        if position < 0:
+            position += self.total_events
+        if not 0 <= position < self.total_events:
+            raise IndexError(position)
+        block_index = bisect.bisect_right(self._first_positions, position) - 1
+        return self.read_block(block_index)[position - self.blocks[block_index][2]]
+
+    def _block_of_sequence(self, sequence: int) -> int:
+        return max(0, bisect.bisect_right(self._first_sequences, sequence) - 1)
+
+    def get_event(self, sequence: int) -> Optional[Dict]:
+        """按序列号获取单个事件，只解压所在的块"""
+        if not self.blocks:
+            return None
+        block_index = self._block_of_sequence(sequence)
+        if not self.blocks[block_index][0] <= sequence <= self.blocks[block_index][1]:
+            return None
+        for event in self.read_block(block_index):
+            if event["sequence_id"] == sequence:
+                return event
+        return None
+
+    def iter_events(self, start_sequence: int = 0) -> Iterator[Dict]:
+        """从指定序列号开始逐块读取事件"""
+        if not self.blocks:
+            return
+        for block_index in range(self._block_of_sequence(start_sequence), len(self.blocks)):
+            for event in self.read_block(block_index):
+                if event["sequence_id"] >= start_sequence:
+                    yield event
+
+    def get_events_by_sequence(self, start_sequence: int, end_sequence: Optional[int] = None) -> List[Dict]:
+        events = []
+        for event in self.iter_events(start_sequence):
+            if end_sequence is not None and event["sequence_id"] > end_sequence:
+                break
+            events.append(event)
+        return events
+
+#endregion
+
+def summarize_events(events: Sequence[Dict]) -> Dict[str, Any]:
+    """从事件本身得到的摘要，调用方给出的角色、胜者与回合数会覆盖其中的字段"""
+    summary: Dict[str, Any] = {
+        "total_events": len(events),
+        "start_time": events[0]["timestamp"] if events else None,
+        "end_time": events[-1]["timestamp"] if events else None,
+        "duration": events[-1]["timestamp"] - events[0]["timestamp"] if events else 0,
+        "winner": None,
+    }
+    for event in reversed(events):
+        if event["event_type"] == "game_victory":
+            summary["winner"] = event["data"].get("winner") or event["data"].get("victory_condition")
+            break
+    return summary
+
+class ReplayArchive:
+    """回放归档目录：每局一个压缩回放文件，catalog.jsonl中每局一行摘要"""
+
+    def __init__(self, directory: str, block_events: int = 256, compress_level: int = 6):
+        self.directory = Path(directory)
+        self.block_events = block_events
+        self.compress_level = compress_level
+        self.catalog_path = self.directory / CATALOG_FILE
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, directory: Optional[str] = None) -> Optional["ReplayArchive"]:
+        """按web.replay_archive配置创建，未启用时返回None；directory覆盖配置中的目录"""
+        archive_config = ProjectConfig().FindItem("web", {}).get("replay_archive", {})
+        if not archive_config.get("enabled", False):
+            return None
+        return cls(
+            directory or archive_config.get("dir", "logs/replays"),
+            block_events=archive_config.get("block_events", 256),
+            compress_level=archive_config.get("compress_level", 6),
+        )
+
+    def game_path(self, game_id: str) -> Path:
+        # game_id来自房间ID与URL，不允许指向归档目录之外
+        if not game_id or Path(game_id).name != game_id or game_id in (".", ".."):
+            raise ValueError(f"无效的对局编号: {game_id}")
+        return self.directory / f"{game_id}{REPLAY_SUFFIX}"
+
+    def archive_game(
+        self,
+        game_id: str,
+        events: Sequence[Dict],
+        roles: Optional[Dict[str, int]] = None,
+        winner: Optional[str] = None,
+        rounds: Optional[int] = None
+        ) -> Dict[str, Any]:
+        """写入一局的回放文件并在目录中追加摘要行，返回摘要行"""
+        path = self.game_path(game_id)
+        summary = summarize_events(events)
+        summary.update(game_id=game_id, roles=roles, rounds=rounds)
+        if winner is not None:
+            summary["winner"] = winner
+        writer = ReplayFileWriter(path, self.block_events, self.compress_level)
+        try:
+            for event in events:
+                writer.add(event)
+            writer.close(summary)
+        except BaseException:
+            writer.abort()
+            raise
+        row = dict(summary, file=path.name, blocks=len(writer.blocks),
+                   bytes=path.stat().st_size, raw_bytes=writer.raw_bytes, archived_at=time.time())
+        # 每行以一次追加写入，多个进程同时归档时各行不会交错
+        with open(self.catalog_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        __logger__.info(f"已归档对局 {game_id}: {len(events)} 个事件, {row['bytes']} 字节")
+        return row
+
+    def import_log(self, log_file: str, game_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """把事件录制器写出的.json或.jsonl日志转换为回放文件"""
+        recorder = EventRecorder(log_file, register=False, stream=False)
+        if not recorder.load_events(log_file) or not recorder.events:
+            return None
+        return self.archive_game(game_id or Path(log_file).stem, recorder.events)
+
+    def list_games(self) -> List[Dict[str, Any]]:
+        """目录中的全部摘要行，同一对局重复归档时以最后一行为准"""
+        if not self.catalog_path.exists():
+            return []
+        rows: Dict[str, Dict[str, Any]] = {}
+        with open(self.catalog_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    rows[row["game_id"]] = row
+        return list(rows.values())
+
+    def open_game(self, game_id: str) -> Optional[ArchivedGame]:
+        try:
+            path = self.game_path(game_id)
+        except ValueError:
+            return None
+        if not path.exists():
+            return None
+        return ArchivedGame(path)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="把事件日志转换为压缩回放归档")
+    parser.add_argument("logs", nargs="+", help="事件录制器写出的.json或.jsonl日志")
+    parser.add_argument("--archive-dir", default=None, help="归档目录，默认使用web.replay_archive.dir")
+    parser.add_argument("--block-events", type=int, default=256, help="每个压缩块的事件数")
+    args = parser.parse_args(argv)
+
+    archive_config = ProjectConfig().FindItem("web", {}).get("replay_archive", {})
+    archive = ReplayArchive(
+        args.archive_dir or archive_config.get("dir", "logs/replays"),
+        block_events=args.block_events,
+        compress_level=archive_config.get("compress_level", 6),
+    )
+    for log_file in args.logs:
+        row = archive.import_log(log_file)
+        if row is None:
+            print(f"跳过: {log_file}")
+        else:
+            print(f"{log_file} -> {archive.game_path(row['game_id'])} ({row['raw_bytes']} -> {row['bytes']} 字节)")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,21 @@
 import asyncio
 import time
 import logging
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Sequence
 from .event_recorder import EventRecorder
+from .replay_archive import ArchivedGame, ReplayArchive
 from .websocket_server import WebSocketServer
 from Convention.Convention.Runtime.Architecture import Architecture
 
 __logger__ = logging.getLogger(__name__)
 
 class ReplaySession:
-    def __init__(self, observer_id: str, event_recorder: EventRecorder, websocket_server: WebSocketServer):
+    def __init__(self, observer_id: str, event_recorder: EventRecorder, websocket_server: WebSocketServer,
+                 events: Optional[Sequence[Dict]] = None):
+        """events为要回放的事件序列，默认为录制器中的当前对局，也可以是按需解压的ArchivedGame"""
         self.observer_id = observer_id
         self.event_recorder = event_recorder
+        self.events = events if events is not None else event_recorder.events
         self.websocket_server = websocket_server
         self.is_playing = False
         self.current_sequence = 0
@@ -31,7 +35,7 @@ class ReplaySession:
             "type": "replay_started",
             "start_sequence": start_sequence,
             "speed": speed,
-            "total_events": len(self.event_recorder.events)
+            "total_events": len(self.events)
         })
         
         # 启动回放任务
@@ -81,7 +85,7 @@ class ReplaySession:
         
     async def jump_to_sequence(self, sequence: int):
         """跳转到指定序列号"""
-        if 0 <= sequence <= len(self.event_recorder.events):
+        if 0 <= sequence <= len(self.events):
             self.current_sequence = sequence
             self.start_time = time.time()
             
@@ -96,7 +100,7 @@ class ReplaySession:
     async def _replay_loop(self):
         """回放循环"""
         try:
-            events = self.event_recorder.events
+            events = self.events
             if not events:
                 await self.websocket_server._send_to_observer(self.observer_id, {
                     "type": "replay_error",
@@ -147,25 +151,39 @@ class ReplaySession:
             })
 
 class ReplaySystem:
-    def __init__(self, event_recorder: EventRecorder, websocket_server: WebSocketServer):
-        Architecture.RegisterGeneric(
-            self,
-            lambda: __logger__.info("回放系统初始化"),
-        )
+    def __init__(self, event_recorder: EventRecorder, websocket_server: WebSocketServer, *, register: bool = True,
+                 archive: Optional[ReplayArchive] = None):
+        if register:
+            Architecture.RegisterGeneric(
+                self,
+                lambda: __logger__.info("回放系统初始化"),
+            )
         self.event_recorder = event_recorder
         self.websocket_server = websocket_server
         self.replay_sessions: Dict[str, ReplaySession] = {}
+        self.archive = archive
         
         __logger__.info("回放系统初始化")
         
-    async def start_replay(self, observer_id: str, start_sequence: int = 0, speed: float = 1.0):
-        """为观察者开始回放"""
+    async def start_replay(self, observer_id: str, start_sequence: int = 0, speed: float = 1.0,
+                           game_id: Optional[str] = None):
+        """为观察者开始回放，game_id为归档中的对局，未指定时回放当前对局"""
+        events = None
+        if game_id is not None:
+            events = self.open_replay(game_id)
+            if events is None:
+                await self.websocket_server._send_to_observer(observer_id, {
+                    "type": "replay_error",
+                    "message": f"回放不存在: {game_id}"
+                })
+                return
+            
         # 如果已有回放会话，先停止
         if observer_id in self.replay_sessions:
             await self.stop_replay(observer_id)
             
         # 创建新的回放会话
-        session = ReplaySession(observer_id, self.event_recorder, self.websocket_server)
+        session = ReplaySession(observer_id, self.event_recorder, self.websocket_server, events)
         self.replay_sessions[observer_id] = session
         
         await session.start_replay(start_sequence, speed)
@@ -209,7 +227,7 @@ class ReplaySystem:
                 "is_playing": session.is_playing,
                 "current_sequence": session.current_sequence,
                 "playback_speed": session.playback_speed,
-                "total_events": len(self.event_recorder.events)
+                "total_events": len(session.events)
             }
         else:
             return {
@@ -229,11 +247,20 @@ class ReplaySystem:
             await self.stop_replay(observer_id)
             
     async def get_available_replays(self) -> List[Dict]:
-        """获取可用的回放列表"""
-        # 这里可以扩展为从文件系统读取历史游戏记录
-        return [{
+        """获取可用的回放列表：当前游戏与归档目录中的历史对局"""
+        replays = [{
             "id": "current_game",
             "name": "当前游戏",
             "total_events": len(self.event_recorder.events),
             "duration": self.event_recorder.get_game_summary().get("duration", 0)
-        }] 
\ No newline at end of file
+        }]
+        if self.archive is not None:
+            for row in await asyncio.to_thread(self.archive.list_games):
+                replays.append(dict(row, id=row["game_id"], name=row["game_id"]))
+        return replays
+        
+    def open_replay(self, game_id: str) -> Optional[ArchivedGame]:
+        """打开归档中的对局，返回按需解压的ArchivedGame，不存在时返回None"""
+        if self.archive is None:
+            return None
+        return self.archive.open_game(game_id) 
\ No newline at end of file
@@ -0,0 +1,284 @@
+import asyncio
+import importlib
+import logging
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from src.engine.game_config import GameConfig, Role
+from src.engine.game_engine import GameContext
+
+from .event_recorder import EventRecorder
+from .replay_archive import ReplayArchive
+from .replay_system import ReplaySystem
+from .web_ui_system import WebUISystem
+from .websocket_server import WebSocketServer
+
+__logger__ = logging.getLogger(__name__)
+
+# 智能体相关模块(llama_index与LLM后端)导入较慢，服务器监听端口后才在线程中加载
+_agent_stack: Optional[asyncio.Future] = None
+
+def _load_agent_stack() -> None:
+    player_engine = importlib.import_module("src.engine.player_engine")
+    player_engine.EnsureLLMSettings()
+
+def preload_agent_stack() -> asyncio.Future:
+    """在后台线程中导入玩家智能体模块并创建LLM，重复调用返回同一个Future"""
+    global _agent_stack
+    if _agent_stack is None:
+        _agent_stack = asyncio.ensure_future(asyncio.to_thread(_load_agent_stack))
+    return _agent_stack
+
+def agent_stack_status() -> str:
+    if _agent_stack is None or not _agent_stack.done():
+        return "loading"
+    if _agent_stack.cancelled() or _agent_stack.exception() is not None:
+        return "failed"
+    return "ready"
+
+# 房间ID会出现在URL、日志文件名与回放编号中
+ROOM_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+def validate_room_id(room_id: str) -> str:
+    if not isinstance(room_id, str) or not ROOM_ID_PATTERN.fullmatch(room_id):
+        raise ValueError("房间ID只能包含字母、数字、下划线与连字符，长度为1到64")
+    return room_id
+
+def validate_room_config(room_config: Dict[str, int], max_seats: int) -> Dict[str, int]:
+    """检查房间的角色配置：只允许已知角色，人数为非负整数，总人数不超过max_seats且双方都有玩家"""
+    if not isinstance(room_config, dict) or not room_config:
+        raise ValueError("房间配置必须是非空的 {角色: 人数} 对象")
+    role_by_name = GameConfig.current().role_by_name
+    for playerRole, playerCount in room_config.items():
+        if playerRole not in role_by_name:
+            raise ValueError(f"未知的角色: {playerRole}，可用角色: {', '.join(role_by_name)}")
+        if isinstance(playerCount, bool) or not isinstance(playerCount, int) or playerCount < 0:
+            raise ValueError(f"角色 {playerRole} 的人数必须是非负整数")
+    seats = sum(room_config.values())
+    if seats > max_seats:
+        raise ValueError(f"房间人数 {seats} 超过上限 {max_seats}")
+    roles = {role_by_name[playerRole] for playerRole, playerCount in room_config.items() if playerCount > 0}
+    if Role.WEREWOLF not in roles or Role.VILLAGER not in roles:
+        raise ValueError("房间中至少需要一名狼人与一名村民")
+    return dict(room_config)
+
+class GameRoom:
+    """一个可被观战的游戏房间，拥有独立的游戏上下文、事件队列、录制器与观察者集合"""
+
+    WAITING = "waiting"
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+
+    def __init__(self, room_id: str, room_config: Dict[str, int], log_dir: Path, autostart: bool = False,
+                 archive: Optional[ReplayArchive] = None):
+        self.room_id = room_id
+        self.room_config = room_config
+        self.autostart = autostart
+        self.status = GameRoom.WAITING
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # 从开始游戏到玩家全部入座的秒数
+        self.setup_time: Optional[float] = None
+
+        self.event_queue: asyncio.Queue = asyncio.Queue()
+        self.connection_event = asyncio.Event()
+        self.websocket_server = WebSocketServer(register=False)
+        self.websocket_server.set_event_queue(self.event_queue)
+        self.websocket_server.set_connection_event(self.connection_event)
+        self.event_recorder = EventRecorder(str(log_dir / f"{room_id}.json"), register=False)
+        self.archive = archive
+        # 归档中的对局编号，房间ID会在服务器重启后重复使用，因此加上开始时间
+        self.archive_id: Optional[str] = None
+        self.replay_system = ReplaySystem(self.event_recorder, self.websocket_server, register=False, archive=archive)
+        self.web_ui_system = WebUISystem(self.websocket_server, self.event_recorder, register=False)
+        self.context = GameContext.create(self.web_ui_system, game_id=room_id)
+
+        self.tasks: List[asyncio.Task] = []
+
+    def populate_players(self) -> None:
+        """按房间配置创建玩家"""
+        from src.engine.player_engine import PlayerAgent
+        playerId: int = 1
+        for playerRole, playerCount in self.room_config.items():
+            for _ in range(playerCount):
+                self.context.game.add_player(PlayerAgent.create(f"player{playerId}", playerRole))
+                playerId += 1
+
+    async def run(self, running_slots: asyncio.Semaphore):
+        """等待观察者连接后，在并发名额内运行游戏"""
+        self.tasks.append(asyncio.create_task(self.websocket_server.process_event_queue()))
+        try:
+            if not self.autostart:
+                await self.connection_event.wait()
+            self.status = GameRoom.QUEUED
+            async with running_slots:
+                self.status = GameRoom.RUNNING
+                self.started_at = time.time()
+                __logger__.info(f"房间 {self.room_id} 开始游戏")
+                await preload_agent_stack()
+                self.event_recorder.start_game()
+                setup_start = time.perf_counter()
+                self.populate_players()
+                self.setup_time = time.perf_counter() - setup_start
+                __logger__.info(f"房间 {self.room_id} 准备耗时 {self.setup_time * 1000:.2f}毫秒")
+                await self.context.game.astart_game()
+                self.event_recorder.end_game(self.context.llm_usage.as_dict())
+                self.status = GameRoom.FINISHED
+                await self.archive_game()
+        except asyncio.CancelledError:
+            self.status = GameRoom.FAILED
+            raise
+        except Exception as e:
+            self.status = GameRoom.FAILED
+            __logger__.exception(f"房间 {self.room_id} 游戏运行失败: {e}")
+        finally:
+            self.finished_at = time.time()
+            for player in self.context.game.players.values():
+                player.release_agent()
+
+    async def archive_game(self) -> None:
+        """把结束的对局写入回放归档，在线程中压缩以免阻塞事件循环"""
+        if self.archive is None:
+            return
+        game = self.context.game
+        archive_id = f"{self.room_id}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}"
+        try:
+            await asyncio.to_thread(
+                self.archive.archive_game, archive_id, list(self.event_recorder.events),
+                roles=self.room_config, winner=game.victory_conditions, rounds=game.round,
+            )
+            self.archive_id = archive_id
+        except Exception as e:
+            __logger__.error(f"房间 {self.room_id} 归档回放失败: {e}")
+
+    def summary(self) -> Dict:
+        """房间摘要信息"""
+        game = self.context.game
+        return {
+            "room_id": self.room_id,
+            "status": self.status,
+            "room": self.room_config,
+            "round": game.round,
+            "victory_conditions": game.victory_conditions,
+            "observers": self.websocket_server.get_observer_count(),
+            "total_events": len(self.event_recorder.events),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "setup_time": self.setup_time,
+            "archive_id": self.archive_id,
+        }
+
+class RoomManager:
+    """管理同一服务器内的多个游戏房间，并限制同时运行的游戏数量"""
+
+    def __init__(
+        self,
+        max_running_games: int = 4,
+        log_dir: str = "logs/rooms",
+        archive: Optional[ReplayArchive] = None,
+        max_rooms: int = 64,
+        max_seats: int = 16,
+        finished_room_ttl: float = 3600.0
+        ):
+        self.rooms: Dict[str, GameRoom] = {}
+        self.archive = archive
+        self.max_running_games = max(1, max_running_games)
+        # 房间总数上限(包括等待与已结束的房间)与单个房间的人数上限
+        self.max_rooms = max(1, max_rooms)
+        self.max_seats = max(2, max_seats)
+        # 已结束的房间保留的秒数，过期后在创建新房间时移除
+        self.finished_room_ttl = finished_room_ttl
+        self.running_slots = asyncio.Semaphore(self.max_running_games)
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls) -> "RoomManager":
+        web_config = ProjectConfig().FindItem("web", {})
+        return cls(
+            max_running_games=web_config.get("max_running_games", 4),
+            log_dir=web_config.get("room_log_dir", "logs/rooms"),
+            archive=ReplayArchive.from_config(),
+            max_rooms=web_config.get("max_rooms", 64),
+            max_seats=web_config.get("max_seats", 16),
+            finished_room_ttl=web_config.get("finished_room_ttl", 3600.0),
+        )
+
+    def create_room(
+        self,
+        room_id: Optional[str] = None,
+        room_config: Optional[Dict[str, int]] = None,
+        autostart: bool = False
+        ) -> GameRoom:
+        """创建房间并启动其运行任务
+
+        房间ID或角色配置无效时抛出ValueError，房间已存在时抛出KeyError，
+        移除过期与最早结束的房间后仍达到房间数量上限时抛出RuntimeError
+        """
+        if room_id is None:
+            room_id = uuid.uuid4().hex[:8]
+        validate_room_id(room_id)
+        if room_config is None:
+            room_config = ProjectConfig().FindItem("room")
+        room_config = validate_room_config(room_config, self.max_seats)
+        if room_id in self.rooms:
+            raise KeyError(f"房间已存在: {room_id}")
+        self.evict_finished_rooms()
+        if len(self.rooms) >= self.max_rooms:
+            raise RuntimeError(f"房间数量已达上限: {self.max_rooms}")
+        room = GameRoom(room_id, room_config, self.log_dir, autostart=autostart, archive=self.archive)
+        self.rooms[room_id] = room
+        room.tasks.append(asyncio.create_task(room.run(self.running_slots)))
+        __logger__.info(f"创建房间: {room_id}")
+        return room
+
+    def remove_room(self, room_id: str) -> Optional[GameRoom]:
+        """移除房间并取消其仍在运行的任务(事件队列处理等)"""
+        room = self.rooms.pop(room_id, None)
+        if room is not None:
+            for task in room.tasks:
+                task.cancel()
+            __logger__.info(f"移除房间: {room_id}")
+        return room
+
+    def evict_finished_rooms(self) -> None:
+        """移除结束超过finished_room_ttl秒的房间；房间数仍达到上限时，再移除最早结束的一个"""
+        now = time.time()
+        finished = sorted(
+            (room for room in self.rooms.values()
+             if room.status in (GameRoom.FINISHED, GameRoom.FAILED) and room.finished_at is not None),
+            key=lambda room: room.finished_at
+        )
+        for room in finished:
+            if now - room.finished_at >= self.finished_room_ttl:
+                self.remove_room(room.room_id)
+        remaining = [room for room in finished if room.room_id in self.rooms]
+        if remaining and len(self.rooms) >= self.max_rooms:
+            self.remove_room(remaining[0].room_id)
+
+    def get_room(self, room_id: str) -> Optional[GameRoom]:
+        return self.rooms.get(room_id)
+
+    def list_rooms(self) -> List[Dict]:
+        return [room.summary() for room in self.rooms.values()]
+
+    def running_count(self) -> int:
+        return sum(1 for room in self.rooms.values() if room.status == GameRoom.RUNNING)
+
+    async def shutdown(self):
+        """取消所有房间的任务"""
+        for room in self.rooms.values():
+            for task in room.tasks:
+                task.cancel()
+        await asyncio.gather(
+            *(task for room in self.rooms.values() for task in room.tasks),
+            return_exceptions=True
+        )
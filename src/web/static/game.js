@@ -16,6 +16,8 @@ class GameClient {
             observerCount: 0
         };
         this.chatHistory = [];
+        // 正在逐字生成的公开发言: playerId -> 消息元素
+        this.streamingSpeeches = {};
         this.replayMode = false;
         
         this.initializeElements();
@@ -99,7 +101,9 @@ class GameClient {
             const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
             const host = window.location.hostname;
             const port = window.location.port || '8080';
-            const wsUrl = `${protocol}//${host}:${port}/ws`;
+            // 通过页面地址中的?room=<id>订阅指定房间，未指定时进入默认房间
+            const room = new URLSearchParams(window.location.search).get('room');
+            const wsUrl = `${protocol}//${host}:${port}/ws` + (room ? `?room=${encodeURIComponent(room)}` : '');
             
             this.websocket = new WebSocket(wsUrl);
             
@@ -198,6 +202,10 @@ class GameClient {
                 this.updatePhase(data);
                 break;
                 
+            case 'speech_delta':
+                this.appendSpeechDelta(data);
+                break;
+                
             case 'public_speech':
                 this.addChatMessage(data, 'public');
                 break;
@@ -243,10 +251,32 @@ class GameClient {
         this.gameState.currentPhase = data.phase;
     }
     
+    // 追加公开发言的增量文本，收到该玩家的完整发言前先逐字显示
+    appendSpeechDelta(data) {
+        let messageDiv = this.streamingSpeeches[data.playerId];
+        if (!messageDiv) {
+            const timestamp = new Date().toLocaleTimeString();
+            messageDiv = document.createElement('div');
+            messageDiv.className = 'chat-message public streaming';
+            messageDiv.innerHTML = `<span class="timestamp">[${timestamp}]</span>`
+                + `<span class="speaker">${data.playerId}(${data.role})</span>`
+                + `<span class="message"></span>`;
+            this.elements.chatHistory.appendChild(messageDiv);
+            this.streamingSpeeches[data.playerId] = messageDiv;
+        }
+        messageDiv.querySelector('.message').textContent += data.delta;
+        this.elements.chatHistory.scrollTop = this.elements.chatHistory.scrollHeight;
+    }
+    
     // 添加聊天消息
     addChatMessage(data, type) {
         const timestamp = new Date().toLocaleTimeString();
-        const messageDiv = document.createElement('div');
+        // 完整发言到达时替换该玩家正在逐字显示的消息
+        const streamingDiv = type === 'public' ? this.streamingSpeeches[data.playerId] : null;
+        const messageDiv = streamingDiv || document.createElement('div');
+        if (streamingDiv) {
+            delete this.streamingSpeeches[data.playerId];
+        }
         messageDiv.className = `chat-message ${type}`;
         
         let content = `<span class="timestamp">[${timestamp}]</span>`;
@@ -259,7 +289,9 @@ class GameClient {
         }
         
         messageDiv.innerHTML = content;
-        this.elements.chatHistory.appendChild(messageDiv);
+        if (!streamingDiv) {
+            this.elements.chatHistory.appendChild(messageDiv);
+        }
         this.elements.chatHistory.scrollTop = this.elements.chatHistory.scrollHeight;
         
         // 保存到历史记录
@@ -453,6 +485,7 @@ class GameClient {
         if (confirm('确定要清空聊天记录吗？')) {
             this.elements.chatHistory.innerHTML = '';
             this.chatHistory = [];
+            this.streamingSpeeches = {};
         }
     }
     
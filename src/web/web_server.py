@@ -4,6 +4,7 @@ from pathlib import Path
 from aiohttp import web, WSMsgType
 from aiohttp.web import StaticResource
 from Convention.Convention.Runtime.GlobalConfig import ProjectConfig
+from src.llm.metrics import PROMETHEUS_CONTENT_TYPE, llm_metrics
 
 from .websocket_server import WebSocketServer
 from .event_recorder import EventRecorder
@@ -49,6 +50,7 @@ class WebServer:
         self.app.router.add_get('/api/status', self.status_handler)
         self.app.router.add_get('/api/game-state', self.game_state_handler)
         self.app.router.add_get('/api/replay-list', self.replay_list_handler)
+        self.app.router.add_get('/api/metrics', self.metrics_handler)
         
     async def index_handler(self, request):
         """主页处理器"""
@@ -93,6 +95,13 @@ class WebServer:
         replays = await self.replay_system.get_available_replays()
         return web.json_response(replays)
         
+    async def metrics_handler(self, request):
+        """Prometheus指标API处理器"""
+        return web.Response(
+            body=llm_metrics.render().encode("utf-8"),
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE}
+        )
+        
     async def start(self, host="localhost", port=8080):
         """启动Web服务器"""
         runner = web.AppRunner(self.app)
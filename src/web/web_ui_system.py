@@ -9,8 +9,8 @@ import time
 __logger__ = logging.getLogger(__name__)
 
 class WebUISystem(UISystem):
-    def __init__(self, websocket_server, event_recorder):
-        super().__init__()
+    def __init__(self, websocket_server, event_recorder, *, register: bool = True):
+        super().__init__(register=register)
         self.websocket_server = websocket_server
         self.event_recorder = event_recorder
         self.current_phase = ""
@@ -23,7 +23,9 @@ class WebUISystem(UISystem):
         
     def _send_event(self, event_type: str, data: dict):
         """通过事件队列发送事件"""
-        __logger__.info(f"WebUISystem._send_event called: {event_type}, data: {data}, event_queue id={id(self.websocket_server.event_queue) if hasattr(self.websocket_server, 'event_queue') else 'N/A'}, event_loop id={id(asyncio.get_event_loop())}")
+        # 流式发言每个增量都会调用，只在DEBUG级别记录，且未开启时不格式化事件内容
+        if __logger__.isEnabledFor(logging.DEBUG):
+            __logger__.debug(f"WebUISystem._send_event called: {event_type}, data: {data}, event_queue id={id(self.websocket_server.event_queue) if hasattr(self.websocket_server, 'event_queue') else 'N/A'}, event_loop id={id(asyncio.get_event_loop())}")
         if hasattr(self.websocket_server, 'event_queue') and self.websocket_server.event_queue:
             try:
                 event = {
@@ -32,9 +34,17 @@ class WebUISystem(UISystem):
                     "data": data,
                     "timestamp": time.time()
                 }
-                self.loop.call_soon_threadsafe(
-                    self.websocket_server.event_queue.put_nowait, event
-                )
+                try:
+                    running_loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    running_loop = None
+                if running_loop is not None:
+                    # 游戏逻辑与Web服务器运行在同一事件循环中，直接入队
+                    self.websocket_server.event_queue.put_nowait(event)
+                else:
+                    self.loop.call_soon_threadsafe(
+                        self.websocket_server.event_queue.put_nowait, event
+                    )
             except Exception as e:
                 __logger__.error(f"发送事件失败: {e}")
         
@@ -93,6 +103,15 @@ class WebUISystem(UISystem):
         # 同时调用父类方法保持控制台输出
         super().public_speech(playerId, role, message)
         
+    def speech_delta(self, playerId: str, role: str, delta: str) -> None:
+        """广播公开发言的增量文本，只推送给观察者，不写入事件录制(完整发言由public_speech记录)"""
+        self._send_event("speech_delta", {
+            "playerId": playerId,
+            "role": role,
+            "delta": delta,
+            "timestamp": time.time()
+        })
+        
     def private_speech(self, playerId: str, role: str, message: str) -> None:
         """广播私密发言（仅相关角色可见）"""
         event_data = {
@@ -11,11 +11,12 @@ from Convention.Convention.Runtime.Architecture import Architecture
 __logger__ = logging.getLogger(__name__)
 
 class WebSocketServer:
-    def __init__(self, host: str = "localhost", port: int = 8765):
-        Architecture.RegisterGeneric(
-            self,
-            lambda: __logger__.info(f"WebSocket服务器启动在 ws://{host}:{port}"),
-        )
+    def __init__(self, host: str = "localhost", port: int = 8765, *, register: bool = True):
+        if register:
+            Architecture.RegisterGeneric(
+                self,
+                lambda: __logger__.info(f"WebSocket服务器启动在 ws://{host}:{port}"),
+            )
         self.host = host
         self.port = port
         self.observers: Dict[str, WebSocketServerProtocol] = {}
@@ -117,9 +118,11 @@ class WebSocketServer:
         while True:
             try:
                 event = await self.event_queue.get()
-                __logger__.info(f"事件已消费: {event}")
+                # 流式发言每个增量都是一个事件，逐事件的日志只在DEBUG级别记录
+                if __logger__.isEnabledFor(logging.DEBUG):
+                    __logger__.debug(f"事件已消费: {event}")
                 if event.get("type") == "ui_event":
-                    await self.broadcast_event(event["event_type"], event["data"])
+                    await self.broadcast_event(event["event_type"], event["data"], emitted_at=event.get("timestamp"))
                 else:
                     __logger__.warning(f"未知事件类型: {event.get('type')}")
             except asyncio.CancelledError:
@@ -128,21 +131,26 @@ class WebSocketServer:
             except Exception as e:
                 __logger__.error(f"处理事件队列时发生错误: {e}")
         
-    async def broadcast_event(self, event_type: str, data: dict):
-        """向所有观察者广播事件"""
+    async def broadcast_event(self, event_type: str, data: dict, emitted_at: Optional[float] = None):
+        """向所有观察者广播事件，emitted_at为事件在游戏逻辑中产生的时间"""
         message = {
             "type": "game_event",
             "event_type": event_type,
             "data": data,
             "timestamp": time.time()
         }
-        __logger__.info(f"广播事件: {event_type}, 当前观察者: {list(self.observers.keys())}, 消息: {message}")
+        if emitted_at is not None:
+            message["emitted_at"] = emitted_at
+        debug = __logger__.isEnabledFor(logging.DEBUG)
+        if debug:
+            __logger__.debug(f"广播事件: {event_type}, 当前观察者: {list(self.observers.keys())}, 消息: {message}")
         disconnected_observers = []
         
         for observer_id, websocket in self.observers.items():
             try:
                 await websocket.send_str(json.dumps(message))
-                __logger__.info(f"已向观察者 {observer_id} 发送消息")
+                if debug:
+                    __logger__.debug(f"已向观察者 {observer_id} 发送消息")
             except ConnectionClosed:
                 disconnected_observers.append(observer_id)
             except Exception as e: